@@ -1,108 +1,330 @@
-
-# IMPORTS
-import dash
-from dash import dcc, html, dash_table, Input, Output
-import pandas as pd
-import plotly.express as px
-
-# CHARGEMENT DES DONNÉES
-df = pd.read_csv("transactions_analysees_anomalies.csv")
-
-# INITIALISATION DE L'APPLICATION
-app = dash.Dash(__name__)
-app.title = "Détection d'anomalies - Transactions Bancaires"
-
-# LAYOUT DU TABLEAU DE BORD
-app.layout = html.Div([
-    html.H1("Analyse des anomalies dans les transactions bancaires", style={'textAlign': 'center'}),
-
-    html.Div([
-        html.Div([
-            html.H3("Nombre total de transactions :"),
-            html.P(f"{len(df):,}")
-        ], style={'width': '48%', 'display': 'inline-block'}),
-
-        html.Div([
-            html.H3("Nombre d'anomalies détectées :"),
-            html.P(f"{df['anomaly'].sum():,}")
-        ], style={'width': '48%', 'display': 'inline-block'})
-    ], style={'padding': '20px'}),
-
-    html.Hr(),
-
-    html.Div([
-        html.Label("Filtrer par pays d'origine :"),
-        dcc.Dropdown(
-            options=[{"label": p, "value": p} for p in sorted(df["Pays_Origine"].unique())],
-            id="filtre_pays_origine",
-            placeholder="Choisir un pays",
-            multi=False
-        ),
-
-        html.Label("Filtrer par pays de destination :"),
-        dcc.Dropdown(
-            options=[{"label": p, "value": p} for p in sorted(df["Pays_Destination"].unique())],
-            id="filtre_pays_destination",
-            placeholder="Choisir un pays",
-            multi=False
-        ),
-
-        html.Br(),
-        html.Label("Seuil de score d’anomalie (max) :"),
-        dcc.Slider(
-            id='slider_score',
-            min=df['anomaly_score'].min(),
-            max=df['anomaly_score'].max(),
-            value=df['anomaly_score'].min(),
-            step=0.001,
-            marks=None,
-            tooltip={"placement": "bottom", "always_visible": True}
-        )
-    ], style={'padding': '20px'}),
-
-    html.Hr(),
-
-    dcc.Graph(id="histogramme_anomalie"),
-
-    html.Hr(),
-
-    html.H2("Transactions suspectes", style={'textAlign': 'center'}),
-    dash_table.DataTable(
-        id="table_anomalies",
-        columns=[{"name": col, "id": col} for col in [
-            "Date", "Nom_Emetteur", "Nom_Destinataire", "Montant",
-            "Pays_Origine", "Pays_Destination", "anomaly_score"
-        ]],
-        page_size=10,
-        style_table={'overflowX': 'auto'},
-        style_cell={'textAlign': 'left'},
-    )
-])
-
-# CALLBACK POUR METTRE À JOUR LE TABLEAU DE BORD
-@app.callback(
-    [Output("histogramme_anomalie", "figure"),
-     Output("table_anomalies", "data")],
-    [Input("filtre_pays_origine", "value"),
-     Input("filtre_pays_destination", "value"),
-     Input("slider_score", "value")]
-)
-def update_dashboard(pays_origine, pays_destination, score_max):
-    filtered_df = df[df["anomaly"] == 1]
-    filtered_df = filtered_df[filtered_df["anomaly_score"] <= score_max]
-
-    if pays_origine:
-        filtered_df = filtered_df[filtered_df["Pays_Origine"] == pays_origine]
-    if pays_destination:
-        filtered_df = filtered_df[filtered_df["Pays_Destination"] == pays_destination]
-
-    fig = px.histogram(filtered_df, x="anomaly_score", nbins=50,
-                       title="Distribution des scores d’anomalie",
-                       labels={"anomaly_score": "Score d’anomalie"})
-
-    return fig, filtered_df.to_dict("records")
-
-# LANCEMENT DE L'APPLICATION
-if __name__ == '__main__':
-    app.run(debug=True)
-
+
+# IMPORTS
+import os
+from types import SimpleNamespace
+
+import dash
+from dash import dcc, html, dash_table, Input, Output, State
+import numpy as np
+from flask import jsonify, request
+
+from cubes import HistogramCube
+from donnees import PRECHARGEMENT, AJour, Paresseux, resume
+from export import lien_export, reponse_export
+from instrumentation import etape, instrumenter
+from memo import MemoCache
+from moteur_filtres import ids_anomalies, index_anomalies
+from pagination import page_records
+
+memo = MemoCache("app_dash")  # sélections et figures déjà calculées
+
+# Mode client : l'histogramme suit le curseur de score dans le navigateur, à partir
+# de comptes fins envoyés une fois par sélection de pays
+HISTOGRAMME_CLIENT = os.environ.get("APP_DASH_HISTOGRAMME_CLIENT", "1") == "1"
+PAS_SCORE = 0.001
+
+
+# Identifiants des composants préfixés par la vue : dans le portail (portail.py),
+# app_dash et filtres partagent une page Dash et des noms de composants
+def ident(nom):
+    return f"app_dash-{nom}"
+
+
+# CHARGEMENT DES DONNÉES (au premier callback, pas à l'import)
+# Le layout n'utilise que le résumé précalculé du cache (listes de pays, bornes,
+# compteurs) ; transactions, index des anomalies (partagés avec filtres) et
+# histogrammes pré-agrégés sont chargés une fois, au premier besoin ou à la
+# création de l'application si APP_DASH_PRECHARGEMENT=1, puis tenus à jour avec
+# les lots ajoutés (append_transactions), par ce worker ou par un autre.
+def _contexte(df):
+    return SimpleNamespace(df=df, cube=HistogramCube(df.iloc[ids_anomalies(df)], bins=50))
+
+
+def _ajouter_lignes(contexte, df, debut):
+    # Lignes ajoutées comptées par le cube sans le reconstruire
+    contexte.cube.ajouter(df.iloc[ids_anomalies(df, debut)])
+    return SimpleNamespace(df=df, cube=contexte.cube)
+
+
+contexte = AJour(_contexte, _ajouter_lignes)
+
+
+def precharger():
+    contexte()
+
+
+def bornes_score():
+    return tuple(resume()["anomaly_score"])
+
+
+def positions_slider(score_min, score_max):
+    return score_min + PAS_SCORE * np.arange(int(np.ceil((score_max - score_min) / PAS_SCORE)) + 1)
+
+
+def cache_stats():
+    return jsonify(memo.stats())
+
+
+# EXPORT DE LA SÉLECTION COURANTE (CSV ou Parquet en flux)
+COLONNES_EXPORT = ["Date", "Nom_Emetteur", "Nom_Destinataire", "Montant",
+                   "Pays_Origine", "Pays_Destination", "anomaly_score"]
+
+
+def export_anomalies(format):
+    selection = selection_anomalies(request.args.get("pays_origine") or None,
+                                    request.args.get("pays_destination") or None,
+                                    request.args.get("score_max", bornes_score()[1], type=float))
+    return reponse_export(contexte().df, selection, format, "anomalies", COLONNES_EXPORT)
+
+# LAYOUT DU TABLEAU DE BORD (reconstruit à chaque chargement pour les compteurs)
+def serve_layout():
+    infos = resume()
+    score_min, score_max = bornes_score()
+    return html.Div([
+        html.H1("Analyse des anomalies dans les transactions bancaires", style={'textAlign': 'center'}),
+
+        html.Div([
+            html.Div([
+                html.H3("Nombre total de transactions :"),
+                html.P(f"{infos['lignes']:,}")
+            ], style={'width': '48%', 'display': 'inline-block'}),
+
+            html.Div([
+                html.H3("Nombre d'anomalies détectées :"),
+                html.P(f"{infos['anomalies']:,}")
+            ], style={'width': '48%', 'display': 'inline-block'})
+        ], style={'padding': '20px'}),
+
+        html.Hr(),
+
+        html.Div([
+            html.Label("Filtrer par pays d'origine :"),
+            dcc.Dropdown(
+                options=[{"label": p, "value": p} for p in infos["Pays_Origine"]],
+                id=ident("filtre_pays_origine"),
+                placeholder="Choisir un pays",
+                multi=False
+            ),
+
+            html.Label("Filtrer par pays de destination :"),
+            dcc.Dropdown(
+                options=[{"label": p, "value": p} for p in infos["Pays_Destination"]],
+                id=ident("filtre_pays_destination"),
+                placeholder="Choisir un pays",
+                multi=False
+            ),
+
+            html.Br(),
+            html.Label("Seuil de score d’anomalie (max) :"),
+            dcc.Slider(
+                id=ident("slider_score"),
+                min=score_min,
+                max=score_max,
+                value=score_min,
+                step=PAS_SCORE,
+                marks=None,
+                tooltip={"placement": "bottom", "always_visible": True}
+            )
+        ], style={'padding': '20px'}),
+
+        html.Hr(),
+
+        dcc.Graph(id=ident("histogramme_anomalie")),
+        dcc.Store(id=ident("histogramme_fin")),
+
+        html.Hr(),
+
+        html.H2("Transactions suspectes", style={'textAlign': 'center'}),
+        html.Div([
+            html.A("Exporter en CSV", id=ident("export_csv"), download="anomalies.csv"),
+            html.Span(" | "),
+            html.A("Exporter en Parquet", id=ident("export_parquet"), download="anomalies.parquet"),
+        ], style={'textAlign': 'right', 'padding': '0 20px 10px'}),
+        dash_table.DataTable(
+            id=ident("table_anomalies"),
+            columns=[{"name": col, "id": col} for col in COLONNES_EXPORT],
+            page_current=0,
+            page_size=10,
+            page_action='custom',
+            style_table={'overflowX': 'auto'},
+            style_cell={'textAlign': 'left'},
+        )
+    ])
+
+# SÉLECTION DES ANOMALIES (ids de lignes, via les index partagés, sans copie)
+@memo.memoiser
+def selection_anomalies(pays_origine, pays_destination, score_max):
+    index = index_anomalies()
+    selection = index.moteur.select(
+        pays_origine=[pays_origine] if pays_origine else None,
+        pays_destination=[pays_destination] if pays_destination else None,
+        score=(None, score_max)
+    )
+    return index.ids[selection]
+
+# HISTOGRAMME CALCULÉ PAR LE SERVEUR (chaque mouvement du curseur)
+@memo.memoiser
+def update_dashboard(pays_origine, pays_destination, score_max):
+    cube = contexte().cube
+    with etape("histogramme"):
+        comptes = cube.counts(
+            pays_origine=[pays_origine] if pays_origine else None,
+            pays_destination=[pays_destination] if pays_destination else None,
+            score=(None, score_max)
+        )
+
+    with etape("figure"):
+        fig = cube.figure(comptes, title="Distribution des scores d’anomalie",
+                          xaxis_title="Score d’anomalie")
+
+    return fig
+
+# HISTOGRAMME CALCULÉ PAR LE NAVIGATEUR
+# Pour les pays choisis, triplets (tranche du curseur, classe affichée, compte) :
+# la tranche d'un score est le nombre de positions du curseur strictement
+# inférieures, donc "score <= position k" revient à "tranche <= k". Comparaison
+# en float32 comme côté serveur (cube, moteur de la table) : 0.721 doit garder
+# le score 0.721 (0.72100002 en float32) à toutes les positions du curseur.
+@memo.memoiser
+def histogramme_fin(pays_origine, pays_destination):
+    cube = contexte().cube
+    score_min, score_max = bornes_score()
+    with etape("histogramme"):
+        scores = cube.scores_pour(
+            pays_origine=[pays_origine] if pays_origine else None,
+            pays_destination=[pays_destination] if pays_destination else None
+        )
+        tranches = np.searchsorted(positions_slider(score_min, score_max).astype(np.float32),
+                                   scores.astype(np.float32), side="left")
+        classes = cube.classe_de(scores)
+        cles, comptes = np.unique(tranches * cube.bins + classes, return_counts=True)
+
+    with etape("figure"):
+        modele = cube.figure(np.zeros(cube.bins, dtype=np.int64), title="Distribution des scores d’anomalie",
+                             xaxis_title="Score d’anomalie")
+        trace = modele.data[0]
+    return {
+        "min": score_min,
+        "pas": PAS_SCORE,
+        "tranche": (cles // cube.bins).tolist(),
+        "classe": (cles % cube.bins).tolist(),
+        "comptes": comptes.tolist(),
+        "x": list(trace.x),
+        "largeur": list(trace.width),
+        "layout": modele.layout.to_plotly_json(),
+    }
+
+
+# CALLBACK DU TABLEAU : pagination côté serveur
+def update_table(pays_origine, pays_destination, score_max, page_current, page_size):
+    with etape("filtrage"):
+        selection = selection_anomalies(pays_origine, pays_destination, score_max)
+    with etape("enregistrements"):
+        return page_records(contexte().df, selection, page_current, page_size,
+                            colonnes=COLONNES_EXPORT)
+
+# LIENS D'EXPORT : l'URL porte les filtres, le serveur renvoie toute la sélection
+def update_export_links(pays_origine, pays_destination, score_max):
+    return [lien_export(dash.get_relative_path(f"/export/app_dash/anomalies.{format}"),
+                        pays_origine=pays_origine, pays_destination=pays_destination, score_max=score_max)
+            for format in ("csv", "parquet")]
+
+# HISTOGRAMME DANS LE NAVIGATEUR : redessiné à chaque mouvement du curseur
+HISTOGRAMME_JS = """
+function(fin, seuilGlisse, seuil) {
+    if (!fin) {
+        return window.dash_clientside.no_update;
+    }
+    var s = (seuilGlisse === null || seuilGlisse === undefined) ? seuil : seuilGlisse;
+    var k = Math.round((s - fin.min) / fin.pas);
+    var y = new Array(fin.x.length).fill(0);
+    for (var i = 0; i < fin.comptes.length; i++) {
+        if (fin.tranche[i] <= k) {
+            y[fin.classe[i]] += fin.comptes[i];
+        }
+    }
+    return {
+        data: [{type: "bar", x: fin.x, y: y, width: fin.largeur, marker: {line: {width: 0}}}],
+        layout: fin.layout
+    };
+}
+"""
+
+
+# ROUTES ET CALLBACKS DE LA VUE, sur cette application ou sur le portail
+def enregistrer(app):
+    app.server.add_url_rule("/export/app_dash/anomalies.<format>", "app_dash_export", export_anomalies)
+
+    if HISTOGRAMME_CLIENT:
+        # Le serveur n'est sollicité que lorsque les pays changent
+        app.callback(
+            Output(ident("histogramme_fin"), "data"),
+            [Input(ident("filtre_pays_origine"), "value"),
+             Input(ident("filtre_pays_destination"), "value")]
+        )(histogramme_fin)
+
+        app.clientside_callback(
+            HISTOGRAMME_JS,
+            Output(ident("histogramme_anomalie"), "figure"),
+            [Input(ident("histogramme_fin"), "data"),
+             Input(ident("slider_score"), "drag_value")],
+            State(ident("slider_score"), "value")
+        )
+    else:
+        app.callback(
+            Output(ident("histogramme_anomalie"), "figure"),
+            [Input(ident("filtre_pays_origine"), "value"),
+             Input(ident("filtre_pays_destination"), "value"),
+             Input(ident("slider_score"), "value")]
+        )(update_dashboard)
+
+    app.callback(
+        [Output(ident("table_anomalies"), "data"),
+         Output(ident("table_anomalies"), "page_count")],
+        [Input(ident("filtre_pays_origine"), "value"),
+         Input(ident("filtre_pays_destination"), "value"),
+         Input(ident("slider_score"), "value"),
+         Input(ident("table_anomalies"), "page_current"),
+         Input(ident("table_anomalies"), "page_size")]
+    )(update_table)
+
+    app.callback(
+        [Output(ident("export_csv"), "href"),
+         Output(ident("export_parquet"), "href")],
+        [Input(ident("filtre_pays_origine"), "value"),
+         Input(ident("filtre_pays_destination"), "value"),
+         Input(ident("slider_score"), "value")]
+    )(update_export_links)
+
+
+# INITIALISATION DE L'APPLICATION
+# Rien n'est lu à l'import : create_app() enregistre layout, routes et callbacks,
+# les données viennent au premier callback (ou tout de suite si prechargement).
+def create_app(prechargement=PRECHARGEMENT):
+    app = dash.Dash(__name__)
+    app.title = "Détection d'anomalies - Transactions Bancaires"
+    app.layout = serve_layout
+    instrumenter(app.server, "app_dash")  # Server-Timing et /metrics si APP_DASH_INSTRUMENTATION=1
+    app.server.add_url_rule("/cache-stats", "cache_stats", cache_stats)
+    enregistrer(app)
+
+    if prechargement:
+        precharger()
+    return app
+
+
+# Application par défaut, créée au premier accès à app_dash.app ou app_dash.server
+_application = Paresseux(create_app)
+
+
+def __getattr__(nom):
+    if nom == "app":
+        return _application()
+    if nom == "server":
+        return _application().server  # point d'entrée WSGI pour gunicorn
+    raise AttributeError(f"module {__name__!r} has no attribute {nom!r}")
+
+# LANCEMENT DE L'APPLICATION
+if __name__ == '__main__':
+    create_app().run(debug=True)
+
@@ -0,0 +1,293 @@
+# BENCHMARK DES CALLBACKS ET DU DÉMARRAGE DES TABLEAUX DE BORD
+#
+#   python -m benchmarks.bench_callbacks --lignes 100000 1000000 10000000
+#   python -m benchmarks.bench_callbacks --comparer avant.json apres.json
+#
+# Pour chaque taille, un CSV synthétique au schéma réel est généré (puis réutilisé),
+# et chaque application est mesurée dans un processus neuf : démarrage (import,
+# create_app et premier layout, sans lecture des transactions), chargement des
+# données au premier callback (à froid : conversion CSV -> Parquet, puis à chaud), latences p50/p95
+# des callbacks sur des séquences de filtres réalistes, octets de la réponse
+# sérialisée et pic de mémoire résidente. Les résultats sont écrits en JSON.
+#
+# Les callbacks sont mesurés sans mémoïsation (les séquences répétées ne
+# mesureraient sinon que des lectures de cache). Avec --memo, un passage
+# supplémentaire mémoïsé est rapporté à part (callbacks_memo).
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+APPS = ["app_dash", "filtres", "kpi", "nd", "portail"]
+REPERTOIRE_RESULTATS = os.path.join(os.path.dirname(__file__), "resultats")
+
+
+# SÉQUENCES DE FILTRES (un utilisateur qui explore puis revient en arrière)
+def sequence_app_dash(df):
+    smin, smax = float(df["anomaly_score"].min()), float(df["anomaly_score"].max())
+    curseurs = [smin + (smax - smin) * f for f in (0.5, 0.8, 0.95, 1.0)]
+    return [
+        (None, None, smax),
+        ("France", None, smax),
+        ("France", "Cameroun", smax),
+        *[("France", "Cameroun", s) for s in curseurs],
+        ("Maroc", None, curseurs[1]),
+        ("France", None, smax),
+        (None, None, smax),
+    ]
+
+
+def sequence_filtres(df):
+    montant = [float(df["Montant"].min()), float(df["Montant"].max())]
+    debut, fin = str(df["Date"].min().date()), str(df["Date"].max().date())
+    return [
+        (["all"], ["all"], montant, [0, 1], "", "contains", debut, fin),
+        (["France"], ["all"], montant, [0, 1], "", "contains", debut, fin),
+        (["France", "Gabon"], ["Cameroun"], montant, [0, 1], "", "contains", debut, fin),
+        (["France", "Gabon"], ["Cameroun"], [100_000, 1_000_000], [0.6, 0.9], "", "contains", debut, fin),
+        (["all"], ["all"], montant, [0, 1], "", "contains", "2023-03-01", "2023-03-31"),
+        (["all"], ["all"], montant, [0, 1], "jean", "contains", debut, fin),
+        (["all"], ["all"], montant, [0, 1], "mbou", "prefix", debut, fin),
+        (["all"], ["all"], montant, [0, 1], "marie ngema", "fuzzy", debut, fin),
+        (["France"], ["all"], montant, [0, 1], "", "contains", debut, fin),
+        (["all"], ["all"], montant, [0, 1], "", "contains", debut, fin),
+    ]
+
+
+# MESURES DANS LE PROCESSUS FILS
+def octets(reponse):
+    from plotly.io.json import to_json_plotly
+
+    return len(to_json_plotly(reponse).encode())
+
+
+def mesurer(fonction, args, mesures):
+    debut = time.perf_counter()
+    reponse = fonction(*args)
+    mesures["durees"].append((time.perf_counter() - debut) * 1000)
+    mesures["octets"].append(octets(reponse))
+    return reponse
+
+
+def resumer(mesures):
+    durees = np.asarray(mesures["durees"])
+    return {
+        "appels": len(durees),
+        "p50_ms": float(np.percentile(durees, 50)),
+        "p95_ms": float(np.percentile(durees, 95)),
+        "max_ms": float(durees.max()),
+        "octets_moyens": int(np.mean(mesures["octets"])),
+        "octets_max": int(np.max(mesures["octets"])),
+    }
+
+
+def callbacks_app_dash(module, repetitions):
+    # histogramme_fin : données envoyées au navigateur quand les pays changent
+    # (le curseur ne déclenche alors plus d'appel au serveur)
+    noms = ("update_dashboard", "histogramme_fin", "update_table")
+    mesures = {nom: {"durees": [], "octets": []} for nom in noms}
+    for _ in range(repetitions):
+        for pays_origine, pays_destination, score_max in sequence_app_dash(module.contexte().df):
+            mesurer(module.update_dashboard, (pays_origine, pays_destination, score_max), mesures["update_dashboard"])
+            mesurer(module.histogramme_fin, (pays_origine, pays_destination), mesures["histogramme_fin"])
+            mesurer(module.update_table, (pays_origine, pays_destination, score_max, 0, 10), mesures["update_table"])
+    return mesures
+
+
+def callbacks_filtres(module, repetitions):
+    mesures = {"update_dashboard": {"durees": [], "octets": []}, "update_table": {"durees": [], "octets": []}}
+    tri = [{"column_id": "Montant", "direction": "desc"}]
+    for _ in range(repetitions):
+        for filtres in sequence_filtres(module.contexte().df):
+            mesurer(module.update_dashboard, filtres, mesures["update_dashboard"])
+            mesurer(module.update_table, (*filtres, 0, 10, tri, ""), mesures["update_table"])
+    return mesures
+
+
+def callbacks_kpi(module, repetitions):
+    mesures = {"serve_layout": {"durees": [], "octets": []}}
+    for _ in range(repetitions):
+        mesurer(module.serve_layout, (), mesures["serve_layout"])
+    return mesures
+
+
+def callbacks_nd(module, repetitions):
+    import pandas as pd
+
+    from donnees import CSV_PATH
+
+    mesures = {nom: {"durees": [], "octets": []} for nom in ("analyser", "display_tab")}
+    jeton = module.store.put(pd.read_csv(CSV_PATH))
+    progression = lambda etat: None
+    for _ in range(repetitions):
+        resultats, *_ = mesurer(module.analyser,
+                                (progression, jeton, "Montant", "Date", ["Pays_Origine", "Pays_Destination"], 0.01),
+                                mesures["analyser"])
+        for onglet in ("tab-data", "tab-anomalies", "tab-viz"):
+            mesurer(module.display_tab, (onglet, resultats), mesures["display_tab"])
+    return mesures
+
+
+def callbacks_portail(module, repetitions):
+    # Les quatre vues dans un même processus : données et index chargés une fois
+    mesures = {}
+    for nom in APPS[:-1]:
+        for callback, m in globals()[f"callbacks_{nom}"](sys.modules[nom], repetitions).items():
+            mesures[f"{nom}.{callback}"] = m
+    return mesures
+
+
+def travailleur(app, repetitions):
+    import importlib
+
+    debut = time.perf_counter()
+    module = importlib.import_module(app)
+    duree_import = time.perf_counter() - debut
+    sklearn_importe = any(nom.startswith("sklearn") for nom in sys.modules)
+
+    debut = time.perf_counter()
+    precharger = getattr(module, "precharger", None)
+    application = module.create_app(prechargement=False) if precharger else module.create_app()
+    duree_creation = time.perf_counter() - debut
+
+    # Premier layout servi (kpi y calcule ses indicateurs)
+    debut = time.perf_counter()
+    if callable(application.layout):
+        application.layout()
+    duree_layout = time.perf_counter() - debut
+
+    # Transactions et index, chargés au premier callback
+    debut = time.perf_counter()
+    if precharger:
+        precharger()
+    duree_chargement = time.perf_counter() - debut
+
+    mesures = globals()[f"callbacks_{app}"](module, repetitions)
+    print(json.dumps({
+        "import_s": duree_import,
+        "create_app_s": duree_creation,
+        "layout_s": duree_layout,
+        "demarrage_s": duree_import + duree_creation + duree_layout,
+        "chargement_s": duree_chargement,
+        "sklearn_a_l_import": sklearn_importe,
+        "callbacks": {nom: resumer(m) for nom, m in mesures.items()},
+        "rss_max_mo": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+# ORCHESTRATION
+def generer_csv(n, repertoire):
+    chemin = os.path.join(repertoire, f"transactions_{n}.csv")
+    if not os.path.exists(chemin):
+        from benchmarks.synthetique import generer_transactions
+
+        tmp = chemin + ".tmp"
+        generer_transactions(n).to_csv(tmp, index=False, date_format="%Y-%m-%d %H:%M:%S")
+        os.replace(tmp, chemin)
+    return chemin
+
+
+def lancer(app, csv, cache, repetitions, memo=False):
+    env = dict(os.environ, APP_DASH_CSV=csv, APP_DASH_CACHE=cache)
+    if not memo:
+        env.update(APP_DASH_MEMO_TAILLE="0", APP_DASH_MEMO_DISQUE="0")
+    racine = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sortie = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_callbacks", "--travailleur", app, "--repetitions", str(repetitions)],
+        cwd=racine, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(sortie.stdout.strip().splitlines()[-1])
+
+
+def commit_courant():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparer(avant, apres, seuil=0.10):
+    with open(avant, encoding="utf-8") as f:
+        a = json.load(f)
+    with open(apres, encoding="utf-8") as f:
+        b = json.load(f)
+
+    print(f"{'taille':>10} {'app':<10}{'mesure':<28}{'avant':>12}{'après':>12}{'écart':>9}")
+    for taille, apps in b["resultats"].items():
+        for app, res in apps.items():
+            ref = a["resultats"].get(taille, {}).get(app)
+            if ref is None:
+                continue
+            lignes = [(nom, ref[nom], res[nom])
+                      for nom in ("import_s", "demarrage_s", "chargement_s", "rss_max_mo") if nom in ref and nom in res]
+            for groupe, prefixe in (("callbacks", ""), ("callbacks_memo", "memo.")):
+                for nom, cb in res.get(groupe, {}).items():
+                    if nom in ref.get(groupe, {}):
+                        for cle in ("p50_ms", "p95_ms", "octets_moyens"):
+                            lignes.append((f"{prefixe}{nom}.{cle}", ref[groupe][nom][cle], cb[cle]))
+            for mesure, x, y in lignes:
+                ecart = (y - x) / x if x else 0.0
+                alerte = "  <-- régression" if ecart > seuil else ""
+                print(f"{taille:>10} {app:<10}{mesure:<28}{x:>12.1f}{y:>12.1f}{ecart:>+8.0%}{alerte}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lignes", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--apps", nargs="+", choices=APPS, default=APPS)
+    parser.add_argument("--repetitions", type=int, default=3)
+    parser.add_argument("--donnees", default=os.path.join(tempfile.gettempdir(), "bench_app_dash"),
+                        help="répertoire des CSV générés (réutilisés d'une exécution à l'autre)")
+    parser.add_argument("--sortie", help="fichier JSON de résultats (défaut : benchmarks/resultats/<commit>.json)")
+    parser.add_argument("--memo", action="store_true",
+                        help="mesure aussi les callbacks avec la mémoïsation (rapportés à part)")
+    parser.add_argument("--comparer", nargs=2, metavar=("AVANT", "APRES"))
+    parser.add_argument("--travailleur", choices=APPS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.travailleur:
+        return travailleur(args.travailleur, args.repetitions)
+    if args.comparer:
+        return comparer(*args.comparer)
+
+    os.makedirs(args.donnees, exist_ok=True)
+    resultats = {}
+    for n in args.lignes:
+        csv = generer_csv(n, args.donnees)
+        with tempfile.TemporaryDirectory() as cache:
+            for app in args.apps:
+                # 1er lancement : cache vide (conversion CSV) ; 2e : cache Parquet existant
+                froid = lancer(app, csv, cache, args.repetitions)
+                res = lancer(app, csv, cache, args.repetitions)
+                if args.memo:
+                    res["callbacks_memo"] = lancer(app, csv, cache, args.repetitions, memo=True)["callbacks"]
+                res["import_froid_s"] = froid["import_s"]
+                res["demarrage_froid_s"] = froid["demarrage_s"]
+                res["chargement_froid_s"] = froid["chargement_s"]
+                resultats.setdefault(str(n), {})[app] = res
+                print(f"{n:>10,} {app:<10} démarrage {froid['demarrage_s']:.2f} s (froid) / {res['demarrage_s']:.2f} s "
+                      f"(import {res['import_s']:.2f} s), chargement des données {froid['chargement_s']:.2f} s "
+                      f"(froid) / {res['chargement_s']:.2f} s, RSS max {res['rss_max_mo']:.0f} Mo")
+                for groupe, titre in (("callbacks", "sans mémo"), ("callbacks_memo", "avec mémo")):
+                    for nom, cb in res.get(groupe, {}).items():
+                        print(f"{'':>22}{nom:<18} p50 {cb['p50_ms']:>9.1f} ms  p95 {cb['p95_ms']:>9.1f} ms  "
+                              f"{cb['octets_moyens']:>11,} o  ({titre})")
+
+    commit = commit_courant()
+    sortie = args.sortie or os.path.join(REPERTOIRE_RESULTATS, f"{commit or 'resultats'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(sortie)), exist_ok=True)
+    with open(sortie, "w", encoding="utf-8") as f:
+        json.dump({"commit": commit, "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                   "memo": args.memo, "resultats": resultats}, f, indent=2)
+    print(f"Résultats : {sortie}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# MICRO-BENCHMARK : filtrage de filtres.update_dashboard (masques chaînés vs FilterEngine)
+#
+#   python -m benchmarks.bench_filtres --lignes 1000000 10000000
+#
+# Les lignes générées jouent le rôle de df_filtered (le cas le plus défavorable :
+# toutes les transactions sont des anomalies à filtrer).
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetique import generer_transactions
+from moteur_filtres import FilterEngine
+
+
+# IMPLÉMENTATION D'ORIGINE (copie + masques successifs)
+def filtrer_masques(df_filtered, pays_origine, pays_destination, montant_range, score_range, date_start, date_end):
+    dff = df_filtered.copy()
+    if pays_origine and 'all' not in pays_origine:
+        dff = dff[dff["Pays_Origine"].isin(pays_origine)]
+    if pays_destination and 'all' not in pays_destination:
+        dff = dff[dff["Pays_Destination"].isin(pays_destination)]
+    dff = dff[(dff["Montant"] >= montant_range[0]) & (dff["Montant"] <= montant_range[1])]
+    dff = dff[(dff["anomaly_score"] >= score_range[0]) & (dff["anomaly_score"] <= score_range[1])]
+    if date_start and date_end:
+        dff = dff[(dff["Date"] >= pd.to_datetime(date_start)) & (dff["Date"] <= pd.to_datetime(date_end))]
+    return dff
+
+
+def filtrer_moteur(df_filtered, moteur, pays_origine, pays_destination, montant_range, score_range, date_start, date_end):
+    selection = moteur.select(
+        pays_origine=pays_origine if pays_origine and 'all' not in pays_origine else None,
+        pays_destination=pays_destination if pays_destination and 'all' not in pays_destination else None,
+        montant=montant_range,
+        score=score_range,
+        date=(date_start, date_end) if date_start and date_end else None
+    )
+    return df_filtered.iloc[selection]
+
+
+def scenarios(df):
+    montant = [df["Montant"].min(), df["Montant"].max()]
+    debut, fin = str(df["Date"].min().date()), str(df["Date"].max().date())
+    return {
+        "aucun filtre": (None, None, montant, [0, 1], debut, fin),
+        "1 pays origine": (["France"], None, montant, [0, 1], debut, fin),
+        "pays + montant": (["France", "Gabon"], ["Cameroun"], [100_000, 1_000_000], [0, 1], debut, fin),
+        "score étroit": (None, None, montant, [0.70, 0.71], debut, fin),
+        "une semaine": (None, None, montant, [0, 1], "2023-03-01", "2023-03-07"),
+        "tous les filtres": (["Maroc"], ["France", "Belgique"], [50_000, 5_000_000], [0.2, 0.8], "2022-01-01", "2022-06-30"),
+    }
+
+
+def chronometrer(fonction, repetitions):
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        resultat = fonction()
+        durees.append(time.perf_counter() - debut)
+    return np.median(durees) * 1000, resultat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lignes", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--repetitions", type=int, default=5)
+    args = parser.parse_args()
+
+    for n in args.lignes:
+        df = generer_transactions(n)
+        debut = time.perf_counter()
+        moteur = FilterEngine(df)
+        construction = time.perf_counter() - debut
+
+        print(f"\n{n:,} lignes (construction des index : {construction:.2f} s)")
+        print(f"{'scénario':<20}{'masques (ms)':>14}{'moteur (ms)':>14}{'gain':>8}{'lignes':>12}")
+        for nom, params in scenarios(df).items():
+            t_masques, attendu = chronometrer(lambda: filtrer_masques(df, *params), args.repetitions)
+            t_moteur, obtenu = chronometrer(lambda: filtrer_moteur(df, moteur, *params), args.repetitions)
+            assert attendu.index.equals(obtenu.index), nom
+            print(f"{nom:<20}{t_masques:>14.1f}{t_moteur:>14.1f}{t_masques / t_moteur:>7.1f}x{len(obtenu):>12,}")
+
+
+if __name__ == '__main__':
+    main()
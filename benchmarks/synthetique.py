@@ -0,0 +1,36 @@
+# GÉNÉRATION DE TRANSACTIONS SYNTHÉTIQUES (même schéma que transactions_analysees_anomalies.csv)
+import numpy as np
+import pandas as pd
+
+PAYS = [
+    "Cameroun", "Gabon", "Congo", "Tchad", "Sénégal", "Côte d'Ivoire", "Mali", "Maroc",
+    "France", "Belgique", "Canada", "Allemagne", "Espagne", "Chine", "États-Unis", "Nigeria",
+]
+PRENOMS = ["Jean", "Marie", "Paul", "Aïcha", "Moussa", "Fatou", "Pierre", "Grâce", "Ali", "Sophie"]
+NOMS = ["Mboumba", "Nguema", "Diallo", "Traoré", "Dupont", "Martin", "Mbaye", "Ondo", "Kouassi", "Ndiaye"]
+
+
+def generer_transactions(n, nb_clients=50_000, taux_anomalies=0.05, seed=42):
+    rng = np.random.default_rng(seed)
+
+    clients = pd.Categorical([
+        f"{PRENOMS[i % len(PRENOMS)]} {NOMS[(i // len(PRENOMS)) % len(NOMS)]} {i}"
+        for i in range(nb_clients)
+    ])
+    pays = pd.CategoricalDtype(sorted(PAYS))
+
+    debut = np.datetime64("2021-01-01T00:00:00", "s")
+    secondes = np.sort(rng.integers(0, 4 * 365 * 86_400, n))
+    anomaly = (rng.random(n) < taux_anomalies).astype(np.int8)
+    score = np.where(anomaly == 1, rng.uniform(0.5, 1.0, n), rng.uniform(0.0, 0.5, n))
+
+    return pd.DataFrame({
+        "Date": (debut + secondes).astype("datetime64[us]"),
+        "Nom_Emetteur": pd.Categorical.from_codes(rng.integers(0, nb_clients, n), dtype=clients.dtype),
+        "Nom_Destinataire": pd.Categorical.from_codes(rng.integers(0, nb_clients, n), dtype=clients.dtype),
+        "Montant": np.round(rng.lognormal(12, 1.8, n), 2),
+        "Pays_Origine": pd.Categorical.from_codes(rng.integers(0, len(PAYS), n), dtype=pays),
+        "Pays_Destination": pd.Categorical.from_codes(rng.integers(0, len(PAYS), n), dtype=pays),
+        "anomaly": anomaly,
+        "anomaly_score": np.round(score, 4).astype(np.float32),
+    })
@@ -0,0 +1,13 @@
+# OUTILS POUR LES INDEX AU FORMAT CSR (ordre + offsets par segment)
+import numpy as np
+
+
+def rassembler_csr(ordre, offsets, segments):
+    # Concatène les segments ordre[offsets[s]:offsets[s + 1]] sans boucle Python
+    segments = np.asarray(segments, dtype=np.intp)
+    longueurs = offsets[segments + 1] - offsets[segments]
+    total = int(longueurs.sum())
+    if total == 0:
+        return np.empty(0, dtype=ordre.dtype)
+    debuts = np.repeat(offsets[segments] - np.concatenate(([0], np.cumsum(longueurs)[:-1])), longueurs)
+    return ordre[debuts + np.arange(total)]
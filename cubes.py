@@ -0,0 +1,253 @@
+# CUBES D'HISTOGRAMMES PRÉ-AGRÉGÉS
+# Comptes par classe de score pour chaque cellule
+# (Pays_Origine, Pays_Destination, mois, tranche de Montant).
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from csr import rassembler_csr
+
+
+def _codes(serie):
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype("category")
+    # +1 : le code 0 est réservé aux valeurs manquantes
+    return serie.cat.categories, serie.cat.codes.to_numpy().astype(np.int64) + 1
+
+
+def _min_max(groupes, valeurs, taille):
+    # Valeurs min/max réellement présentes dans chaque groupe (groupe vide : min > max)
+    if np.issubdtype(valeurs.dtype, np.integer):
+        bornes = np.iinfo(valeurs.dtype)
+        mini, maxi = np.full(taille, bornes.max), np.full(taille, bornes.min)
+    else:
+        mini, maxi = np.full(taille, np.inf), np.full(taille, -np.inf)
+    np.minimum.at(mini, groupes, valeurs)
+    np.maximum.at(maxi, groupes, valeurs)
+    return mini, maxi
+
+
+class HistogramCube:
+    def __init__(self, frame, bins=50, tranches_montant=32):
+        self.bins = bins
+        self._lots = []  # lignes ajoutées après construction (append_transactions)
+        self._recents = None
+
+        self.pays_origine, origine = _codes(frame["Pays_Origine"])
+        self.pays_destination, destination = _codes(frame["Pays_Destination"])
+
+        # Dates en entiers (unité de la colonne) et mois depuis le premier mois
+        dates = frame["Date"].to_numpy()
+        self.unite_date = np.datetime_data(dates.dtype)[0]
+        self.dates = dates.view(np.int64)
+        mois_absolu = dates.astype("datetime64[M]").astype(np.int64)
+        valides = ~np.isnat(dates)
+        premier = mois_absolu[valides].min() if valides.any() else 0
+        mois = np.where(valides, mois_absolu - premier + 1, 0)
+
+        # Tranches de montant par quantiles (0 = montant manquant)
+        self.montants = frame["Montant"].to_numpy(dtype=np.float64)
+        bornes = np.unique(np.nanquantile(self.montants, np.linspace(0, 1, tranches_montant + 1)))
+        tranche = np.where(np.isnan(self.montants), 0,
+                           np.clip(np.searchsorted(bornes, self.montants, side="right"), 1, len(bornes) - 1))
+
+        # Classes de score fixes sur toute l'étendue des scores
+        self.type_score = frame["anomaly_score"].dtype.type
+        self.scores = frame["anomaly_score"].to_numpy(dtype=np.float64)
+        score_valide = ~np.isnan(self.scores)
+        self.edges = np.linspace(np.nanmin(self.scores), np.nanmax(self.scores), bins + 1)
+        self.classe = self.classe_de(self.scores)
+
+        # Cellules non vides
+        self.dimensions = (len(self.pays_origine) + 1, len(self.pays_destination) + 1, mois.max() + 1, len(bornes))
+        cellule_ligne = np.ravel_multi_index((origine, destination, mois, tranche), self.dimensions)
+        cellules, cellule_ligne = np.unique(cellule_ligne, return_inverse=True)
+        self.nb_cellules = len(cellules)
+        self.cell_origine, self.cell_destination, self.cell_mois, self.cell_tranche = np.unravel_index(
+            cellules, self.dimensions)
+
+        cl = cellule_ligne[score_valide]
+        self.comptes = np.bincount(cl * bins + self.classe[score_valide],
+                                   minlength=self.nb_cellules * bins).reshape(self.nb_cellules, bins)
+
+        # Étendues réelles par mois, par tranche et par classe : une plage de filtre
+        # couvrant entièrement ces valeurs n'a pas besoin de revenir aux lignes.
+        self.mois_min, self.mois_max = _min_max(mois[valides], self.dates[valides], mois.max() + 1)
+        m = ~np.isnan(self.montants)
+        self.tranche_min, self.tranche_max = _min_max(tranche[m], self.montants[m], len(bornes))
+        self.classe_min, self.classe_max = _min_max(self.classe[score_valide], self.scores[score_valide], bins)
+
+        # Lignes triées par (cellule, score) : index CSR et clés entières
+        # cellule * nb_scores_distincts + rang du score, pour compter exactement
+        # une plage de scores dans plusieurs cellules en un seul searchsorted.
+        lignes = np.flatnonzero(score_valide)
+        self.ordre = lignes[np.lexsort((self.scores[lignes], cl))]
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(cl, minlength=self.nb_cellules))))
+        self.scores_distincts = np.unique(self.scores[lignes])
+        rangs = np.searchsorted(self.scores_distincts, self.scores[self.ordre])
+        self.cles = np.sort(cl) * len(self.scores_distincts) + rangs
+        classes_distinctes = self.classe_de(self.scores_distincts)
+        self.rang_classe = np.searchsorted(classes_distinctes, np.arange(bins + 1), side="left")
+
+    def ajouter(self, lot):
+        # Les lignes ajoutées ne sont pas insérées dans les cellules (ce qui
+        # recopierait tout l'index) : elles sont comptées ligne à ligne, pour un
+        # coût proportionnel au seul volume ajouté depuis la construction.
+        self._lots.append(lot[["Pays_Origine", "Pays_Destination", "Montant", "anomaly_score", "Date"]])
+        self._recents = None
+
+    def _lignes_recentes(self):
+        if self._recents is None and self._lots:
+            recents = pd.concat(self._lots, ignore_index=True)
+            self._recents = {
+                "Pays_Origine": recents["Pays_Origine"].astype(object).to_numpy(),
+                "Pays_Destination": recents["Pays_Destination"].astype(object).to_numpy(),
+                "Montant": recents["Montant"].to_numpy(dtype=np.float64),
+                "anomaly_score": recents["anomaly_score"].to_numpy(dtype=np.float64),
+                "Date": recents["Date"].to_numpy().astype(f"datetime64[{self.unite_date}]").view(np.int64),
+            }
+        return self._recents
+
+    def _comptes_recents(self, pays_origine, pays_destination, montant, score, date):
+        recents = self._lignes_recentes()
+        if recents is None:
+            return 0
+        scores = recents["anomaly_score"]
+        garder = ~np.isnan(scores)
+        if pays_origine:
+            garder &= np.isin(recents["Pays_Origine"], list(pays_origine))
+        if pays_destination:
+            garder &= np.isin(recents["Pays_Destination"], list(pays_destination))
+        for colonne, plage in (("Montant", montant), ("anomaly_score", score), ("Date", date)):
+            if plage is not None:
+                v = recents[colonne]
+                if colonne == "Date":
+                    garder &= v != np.iinfo(np.int64).min  # NaT
+                if plage[0] is not None:
+                    garder &= v >= plage[0]
+                if plage[1] is not None:
+                    garder &= v <= plage[1]
+        return np.bincount(self.classe_de(scores[garder]), minlength=self.bins)
+
+    def classe_de(self, scores):
+        return np.clip(np.searchsorted(self.edges, scores, side="right") - 1, 0, self.bins - 1)
+
+    def _borne_date(self, valeur):
+        return np.datetime64(pd.Timestamp(valeur), self.unite_date).view(np.int64)
+
+    def _borne_score(self, valeur):
+        # Scores float32 comparés en float64 : la borne 0.9 doit garder le score 0.9
+        # (0.8999999762 en float32), comme FilterEngine et le filtre de la table
+        return None if valeur is None else float(self.type_score(valeur))
+
+    @staticmethod
+    def _couverture(mini, maxi, plage):
+        # (groupes touchés par la plage, groupes entièrement contenus dans la plage)
+        touches = np.ones(len(mini), dtype=bool)
+        contenus = np.ones(len(mini), dtype=bool)
+        if plage is not None:
+            debut, fin = plage
+            if debut is not None:
+                touches &= maxi >= debut
+                contenus &= mini >= debut
+            if fin is not None:
+                touches &= mini <= fin
+                contenus &= maxi <= fin
+            vide = mini > maxi
+            touches |= vide
+            contenus |= vide
+        return touches, contenus
+
+    def _comptes_partiels(self, cellules, classe, debut, fin):
+        # Lignes des cellules dont le score est dans la classe ET dans [debut, fin]
+        r0, r1 = self.rang_classe[classe], self.rang_classe[classe + 1]
+        if debut is not None:
+            r0 = max(r0, np.searchsorted(self.scores_distincts, debut, side="left"))
+        if fin is not None:
+            r1 = min(r1, np.searchsorted(self.scores_distincts, fin, side="right"))
+        if r0 >= r1:
+            return 0
+        base = cellules * len(self.scores_distincts)
+        return int((np.searchsorted(self.cles, base + r1) - np.searchsorted(self.cles, base + r0)).sum())
+
+    def _cellules_pays(self, pays_origine, pays_destination):
+        retenues = np.ones(self.nb_cellules, dtype=bool)
+        if pays_origine:
+            codes = self.pays_origine.get_indexer(pd.Index(pays_origine))
+            retenues &= np.isin(self.cell_origine, codes[codes >= 0] + 1)
+        if pays_destination:
+            codes = self.pays_destination.get_indexer(pd.Index(pays_destination))
+            retenues &= np.isin(self.cell_destination, codes[codes >= 0] + 1)
+        return retenues
+
+    def scores_pour(self, pays_origine=None, pays_destination=None):
+        # Scores (non manquants) des lignes des pays choisis, lignes ajoutées comprises
+        lignes = rassembler_csr(self.ordre, self.offsets,
+                                np.flatnonzero(self._cellules_pays(pays_origine, pays_destination)))
+        scores = self.scores[lignes]
+        recents = self._lignes_recentes()
+        if recents is not None:
+            garder = ~np.isnan(recents["anomaly_score"])
+            if pays_origine:
+                garder &= np.isin(recents["Pays_Origine"], list(pays_origine))
+            if pays_destination:
+                garder &= np.isin(recents["Pays_Destination"], list(pays_destination))
+            scores = np.concatenate((scores, recents["anomaly_score"][garder]))
+        return scores
+
+    def counts(self, pays_origine=None, pays_destination=None, montant=None, score=None, date=None):
+        retenues = self._cellules_pays(pays_origine, pays_destination)
+
+        if date is not None:
+            date = tuple(None if d is None else self._borne_date(d) for d in date)
+        if score is not None:
+            score = tuple(self._borne_score(s) for s in score)
+        recents = self._comptes_recents(pays_origine, pays_destination, montant, score, date)
+        mois_touches, mois_contenus = self._couverture(self.mois_min, self.mois_max, date)
+        tranches_touchees, tranches_contenues = self._couverture(self.tranche_min, self.tranche_max, montant)
+        if date is not None:
+            mois_touches[0] = mois_contenus[0] = False  # dates manquantes
+        if montant is not None:
+            tranches_touchees[0] = tranches_contenues[0] = False  # montants manquants
+
+        retenues &= mois_touches[self.cell_mois] & tranches_touchees[self.cell_tranche]
+        interieures = retenues & mois_contenus[self.cell_mois] & tranches_contenues[self.cell_tranche]
+        frontieres = np.flatnonzero(retenues & ~interieures)
+        interieures = np.flatnonzero(interieures)
+
+        # Cellules intérieures : somme des comptes pré-agrégés
+        classes_touchees, classes_contenues = self._couverture(self.classe_min, self.classe_max, score)
+        comptes = np.where(classes_contenues, self.comptes[interieures].sum(axis=0), 0)
+        debut, fin = score if score is not None else (None, None)
+        for classe in np.flatnonzero(classes_touchees & ~classes_contenues):
+            comptes[classe] = self._comptes_partiels(interieures, classe, debut, fin)
+
+        # Cellules coupées par la plage de dates ou de montants : contrôle ligne à ligne
+        lignes = rassembler_csr(self.ordre, self.offsets, frontieres)
+        return comptes + recents + self.counts_for_rows(lignes, montant=montant, score=score, date=date)
+
+    def counts_for_rows(self, lignes, montant=None, score=None, date=None):
+        # Histogramme exact d'un ensemble de lignes (dates déjà converties en entiers)
+        garder = ~np.isnan(self.scores[lignes])
+        for valeurs, plage in ((self.montants, montant), (self.scores, score), (self.dates, date)):
+            if plage is not None:
+                v = valeurs[lignes]
+                if plage[0] is not None:
+                    garder &= v >= plage[0]
+                if plage[1] is not None:
+                    garder &= v <= plage[1]
+        return np.bincount(self.classe[lignes[garder]], minlength=self.bins)
+
+    def counts_for_scores(self, scores):
+        # Histogramme de lignes déjà sélectionnées (recherche par nom), lignes ajoutées comprises
+        scores = np.asarray(scores, dtype=np.float64)
+        return np.bincount(self.classe_de(scores[~np.isnan(scores)]), minlength=self.bins)
+
+    def figure(self, comptes, title, xaxis_title, color=None):
+        centres = (self.edges[:-1] + self.edges[1:]) / 2
+        fig = go.Figure(go.Bar(
+            x=centres, y=comptes, width=np.diff(self.edges),
+            marker_color=color, marker_line_width=0
+        ))
+        fig.update_layout(title=title, xaxis_title=xaxis_title, yaxis_title="count", bargap=0)
+        return fig
@@ -0,0 +1,437 @@
+# IMPORTS
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+import pandas as pd
+import pyarrow as pa
+from pandas.api.types import union_categoricals
+
+# CONFIGURATION
+CSV_PATH = os.environ.get("APP_DASH_CSV", "transactions_analysees_anomalies.csv")
+CACHE_DIR = os.environ.get("APP_DASH_CACHE", ".cache")
+CACHE_VERSION = 5
+# Lecture par projection mémoire d'un fichier Arrow IPC : les workers gunicorn
+# forkés partagent les mêmes pages au lieu de garder chacun une copie du tableau
+PARTAGE_MMAP = os.environ.get("APP_DASH_MMAP", "0") == "1"
+# Chargement des transactions dès la création des applications (sinon au premier
+# callback) : gunicorn l'active pour charger une fois dans le maître avant le fork
+PRECHARGEMENT = os.environ.get("APP_DASH_PRECHARGEMENT", "0") == "1"
+
+COLONNES_CATEGORIELLES = ["Nom_Emetteur", "Nom_Destinataire", "Pays_Origine", "Pays_Destination"]
+COLONNES_DATES = ["Date"]
+FORMAT_DATE = "%Y-%m-%d %H:%M:%S"
+# Types réduits : le score n'a que 4 décimales, anomaly vaut 0 ou 1 (le montant
+# reste en float64, float32 arrondirait les centimes au-delà de quelques 100 000)
+TYPES_COMPACTS = {"anomaly_score": "float32", "anomaly": "int8"}
+# Résumé enregistré avec le cache : valeurs des listes déroulantes et bornes des
+# curseurs, disponibles sans charger les transactions
+COLONNES_MODALITES = ["Pays_Origine", "Pays_Destination"]
+COLONNES_BORNES = ["Montant", "anomaly_score", "Date"]
+
+# DataFrames déjà chargés dans ce processus (chemin -> (signature, df, base, nombre de lots))
+_charges = {}
+# Lots ajoutés depuis le dernier chargement, concaténés à la prochaine lecture
+_lots_en_attente = {}
+# Fonctions appelées avec chaque lot ajouté (chemin -> [fonction(lot)])
+_abonnes = {}
+# Résumés lus dans les métadonnées (chemin -> (signature, résumé))
+_resumes = {}
+
+
+# SIGNATURE DU FICHIER SOURCE
+def _sha256(path, taille_bloc=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloc in iter(lambda: f.read(taille_bloc), b""):
+            h.update(bloc)
+    return h.hexdigest()
+
+
+def source_signature(path=CSV_PATH):
+    st = os.stat(path)
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def _cache_paths(path):
+    # Un seul fichier Parquet (plus un par lot ajouté), sans partition par mois :
+    # chaque vue garde toutes les transactions en mémoire, et les plages de dates
+    # et de montants y sont déjà restreintes sans parcourir la colonne (IndexTrie
+    # de moteur_filtres par searchsorted, cellules mensuelles de HistogramCube).
+    # Un cache partitionné rendait le rechargement complet ~10x plus lent.
+    base = os.path.splitext(os.path.basename(path))[0]
+    return (os.path.join(CACHE_DIR, base + ".parquet"),
+            os.path.join(CACHE_DIR, base + ".meta.json"))
+
+
+def _arrow_path(path):
+    base = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CACHE_DIR, base + ".arrow")
+
+
+def _lots_path(path):
+    # Lots ajoutés après la conversion, un fichier Parquet par lot
+    base = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CACHE_DIR, base + ".lots")
+
+
+def _lire_meta(meta_path):
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _ecrire_meta(meta_path, meta):
+    tmp = f"{meta_path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, meta_path)
+
+
+def cache_valide(path=CSV_PATH):
+    # Vérification rapide par mtime/taille ; si seul le mtime a changé
+    # (fichier recopié ou "touché"), on compare le hash avant de reconvertir.
+    parquet_path, meta_path = _cache_paths(path)
+    meta = _lire_meta(meta_path)
+    if meta is None or meta.get("version") != CACHE_VERSION or not os.path.exists(parquet_path):
+        return False
+
+    signature = source_signature(path)
+    if meta["mtime_ns"] == signature["mtime_ns"] and meta["size"] == signature["size"]:
+        return True
+    if meta["size"] != signature["size"] or not meta.get("sha256") or meta["sha256"] != _sha256(path):
+        return False
+
+    meta.update(signature)
+    _ecrire_meta(meta_path, meta)
+    return True
+
+
+# CONVERSION CSV -> PARQUET TYPÉ
+def compacter(df):
+    for col, type_compact in TYPES_COMPACTS.items():
+        if col in df.columns and df[col].dtype != type_compact:
+            if not pd.api.types.is_float_dtype(type_compact) and df[col].isna().any():
+                continue  # entier impossible avec des valeurs manquantes
+            df[col] = df[col].astype(type_compact)
+    return df
+
+
+def lire_csv(path=CSV_PATH):
+    return compacter(pd.read_csv(
+        path,
+        dtype={col: "category" for col in COLONNES_CATEGORIELLES},
+        parse_dates=COLONNES_DATES,
+    ))
+
+
+def rapport_memoire(avant, apres):
+    # Octets par colonne avant/après (valeurs Python des chaînes comprises)
+    rapport = pd.DataFrame({
+        "type_avant": avant.dtypes.astype(str),
+        "octets_avant": avant.memory_usage(deep=True, index=False),
+        "type_apres": apres.dtypes.astype(str),
+        "octets_apres": apres.memory_usage(deep=True, index=False),
+    })
+    rapport.loc["TOTAL"] = ["", rapport["octets_avant"].sum(), "", rapport["octets_apres"].sum()]
+    rapport["gain"] = 1 - rapport["octets_apres"] / rapport["octets_avant"]
+    return rapport
+
+
+def normaliser(df):
+    df = pd.DataFrame(df)
+    for col in COLONNES_CATEGORIELLES:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    for col in COLONNES_DATES:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col])
+    return compacter(df)
+
+
+def concatener(frames):
+    # Concaténation qui garde les colonnes catégorielles (union des catégories)
+    frames = [f for f in frames if len(f)] or frames[:1]
+    if len(frames) == 1:
+        return frames[0]
+    colonnes = {}
+    for col in frames[0].columns:
+        if all(isinstance(f[col].dtype, pd.CategoricalDtype) for f in frames):
+            colonnes[col] = pd.Series(union_categoricals([f[col] for f in frames], sort_categories=True), name=col)
+    df = pd.concat([f.drop(columns=list(colonnes)) for f in frames], ignore_index=True)
+    for col, serie in colonnes.items():
+        df[col] = serie
+    return df[list(frames[0].columns)]
+
+
+# RÉSUMÉ (listes déroulantes, bornes des curseurs, compteurs)
+def _resumer(df, precedent=None):
+    # Résumé de df, fusionné avec celui des lignes déjà présentes s'il y en a
+    resume = {"lignes": len(df), "anomalies": int((df["anomaly"] == 1).sum()) if "anomaly" in df else 0}
+    for col in COLONNES_MODALITES:
+        if col in df.columns:
+            resume[col] = sorted(str(v) for v in df[col].dropna().unique())
+    for col in COLONNES_BORNES:
+        if col in df.columns:
+            resume[col] = [_stat(df[col].min()), _stat(df[col].max())]
+    if precedent is None:
+        return resume
+
+    resume["lignes"] += precedent["lignes"]
+    resume["anomalies"] += precedent["anomalies"]
+    for col in COLONNES_MODALITES:
+        if col in precedent:
+            resume[col] = sorted(set(precedent[col]) | set(resume.get(col, [])))
+    for col in COLONNES_BORNES:
+        if col in precedent:
+            mini = [v for v in (precedent[col][0], resume.get(col, [None, None])[0]) if v is not None]
+            maxi = [v for v in (precedent[col][1], resume.get(col, [None, None])[1]) if v is not None]
+            resume[col] = [min(mini, default=None), max(maxi, default=None)]
+    return resume
+
+
+def resume(path=CSV_PATH):
+    # Résumé précalculé lu dans les métadonnées du cache (construit si besoin),
+    # relu seulement quand le fichier source change
+    signature = source_signature(path)
+    deja = _resumes.get(path)
+    if deja is None or deja[0] != signature:
+        deja = _resumes[path] = (signature, _assurer_cache(path)["resume"])
+    return deja[1]
+
+
+def _stat(valeur):
+    # Min/max JSON (None pour une colonne sans valeur)
+    if pd.isna(valeur):
+        return None
+    return valeur.isoformat() if isinstance(valeur, pd.Timestamp) else float(valeur)
+
+
+def construire_cache(path=CSV_PATH):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    parquet_path, meta_path = _cache_paths(path)
+    shutil.rmtree(_lots_path(path), ignore_errors=True)
+
+    signature = source_signature(path)
+    df = lire_csv(path)
+    sha256 = _sha256(path)
+
+    # Écriture atomique : plusieurs workers peuvent reconstruire en même temps
+    tmp = f"{parquet_path}.{os.getpid()}.tmp"
+    df.to_parquet(tmp, engine="pyarrow", index=False)
+    os.replace(tmp, parquet_path)
+
+    _ecrire_meta(meta_path, {
+        "version": CACHE_VERSION,
+        "source": os.path.abspath(path),
+        "sha256": sha256,
+        # Identité de cette construction : les lots ne s'ajoutent qu'aux chargements de la même base
+        "base": f"{sha256}:{signature['mtime_ns']}",
+        "rows": len(df),
+        "lots": [],
+        "resume": _resumer(df),
+        **signature,
+    })
+    return df
+
+
+def _lire_cache(path):
+    parquet_path, meta_path = _cache_paths(path)
+    frames = [pd.read_parquet(parquet_path, engine="pyarrow")]
+    for nom in _lire_meta(meta_path).get("lots", []):
+        frames.append(pd.read_parquet(os.path.join(_lots_path(path), nom), engine="pyarrow"))
+    return concatener(frames)
+
+
+# COPIE ARROW IPC PROJETÉE EN MÉMOIRE (mode gunicorn preload)
+def _ecrire_arrow(path, df):
+    # Non compressé : les colonnes sont lues directement dans les pages du fichier
+    arrow_path = _arrow_path(path)
+    tmp = f"{arrow_path}.{os.getpid()}.tmp"
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(tmp, "wb") as f, pa.ipc.new_file(f, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, arrow_path)
+
+    _, meta_path = _cache_paths(path)
+    meta = _lire_meta(meta_path)
+    if meta is not None:
+        meta["arrow_rows"] = len(df)
+        _ecrire_meta(meta_path, meta)
+
+
+def _lire_arrow(path):
+    # Colonnes numériques, dates et codes catégoriels sans copie (lecture seule)
+    source = pa.memory_map(_arrow_path(path), "r")
+    return pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True)
+
+
+def _charger_partage(path, df):
+    meta = _lire_meta(_cache_paths(path)[1]) or {}
+    if df is not None or meta.get("arrow_rows") != meta.get("rows") or not os.path.exists(_arrow_path(path)):
+        _ecrire_arrow(path, df if df is not None else _lire_cache(path))
+    return _lire_arrow(path)
+
+
+# CHARGEMENT PARTAGÉ PAR LES TABLEAUX DE BORD
+class Paresseux:
+    # Valeur construite au premier appel, une seule fois même si plusieurs threads
+    # la demandent en même temps (données et index d'un tableau de bord)
+    def __init__(self, construire):
+        self._construire = construire
+        self._valeur = None
+        self._verrou = threading.Lock()
+
+    def __call__(self):
+        if self._valeur is None:
+            with self._verrou:
+                if self._valeur is None:
+                    self._valeur = self._construire()
+        return self._valeur
+
+    @property
+    def pret(self):
+        return self._valeur is not None
+
+
+def _assurer_cache(path):
+    # Métadonnées d'un cache à jour (reconstruit si besoin)
+    if not cache_valide(path):
+        construire_cache(path)
+    return _lire_meta(_cache_paths(path)[1])
+
+
+def _charger(path):
+    # (df, base) : lots ajoutés dans ce processus concaténés à la lecture suivante,
+    # lots ajoutés par un autre processus relus seuls dans le cache (.lots/) ;
+    # relecture complète si le fichier source a été réécrit
+    signature = source_signature(path)
+    deja = _charges.get(path)
+    if deja is not None and deja[0] == signature:
+        lots = _lots_en_attente.pop(path, None)
+        if lots:
+            deja = _charges[path] = (signature, concatener([deja[1], *lots]), deja[2], deja[3] + len(lots))
+        return deja[1], deja[2]
+
+    _lots_en_attente.pop(path, None)
+    meta = _lire_meta(_cache_paths(path)[1]) if cache_valide(path) else None
+    if (deja is not None and meta is not None and meta.get("base") == deja[2]
+            and len(meta["lots"]) > deja[3]):
+        nouveaux = [pd.read_parquet(os.path.join(_lots_path(path), nom), engine="pyarrow")
+                    for nom in meta["lots"][deja[3]:]]
+        df = concatener([deja[1], *nouveaux])
+        if len(df) == meta["rows"]:
+            _charges[path] = (signature, df, meta["base"], len(meta["lots"]))
+            return df, meta["base"]
+
+    if meta is not None:
+        df = _charger_partage(path, None) if PARTAGE_MMAP else _lire_cache(path)
+    else:
+        df = construire_cache(path)
+        if PARTAGE_MMAP:
+            df = _charger_partage(path, df)
+        meta = _lire_meta(_cache_paths(path)[1])
+
+    _charges[path] = (signature, df, meta.get("base"), len(meta["lots"]))
+    return df, meta.get("base")
+
+
+def load_transactions(path=CSV_PATH):
+    return _charger(path)[0]
+
+
+class AJour:
+    # Valeur dérivée des transactions (index, histogrammes, KPI) tenue à jour
+    # dans chaque processus : construire(df) au premier appel ou si le fichier
+    # source a été réécrit, etendre(valeur, df, debut) pour les seules lignes
+    # df.iloc[debut:] ajoutées depuis, par ce worker ou par un autre
+    def __init__(self, construire, etendre, path=CSV_PATH):
+        self._construire = construire
+        self._etendre = etendre
+        self.path = path
+        self._valeur = None
+        self._etat = None  # (signature, base, nombre de lignes) de la valeur
+        self._verrou = threading.Lock()
+
+    def __call__(self):
+        signature = source_signature(self.path)
+        etat = self._etat
+        if etat is None or etat[0] != signature:
+            with self._verrou:
+                if self._etat is None or self._etat[0] != signature:
+                    df, base = _charger(self.path)
+                    if self._etat is None or self._etat[1] != base or len(df) < self._etat[2]:
+                        valeur = self._construire(df)
+                    elif len(df) > self._etat[2]:
+                        valeur = self._etendre(self._valeur, df, self._etat[2])
+                    else:
+                        valeur = self._valeur
+                    self._valeur, self._etat = valeur, (signature, base, len(df))
+        return self._valeur
+
+    @property
+    def pret(self):
+        return self._valeur is not None
+
+
+# AJOUT DE TRANSACTIONS (flux continu)
+def abonner(fonction, path=CSV_PATH):
+    # fonction(lot) est appelée pour chaque lot ajouté à ce fichier dans le processus
+    _abonnes.setdefault(path, []).append(fonction)
+
+
+def append_transactions(lot, path=CSV_PATH):
+    # Ajoute un lot au CSV source et au cache Parquet sans relire l'historique :
+    # les agrégats abonnés sont mis à jour avec le seul lot, les lignes ne sont
+    # concaténées que si une vue ligne à ligne relit les données.
+    lot = normaliser(lot)
+    colonnes = list(pd.read_csv(path, nrows=0).columns)
+    lot = lot[colonnes]
+
+    avant = source_signature(path)
+    # Format de date fixe : un lot dont toutes les heures sont à minuit serait
+    # écrit sans heure, et read_csv laisserait alors la colonne en texte
+    lot.to_csv(path, mode="a", header=False, index=False, date_format=FORMAT_DATE)
+    signature = source_signature(path)
+
+    # Cache Parquet : le lot devient un fichier de plus si le cache était à jour
+    parquet_path, meta_path = _cache_paths(path)
+    meta = _lire_meta(meta_path)
+    if (meta is not None and meta.get("version") == CACHE_VERSION and os.path.exists(parquet_path)
+            and meta["mtime_ns"] == avant["mtime_ns"] and meta["size"] == avant["size"]):
+        os.makedirs(_lots_path(path), exist_ok=True)
+        nom = f"{len(meta.get('lots', [])):06d}.parquet"
+        lot.to_parquet(os.path.join(_lots_path(path), nom), engine="pyarrow", index=False)
+        meta.update(signature, sha256=None, rows=meta["rows"] + len(lot), lots=[*meta.get("lots", []), nom],
+                    resume=_resumer(lot, meta["resume"]))
+        _ecrire_meta(meta_path, meta)
+
+    deja = _charges.get(path)
+    if deja is not None and deja[0] == avant:
+        _charges[path] = (signature, *deja[1:])
+        _lots_en_attente.setdefault(path, []).append(lot)
+
+    for fonction in _abonnes.get(path, []):
+        fonction(lot)
+    return signature
+
+
+# PRÉ-CONSTRUCTION DU CACHE (ex. avant de lancer gunicorn)
+if __name__ == '__main__':
+    import time
+
+    debut = time.perf_counter()
+    df = construire_cache()
+    print(f"Cache construit : {len(df):,} lignes en {time.perf_counter() - debut:.2f} s")
+
+    debut = time.perf_counter()
+    pd.read_parquet(_cache_paths(CSV_PATH)[0], engine="pyarrow")
+    print(f"Relecture depuis le cache : {time.perf_counter() - debut:.2f} s")
+    print(f"Mémoire : {df.memory_usage(deep=True).sum() / 1e6:.1f} Mo")
+
+    # Lecture brute (chaînes, float64, int64) comparée à la représentation compacte
+    print(rapport_memoire(pd.read_csv(CSV_PATH), df).to_string())
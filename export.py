@@ -0,0 +1,86 @@
+# EXPORT EN FLUX DES ANOMALIES FILTRÉES (CSV ou Parquet)
+# Les lignes sélectionnées (ids) sont sérialisées par morceaux dans une réponse
+# Flask en flux : la mémoire reste bornée par un morceau, quel que soit le
+# nombre de lignes exportées, et le téléchargement démarre immédiatement.
+import io
+from urllib.parse import urlencode
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from flask import Response
+
+TAILLE_MORCEAU = 50_000
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class _Sortie(io.RawIOBase):
+    # Fichier en écriture seule vidé après chaque groupe de lignes ; tell()
+    # reste la position absolue, dont le pied de page Parquet a besoin
+    def __init__(self):
+        super().__init__()
+        self._morceaux = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, donnees):
+        self._morceaux.append(bytes(donnees))
+        self._position += len(donnees)
+        return len(donnees)
+
+    def tell(self):
+        return self._position
+
+    def vider(self):
+        donnees = b"".join(self._morceaux)
+        self._morceaux = []
+        return donnees
+
+
+def _morceaux(frame, ids, colonnes, taille):
+    # frame[colonnes] recopierait tout le tableau : on ne copie que le morceau
+    positions = frame.columns.get_indexer(colonnes)
+    for debut in range(0, len(ids), taille):
+        yield frame.iloc[ids[debut:debut + taille], positions]
+
+
+def flux_csv(frame, ids, colonnes, taille=TAILLE_MORCEAU):
+    yield frame.iloc[:0][colonnes].to_csv(index=False)
+    for morceau in _morceaux(frame, ids, colonnes, taille):
+        yield morceau.to_csv(index=False, header=False)
+
+
+def flux_parquet(frame, ids, colonnes, taille=TAILLE_MORCEAU):
+    # Un groupe de lignes Parquet par morceau, envoyé dès qu'il est écrit
+    schema = pa.Schema.from_pandas(frame.iloc[:0][colonnes], preserve_index=False)
+    sortie = _Sortie()
+    with pq.ParquetWriter(sortie, schema) as writer:
+        for morceau in _morceaux(frame, ids, colonnes, taille):
+            writer.write_table(pa.Table.from_pandas(morceau, schema=schema, preserve_index=False))
+            yield sortie.vider()
+    yield sortie.vider()
+
+
+def reponse_export(frame, ids, format, nom, colonnes=None, taille=TAILLE_MORCEAU):
+    if format not in FORMATS:
+        return Response(f"Format inconnu : {format}", status=400, mimetype="text/plain")
+    colonnes = list(colonnes or frame.columns)
+    ids = np.asarray(ids, dtype=np.int64)
+    flux = flux_csv if format == "csv" else flux_parquet
+    return Response(
+        flux(frame, ids, colonnes, taille),
+        mimetype=FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{nom}.{format}"',
+                 "X-Export-Lignes": str(len(ids))},
+    )
+
+
+def lien_export(chemin, **parametres):
+    # URL de téléchargement portant l'état des filtres (listes répétées, None omis)
+    parametres = {cle: v for cle, v in parametres.items() if v is not None and v != ""}
+    return f"{chemin}?{urlencode(parametres, doseq=True)}" if parametres else chemin
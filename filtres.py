@@ -1,248 +1,397 @@
-# IMPORTS OPTIMISÉS
-import dash
-from dash import dcc, html, dash_table, Input, Output, callback
-import pandas as pd
-import plotly.express as px
-from datetime import datetime
-
-# CHARGEMENT DES DONNÉES (OPTIMISÉ)
-df = pd.read_csv("transactions_analysees_anomalies.csv", parse_dates=['Date'])
-df_filtered = df[df['anomaly'] == 1].copy()  # Pré-filtrage
-
-# INITIALISATION DE L'APP (AVEC CACHE)
-app = dash.Dash(__name__, suppress_callback_exceptions=True)
-app.title = "Filtre avancée de détection d'anomalies"
-
-# STYLE PERSONNALISÉ
-styles = {
-    'filter-box': {
-        'border': '1px solid #ddd',
-        'borderRadius': '5px',
-        'padding': '15px',
-        'margin': '10px',
-        'backgroundColor': '#f9f9f9'
-    },
-    'filter-row': {
-        'display': 'flex',
-        'justifyContent': 'space-between',
-        'marginBottom': '15px'
-    },
-    'filter-col': {
-        'width': '48%',
-        'display': 'inline-block'
-    },
-    'slider-container': {
-        'padding': '20px 10px'
-    }
-}
-
-# LAYOUT AMÉLIORÉ
-app.layout = html.Div([
-    html.H1("Détection des anomalies financières", style={'textAlign': 'center', 'color': '#2c3e50'}),
-    
-    # SECTION FILTRES
-    html.Div([
-        html.Div([
-            # PREMIÈRE LIGNE DE FILTRES
-            html.Div([
-                html.Div([
-                    html.Label("Pays d'origine", style={'fontWeight': 'bold'}),
-                    dcc.Dropdown(
-                        id="filtre_pays_origine",
-                        options=[{'label': 'Tous', 'value': 'all'}] + 
-                                [{"label": p, "value": p} for p in sorted(df["Pays_Origine"].unique())],
-                        multi=True,
-                        placeholder="Sélectionnez...",
-                        style={'marginTop': '5px'}
-                    )
-                ], style=styles['filter-col']),
-                
-                html.Div([
-                    html.Label("Pays de destination", style={'fontWeight': 'bold'}),
-                    dcc.Dropdown(
-                        id="filtre_pays_destination",
-                        options=[{'label': 'Tous', 'value': 'all'}] + 
-                                [{"label": p, "value": p} for p in sorted(df["Pays_Destination"].unique())],
-                        multi=True,
-                        placeholder="Sélectionnez...",
-                        style={'marginTop': '5px'}
-                    )
-                ], style=styles['filter-col'])
-            ], style=styles['filter-row']),
-            
-            # SLIDER MONTANT
-            html.Div([
-                html.Label("Plage de montant", style={'fontWeight': 'bold'}),
-                dcc.RangeSlider(
-                    id="filtre_montant",
-                    min=df['Montant'].min(),
-                    max=df['Montant'].max(),
-                    step=10,
-                    value=[df['Montant'].min(), df['Montant'].max()],
-                    marks={int(df['Montant'].min()): str(int(df['Montant'].min())),
-                           int(df['Montant'].max()): str(int(df['Montant'].max()))},
-                    tooltip={"placement": "bottom", "always_visible": False}
-                )
-            ], style=styles['slider-container']),
-            
-            # DATE PICKER
-            html.Div([
-                html.Label("Plage de dates", style={'fontWeight': 'bold'}),
-                dcc.DatePickerRange(
-                    id="filtre_date",
-                    start_date=df["Date"].min(),
-                    end_date=df["Date"].max(),
-                    min_date_allowed=df["Date"].min(),
-                    max_date_allowed=df["Date"].max(),
-                    display_format='YYYY-MM-DD',
-                    style={'marginTop': '5px'}
-                )
-            ], style={'marginBottom': '15px'}),
-            
-            # SLIDER SCORE ANOMALIE
-            html.Div([
-                html.Label("Score d'anomalie", style={'fontWeight': 'bold'}),
-                dcc.RangeSlider(
-                    id='filtre_score',
-                    min=0,
-                    max=1,
-                    step=0.01,
-                    value=[0, 1],
-                    marks={0: '0', 0.5: '0.5', 1: '1'},
-                    tooltip={"placement": "bottom", "always_visible": False}
-                )
-            ], style=styles['slider-container']),
-            
-            # RECHERCHE NOM
-            html.Div([
-                html.Label("Recherche par nom", style={'fontWeight': 'bold'}),
-                dcc.Input(
-                    id="filtre_nom",
-                    type="text",
-                    placeholder="Entrez un nom...",
-                    debounce=True,
-                    style={
-                        'width': '100%',
-                        'padding': '8px',
-                        'borderRadius': '4px',
-                        'border': '1px solid #ddd'
-                    }
-                )
-            ])
-        ], style=styles['filter-box'])
-    ]),
-    
-    # VISUALISATION
-    dcc.Loading(
-        id="loading-graph",
-        type="circle",
-        children=[
-            dcc.Graph(
-                id="histogramme_anomalie",
-                style={'height': '400px'}
-            )
-        ]
-    ),
-    
-    # TABLEAU
-    html.H2("Transactions suspectes", style={'marginTop': '30px'}),
-    dcc.Loading(
-        id="loading-table",
-        type="circle",
-        children=[
-            dash_table.DataTable(
-                id="table_anomalies",
-                columns=[{"name": col, "id": col} for col in [
-                    "Date", "Nom_Emetteur", "Nom_Destinataire", "Montant",
-                    "Pays_Origine", "Pays_Destination", "anomaly_score"
-                ]],
-                page_size=15,
-                style_table={
-                    'overflowX': 'auto',
-                    'boxShadow': '0 0 5px #eee'
-                },
-                style_header={
-                    'backgroundColor': '#2c3e50',
-                    'color': 'white',
-                    'fontWeight': 'bold'
-                },
-                style_cell={
-                    'textAlign': 'left',
-                    'padding': '10px',
-                    'whiteSpace': 'normal',
-                    'height': 'auto'
-                },
-                filter_action='native',
-                sort_action='native'
-            )
-        ]
-    )
-])
-
-# CALLBACK OPTIMISÉ
-@callback(
-    [Output("histogramme_anomalie", "figure"),
-     Output("table_anomalies", "data")],
-    [Input("filtre_pays_origine", "value"),
-     Input("filtre_pays_destination", "value"),
-     Input("filtre_montant", "value"),
-     Input("filtre_score", "value"),
-     Input("filtre_nom", "value"),
-     Input("filtre_date", "start_date"),
-     Input("filtre_date", "end_date")]
-)
-def update_dashboard(pays_origine, pays_destination, montant_range, score_range, nom_recherche, date_start, date_end):
-    # Copie du DataFrame pré-filtré
-    dff = df_filtered.copy()
-    
-    # Application des filtres
-    if pays_origine and 'all' not in pays_origine:
-        dff = dff[dff["Pays_Origine"].isin(pays_origine)]
-    
-    if pays_destination and 'all' not in pays_destination:
-        dff = dff[dff["Pays_Destination"].isin(pays_destination)]
-    
-    dff = dff[
-        (dff["Montant"] >= montant_range[0]) & 
-        (dff["Montant"] <= montant_range[1])
-    ]
-    
-    dff = dff[
-        (dff["anomaly_score"] >= score_range[0]) & 
-        (dff["anomaly_score"] <= score_range[1])
-    ]
-    
-    if date_start and date_end:
-        dff = dff[
-            (dff["Date"] >= pd.to_datetime(date_start)) & 
-            (dff["Date"] <= pd.to_datetime(date_end))
-        ]
-    
-    if nom_recherche:
-        nom = nom_recherche.lower()
-        dff = dff[
-            dff["Nom_Emetteur"].str.lower().str.contains(nom, na=False) |
-            dff["Nom_Destinataire"].str.lower().str.contains(nom, na=False)
-        ]
-    
-    # Création du graphique
-    fig = px.histogram(
-        dff,
-        x="anomaly_score",
-        nbins=30,
-        title="Distribution des scores d'anomalie",
-        labels={"anomaly_score": "Score d'anomalie"},
-        color_discrete_sequence=['#e74c3c']
-    )
-    
-    fig.update_layout(
-        plot_bgcolor='white',
-        paper_bgcolor='#f9f9f9',
-        margin={'t': 40}
-    )
-    
-    return fig, dff.to_dict('records')
-
-# LANCEMENT
-if __name__ == '__main__':
-	app.run(debug=True, port=8051)
+# IMPORTS OPTIMISÉS
+import dash
+from dash import dcc, html, dash_table, Input, Output
+import json
+from types import SimpleNamespace
+from flask import jsonify, request
+
+from cubes import HistogramCube
+from donnees import PRECHARGEMENT, AJour, Paresseux, resume
+from export import lien_export, reponse_export
+from instrumentation import etape, instrumenter
+from memo import MemoCache
+from moteur_filtres import ids_anomalies, index_anomalies
+from pagination import filtrer_ids, page_records, trier_ids
+
+memo = MemoCache("filtres")  # sélections et figures déjà calculées
+
+
+# Identifiants des composants préfixés par la vue (voir app_dash.ident)
+def ident(nom):
+    return f"filtres-{nom}"
+
+
+# CHARGEMENT DES DONNÉES (CACHE PARQUET PARTAGÉ), AU PREMIER CALLBACK
+# Le layout se construit avec le résumé précalculé (donnees.resume) ; le moteur
+# et les ids des anomalies sont ceux de moteur_filtres, partagés avec app_dash.
+# Tous deux suivent les lots ajoutés (append_transactions, tous workers) : table,
+# recherche par nom, histogramme et export voient les mêmes lignes.
+def _contexte(df):
+    # Histogrammes pré-agrégés des anomalies
+    return SimpleNamespace(df=df, cube=HistogramCube(df.iloc[ids_anomalies(df)], bins=30))
+
+
+def _ajouter_lignes(contexte, df, debut):
+    contexte.cube.ajouter(df.iloc[ids_anomalies(df, debut)])
+    return SimpleNamespace(df=df, cube=contexte.cube)
+
+
+contexte = AJour(_contexte, _ajouter_lignes)
+
+
+def precharger():
+    contexte()
+    index_anomalies()
+
+
+def cache_stats():
+    return jsonify(memo.stats())
+
+# TYPES DES COLONNES DU TABLEAU (pour la syntaxe des filtres)
+COLUMN_TYPES = {"Date": "datetime", "Montant": "numeric", "anomaly_score": "numeric"}
+COLONNES_TABLE = ["Date", "Nom_Emetteur", "Nom_Destinataire", "Montant",
+                  "Pays_Origine", "Pays_Destination", "anomaly_score"]
+
+# STYLE PERSONNALISÉ
+styles = {
+    'filter-box': {
+        'border': '1px solid #ddd',
+        'borderRadius': '5px',
+        'padding': '15px',
+        'margin': '10px',
+        'backgroundColor': '#f9f9f9'
+    },
+    'filter-row': {
+        'display': 'flex',
+        'justifyContent': 'space-between',
+        'marginBottom': '15px'
+    },
+    'filter-col': {
+        'width': '48%',
+        'display': 'inline-block'
+    },
+    'slider-container': {
+        'padding': '20px 10px'
+    }
+}
+
+# LAYOUT AMÉLIORÉ (listes et bornes lues dans le résumé, sans charger les transactions)
+def serve_layout():
+    infos = resume()
+    montant_min, montant_max = infos['Montant']
+    date_min, date_max = infos['Date']
+    return html.Div([
+        html.H1("Détection des anomalies financières", style={'textAlign': 'center', 'color': '#2c3e50'}),
+    
+        # SECTION FILTRES
+        html.Div([
+            html.Div([
+                # PREMIÈRE LIGNE DE FILTRES
+                html.Div([
+                    html.Div([
+                        html.Label("Pays d'origine", style={'fontWeight': 'bold'}),
+                        dcc.Dropdown(
+                            id=ident("filtre_pays_origine"),
+                            options=[{'label': 'Tous', 'value': 'all'}] + 
+                                    [{"label": p, "value": p} for p in infos["Pays_Origine"]],
+                            multi=True,
+                            placeholder="Sélectionnez...",
+                            style={'marginTop': '5px'}
+                        )
+                    ], style=styles['filter-col']),
+                
+                    html.Div([
+                        html.Label("Pays de destination", style={'fontWeight': 'bold'}),
+                        dcc.Dropdown(
+                            id=ident("filtre_pays_destination"),
+                            options=[{'label': 'Tous', 'value': 'all'}] + 
+                                    [{"label": p, "value": p} for p in infos["Pays_Destination"]],
+                            multi=True,
+                            placeholder="Sélectionnez...",
+                            style={'marginTop': '5px'}
+                        )
+                    ], style=styles['filter-col'])
+                ], style=styles['filter-row']),
+            
+                # SLIDER MONTANT
+                html.Div([
+                    html.Label("Plage de montant", style={'fontWeight': 'bold'}),
+                    dcc.RangeSlider(
+                        id=ident("filtre_montant"),
+                        min=montant_min,
+                        max=montant_max,
+                        step=10,
+                        value=[montant_min, montant_max],
+                        marks={int(montant_min): str(int(montant_min)),
+                               int(montant_max): str(int(montant_max))},
+                        tooltip={"placement": "bottom", "always_visible": False}
+                    )
+                ], style=styles['slider-container']),
+            
+                # DATE PICKER
+                html.Div([
+                    html.Label("Plage de dates", style={'fontWeight': 'bold'}),
+                    dcc.DatePickerRange(
+                        id=ident("filtre_date"),
+                        start_date=date_min,
+                        end_date=date_max,
+                        min_date_allowed=date_min,
+                        max_date_allowed=date_max,
+                        display_format='YYYY-MM-DD',
+                        style={'marginTop': '5px'}
+                    )
+                ], style={'marginBottom': '15px'}),
+            
+                # SLIDER SCORE ANOMALIE
+                html.Div([
+                    html.Label("Score d'anomalie", style={'fontWeight': 'bold'}),
+                    dcc.RangeSlider(
+                        id=ident("filtre_score"),
+                        min=0,
+                        max=1,
+                        step=0.01,
+                        value=[0, 1],
+                        marks={0: '0', 0.5: '0.5', 1: '1'},
+                        tooltip={"placement": "bottom", "always_visible": False}
+                    )
+                ], style=styles['slider-container']),
+            
+                # RECHERCHE NOM
+                html.Div([
+                    html.Label("Recherche par nom", style={'fontWeight': 'bold'}),
+                    dcc.Input(
+                        id=ident("filtre_nom"),
+                        type="text",
+                        placeholder="Entrez un nom...",
+                        debounce=True,
+                        style={
+                            'width': '100%',
+                            'padding': '8px',
+                            'borderRadius': '4px',
+                            'border': '1px solid #ddd'
+                        }
+                    ),
+                    dcc.RadioItems(
+                        id=ident("filtre_nom_mode"),
+                        options=[
+                            {'label': 'Contient', 'value': 'contains'},
+                            {'label': 'Commence par', 'value': 'prefix'},
+                            {'label': 'Approché', 'value': 'fuzzy'}
+                        ],
+                        value='contains',
+                        inline=True,
+                        inputStyle={'marginRight': '5px', 'marginLeft': '10px'},
+                        style={'marginTop': '5px'}
+                    )
+                ])
+            ], style=styles['filter-box'])
+        ]),
+    
+        # VISUALISATION
+        dcc.Loading(
+            id=ident("loading-graph"),
+            type="circle",
+            children=[
+                dcc.Graph(
+                    id=ident("histogramme_anomalie"),
+                    style={'height': '400px'}
+                )
+            ]
+        ),
+    
+        # TABLEAU
+        html.H2("Transactions suspectes", style={'marginTop': '30px'}),
+        html.Div([
+            html.A("Exporter en CSV", id=ident("export_csv"), download="anomalies.csv"),
+            html.Span(" | "),
+            html.A("Exporter en Parquet", id=ident("export_parquet"), download="anomalies.parquet"),
+        ], style={'textAlign': 'right', 'marginBottom': '10px'}),
+        dcc.Loading(
+            id=ident("loading-table"),
+            type="circle",
+            children=[
+                dash_table.DataTable(
+                    id=ident("table_anomalies"),
+                    columns=[{"name": col, "id": col, "type": COLUMN_TYPES.get(col, "text")}
+                             for col in COLONNES_TABLE],
+                    page_current=0,
+                    page_size=15,
+                    page_action='custom',
+                    style_table={
+                        'overflowX': 'auto',
+                        'boxShadow': '0 0 5px #eee'
+                    },
+                    style_header={
+                        'backgroundColor': '#2c3e50',
+                        'color': 'white',
+                        'fontWeight': 'bold'
+                    },
+                    style_cell={
+                        'textAlign': 'left',
+                        'padding': '10px',
+                        'whiteSpace': 'normal',
+                        'height': 'auto'
+                    },
+                    filter_action='custom',
+                    filter_query='',
+                    sort_action='custom',
+                    sort_mode='multi',
+                    sort_by=[]
+                )
+            ]
+        )
+    ])
+
+# SÉLECTION COMMUNE AU GRAPHIQUE ET AU TABLEAU
+FILTRES = [Input(ident("filtre_pays_origine"), "value"),
+           Input(ident("filtre_pays_destination"), "value"),
+           Input(ident("filtre_montant"), "value"),
+           Input(ident("filtre_score"), "value"),
+           Input(ident("filtre_nom"), "value"),
+           Input(ident("filtre_nom_mode"), "value"),
+           Input(ident("filtre_date"), "start_date"),
+           Input(ident("filtre_date"), "end_date")]
+
+
+def pays_selectionnes(valeurs):
+    return valeurs if valeurs and 'all' not in valeurs else None
+
+
+@memo.memoiser
+def selectionner(pays_origine, pays_destination, montant_range, score_range, nom_recherche, nom_mode,
+                 date_start, date_end):
+    # Sélection des lignes via les index pré-construits (sans copie),
+    # la recherche par nom passant par l'index de trigrammes
+    return index_anomalies().moteur.select(
+        pays_origine=pays_selectionnes(pays_origine),
+        pays_destination=pays_selectionnes(pays_destination),
+        montant=montant_range,
+        score=score_range,
+        date=(date_start, date_end) if date_start and date_end else None,
+        nom=nom_recherche,
+        mode_nom=nom_mode or 'contains'
+    )
+
+# CALLBACK OPTIMISÉ
+@memo.memoiser
+def update_dashboard(pays_origine, pays_destination, montant_range, score_range, nom_recherche, nom_mode,
+                     date_start, date_end):
+    cube = contexte().cube
+    if nom_recherche:
+        # Le nom n'est pas une dimension du cube : histogramme des lignes retenues
+        with etape("filtrage"):
+            selection = selectionner(pays_origine, pays_destination, montant_range, score_range,
+                                     nom_recherche, nom_mode, date_start, date_end)
+        with etape("histogramme"):
+            index = index_anomalies()
+            comptes = cube.counts_for_scores(index.df["anomaly_score"].to_numpy()[index.ids[selection]])
+    else:
+        with etape("histogramme"):
+            comptes = cube.counts(
+                pays_origine=pays_selectionnes(pays_origine),
+                pays_destination=pays_selectionnes(pays_destination),
+                montant=montant_range,
+                score=score_range,
+                date=(date_start, date_end) if date_start and date_end else None
+            )
+    
+    # Création du graphique (30 barres pré-agrégées)
+    with etape("figure"):
+        fig = cube.figure(
+            comptes,
+            title="Distribution des scores d'anomalie",
+            xaxis_title="Score d'anomalie",
+            color='#e74c3c'
+        )
+        
+        fig.update_layout(
+            plot_bgcolor='white',
+            paper_bgcolor='#f9f9f9',
+            margin={'t': 40}
+        )
+    
+    return fig
+
+# CALLBACK DU TABLEAU : seule la page affichée est calculée et envoyée
+def update_table(pays_origine, pays_destination, montant_range, score_range, nom_recherche, nom_mode,
+                 date_start, date_end, page_current, page_size, sort_by, filter_query):
+    with etape("filtrage"):
+        selection = selectionner(pays_origine, pays_destination, montant_range, score_range,
+                                 nom_recherche, nom_mode, date_start, date_end)
+    with etape("enregistrements"):
+        index = index_anomalies()
+        return page_records(index.df, index.ids[selection], page_current, page_size,
+                            sort_by, filter_query, COLONNES_TABLE)
+
+# EXPORT DE LA SÉLECTION DU TABLEAU (filtres, filtre de colonnes et tri), EN FLUX
+TABLE = [Input(ident("table_anomalies"), "sort_by"),
+         Input(ident("table_anomalies"), "filter_query")]
+
+
+def update_export_links(pays_origine, pays_destination, montant_range, score_range, nom_recherche, nom_mode,
+                        date_start, date_end, sort_by, filter_query):
+    etat = dict(pays_origine=pays_origine, pays_destination=pays_destination, montant=montant_range,
+                score=score_range, nom=nom_recherche, mode_nom=nom_mode, date_start=date_start, date_end=date_end,
+                filter_query=filter_query, sort_by=json.dumps(sort_by) if sort_by else None)
+    return [lien_export(dash.get_relative_path(f"/export/filtres/anomalies.{format}"), **etat)
+            for format in ("csv", "parquet")]
+
+
+def export_anomalies(format):
+    args = request.args
+    index = index_anomalies()
+    selection = selectionner(args.getlist("pays_origine"), args.getlist("pays_destination"),
+                             args.getlist("montant", type=float) or None, args.getlist("score", type=float) or None,
+                             args.get("nom"), args.get("mode_nom"), args.get("date_start"), args.get("date_end"))
+    ids = filtrer_ids(index.df, index.ids[selection], args.get("filter_query", ""))
+    ids = trier_ids(index.df, ids, json.loads(args.get("sort_by", "[]")))
+    return reponse_export(index.df, ids, format, "anomalies", COLONNES_TABLE)
+
+# ROUTES ET CALLBACKS DE LA VUE, sur cette application ou sur le portail
+def enregistrer(app):
+    app.server.add_url_rule("/export/filtres/anomalies.<format>", "filtres_export", export_anomalies)
+    app.callback(Output(ident("histogramme_anomalie"), "figure"), FILTRES)(update_dashboard)
+    app.callback(
+        [Output(ident("table_anomalies"), "data"),
+         Output(ident("table_anomalies"), "page_count")],
+        FILTRES + [Input(ident("table_anomalies"), "page_current"),
+                   Input(ident("table_anomalies"), "page_size"),
+                   Input(ident("table_anomalies"), "sort_by"),
+                   Input(ident("table_anomalies"), "filter_query")]
+    )(update_table)
+    app.callback(
+        [Output(ident("export_csv"), "href"),
+         Output(ident("export_parquet"), "href")],
+        FILTRES + TABLE
+    )(update_export_links)
+
+
+# INITIALISATION DE L'APP (AVEC CACHE) : layout, routes et callbacks, sans lire
+# les transactions (chargées au premier callback, ou tout de suite si prechargement)
+def create_app(prechargement=PRECHARGEMENT):
+    app = dash.Dash(__name__, suppress_callback_exceptions=True)
+    app.title = "Filtre avancée de détection d'anomalies"
+    app.layout = serve_layout
+    instrumenter(app.server, "filtres")  # Server-Timing et /metrics si APP_DASH_INSTRUMENTATION=1
+    app.server.add_url_rule("/cache-stats", "cache_stats", cache_stats)
+    enregistrer(app)
+
+    if prechargement:
+        precharger()
+    return app
+
+
+# Application par défaut, créée au premier accès à filtres.app ou filtres.server
+_application = Paresseux(create_app)
+
+
+def __getattr__(nom):
+    if nom == "app":
+        return _application()
+    if nom == "server":
+        return _application().server  # point d'entrée WSGI pour gunicorn
+    raise AttributeError(f"module {__name__!r} has no attribute {nom!r}")
+
+# LANCEMENT
+if __name__ == '__main__':
+	create_app().run(debug=True, port=8051)
@@ -0,0 +1,35 @@
+# CONFIGURATION GUNICORN (ex. gunicorn -c gunicorn.conf.py portail:server pour les
+# quatre tableaux de bord dans une seule application, ou app_dash:server, ...)
+# Le tableau de transactions est chargé une seule fois dans le processus maître
+# (preload) depuis un fichier Arrow IPC projeté en mémoire : les workers forkés
+# en lisent les mêmes pages, la mémoire résidente reste stable quand on ajoute
+# des workers.
+import gc
+import os
+import sys
+
+os.environ.setdefault("APP_DASH_MMAP", "1")
+# Les applications ne lisent rien à l'import (create_app) : on demande ici le
+# chargement immédiat, fait une fois dans le maître puis partagé par les workers
+os.environ.setdefault("APP_DASH_PRECHARGEMENT", "1")
+
+bind = os.environ.get("APP_DASH_BIND", "0.0.0.0:8050")
+workers = int(os.environ.get("APP_DASH_WORKERS", 4))
+preload_app = True
+timeout = 120
+# Workers à threads : un export long en flux n'empêche ni les autres requêtes
+# ni le signal de vie du worker (qui ferait dépasser timeout en mode sync)
+threads = int(os.environ.get("APP_DASH_THREADS", 4))
+
+
+def pre_fork(server, worker):
+    # Objets du maître exclus du ramasse-miettes : il ne réécrit pas leurs
+    # en-têtes dans les workers (ce qui dupliquerait les pages partagées)
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Les connexions SQLite du cache des tâches ne se partagent pas entre processus
+    taches = sys.modules.get("taches")
+    if taches is not None:
+        taches.cache_taches.close()
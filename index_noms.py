@@ -0,0 +1,113 @@
+# INDEX DE RECHERCHE PAR NOM (vocabulaire dédupliqué + index inversé de trigrammes)
+import numpy as np
+import pandas as pd
+
+from csr import rassembler_csr
+
+MODES = ("contains", "prefix", "fuzzy")
+
+
+def trigrammes(texte):
+    return {texte[i:i + 3] for i in range(len(texte) - 2)}
+
+
+class NameIndex:
+    def __init__(self, frame, colonnes=("Nom_Emetteur", "Nom_Destinataire"), seuil_fuzzy=0.4):
+        self.seuil_fuzzy = seuil_fuzzy
+
+        # Vocabulaire : noms distincts des deux colonnes, mis en minuscules une seule fois
+        series = [frame[col] if isinstance(frame[col].dtype, pd.CategoricalDtype)
+                  else frame[col].astype("category") for col in colonnes]
+        categories = [s.cat.categories.astype(str).str.lower() for s in series]
+        self.vocabulaire, inverse = np.unique(np.concatenate(categories), return_inverse=True)
+
+        # Terme (id du vocabulaire) de chaque ligne pour chaque colonne, -1 si manquant
+        self.termes_colonnes = []
+        debut = 0
+        for s, cats in zip(series, categories):
+            correspondance = np.append(inverse[debut:debut + len(cats)], -1)
+            self.termes_colonnes.append(correspondance[s.cat.codes.to_numpy()])
+            debut += len(cats)
+
+        # Terme -> lignes (format CSR, une ligne peut apparaître pour ses deux noms)
+        termes = np.concatenate(self.termes_colonnes)
+        lignes = np.tile(np.arange(len(frame)), len(colonnes))
+        valides = termes >= 0
+        termes, lignes = termes[valides], lignes[valides]
+        ordre = np.argsort(termes, kind="stable")
+        self.lignes_termes = lignes[ordre]
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(termes, minlength=len(self.vocabulaire)))))
+
+        # Trigramme -> termes (format CSR)
+        self.id_trigramme = {}
+        paires_trigrammes, paires_termes = [], []
+        self.nb_trigrammes = np.zeros(len(self.vocabulaire), dtype=np.int32)
+        for terme, nom in enumerate(self.vocabulaire):
+            grammes = trigrammes(nom)
+            self.nb_trigrammes[terme] = len(grammes)
+            for g in grammes:
+                paires_trigrammes.append(self.id_trigramme.setdefault(g, len(self.id_trigramme)))
+                paires_termes.append(terme)
+        paires_trigrammes = np.asarray(paires_trigrammes, dtype=np.int64)
+        ordre = np.argsort(paires_trigrammes, kind="stable")
+        self.termes_trigrammes = np.asarray(paires_termes, dtype=np.int64)[ordre]
+        self.offsets_trigrammes = np.concatenate(
+            ([0], np.cumsum(np.bincount(paires_trigrammes, minlength=len(self.id_trigramme)))))
+
+    def _postings(self, gramme):
+        t = self.id_trigramme.get(gramme)
+        if t is None:
+            return np.empty(0, dtype=np.int64)
+        return self.termes_trigrammes[self.offsets_trigrammes[t]:self.offsets_trigrammes[t + 1]]
+
+    def _contient(self, requete):
+        if len(requete) < 3:
+            # Requête trop courte pour les trigrammes : parcours du vocabulaire (dédupliqué)
+            return np.flatnonzero(pd.Index(self.vocabulaire).str.contains(requete, regex=False))
+        listes = sorted((self._postings(g) for g in trigrammes(requete)), key=len)
+        candidats = listes[0]
+        for liste in listes[1:]:
+            if len(candidats) == 0:
+                break
+            candidats = np.intersect1d(candidats, liste, assume_unique=True)
+        # Les trigrammes communs ne garantissent pas la sous-chaîne : vérification finale
+        return np.asarray([t for t in candidats if requete in self.vocabulaire[t]], dtype=np.int64)
+
+    def _prefixe(self, requete):
+        # Le vocabulaire est trié : les noms commençant par la requête sont contigus
+        debut = np.searchsorted(self.vocabulaire, requete, side="left")
+        fin = np.searchsorted(self.vocabulaire, requete + "\U0010ffff", side="left")
+        return np.arange(debut, fin)
+
+    def _approche(self, requete):
+        # Similarité de Jaccard sur les trigrammes, calculée pour les seuls termes candidats
+        grammes = trigrammes(requete)
+        if not grammes:
+            return self._contient(requete)
+        candidats = np.concatenate([self._postings(g) for g in grammes])
+        communs = np.bincount(candidats, minlength=len(self.vocabulaire))
+        termes = np.flatnonzero(communs)
+        similarite = communs[termes] / (len(grammes) + self.nb_trigrammes[termes] - communs[termes])
+        return termes[similarite >= self.seuil_fuzzy]
+
+    def termes(self, requete, mode="contains"):
+        requete = requete.lower()
+        if mode == "prefix":
+            return self._prefixe(requete)
+        if mode == "fuzzy":
+            return self._approche(requete)
+        return self._contient(requete)
+
+    def taille(self, termes):
+        return int((self.offsets[termes + 1] - self.offsets[termes]).sum())
+
+    def lignes(self, termes):
+        return np.unique(rassembler_csr(self.lignes_termes, self.offsets, termes))
+
+    def masque(self, termes, ids):
+        retenus = np.zeros(len(self.vocabulaire) + 1, dtype=bool)  # dernière case : nom manquant
+        retenus[termes] = True
+        masque = np.zeros(len(ids), dtype=bool)
+        for termes_colonne in self.termes_colonnes:
+            masque |= retenus[termes_colonne[ids]]
+        return masque
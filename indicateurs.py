@@ -0,0 +1,129 @@
+# MOTEUR DE CALCUL DES KPI (une passe vectorisée sur les codes catégoriels)
+import numpy as np
+import pandas as pd
+
+from donnees import CSV_PATH, AJour
+
+SEUIL_GROS_TRANSFERT = 10_000_000
+COLONNE_STATUT = "Statut"
+STATUT_REUSSI = "Réussie"
+
+# Colonnes d'agence si le fichier les fournit ; à défaut, les pays d'origine et
+# de destination jouent le rôle d'agences émettrice et destinataire.
+COLONNES_AGENCES = [("Agence_Emettrice", "Agence_Destinataire"), ("Pays_Origine", "Pays_Destination")]
+
+# Agrégats par fichier (chemin -> AJour de RunningAggregates)
+_cache = {}
+
+
+def _codes(serie):
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype("category")
+    return serie.cat.categories, serie.cat.codes.to_numpy()
+
+
+def _par_groupe(categories, codes, poids=None):
+    # Somme (ou comptage) par catégorie, les valeurs manquantes (code -1) ignorées
+    valides = codes >= 0
+    sommes = np.bincount(codes[valides], weights=None if poids is None else poids[valides],
+                         minlength=len(categories))
+    return pd.Series(sommes, index=categories)
+
+
+def _cumuler(serie, ajout):
+    return ajout if serie is None else serie.add(ajout, fill_value=0)
+
+
+def _decroissant(serie):
+    return pd.Series(dtype=np.float64) if serie is None else serie[serie != 0].sort_values(ascending=False)
+
+
+# AGRÉGATS CUMULÉS : chaque lot met à jour des sommes additives, sans relire l'historique
+class RunningAggregates:
+    def __init__(self):
+        self.n = 0
+        self.montants_valides = 0
+        self.montant_total = 0.0
+        self.reussies = None
+        self.colonnes_agences = None
+        self.par_agence = dict.fromkeys(
+            ("emis", "emises", "recues", "gros_emis", "gros_recus"))
+        self.gros_nombre = 0
+        self.gros_montant = 0.0
+        self.gros_par_annee = None
+
+    def ajouter(self, lot):
+        montants = lot["Montant"].to_numpy(dtype=np.float64)
+        montants_valides = np.nan_to_num(montants)
+        gros = montants > SEUIL_GROS_TRANSFERT
+        montants_gros = np.where(gros, montants_valides, 0.0)
+
+        self.n += len(lot)
+        self.montants_valides += int((~np.isnan(montants)).sum())
+        self.montant_total += float(montants_valides.sum())
+        self.gros_nombre += int(gros.sum())
+        self.gros_montant += float(montants_gros.sum())
+
+        if COLONNE_STATUT in lot.columns:
+            categories, codes = _codes(lot[COLONNE_STATUT])
+            reussies = int(np.isin(codes, np.flatnonzero(categories == STATUT_REUSSI)).sum())
+            self.reussies = (self.reussies or 0) + reussies
+
+        if self.colonnes_agences is None:
+            # Ni agences ni pays : pas de ventilation par agence (séries vides)
+            self.colonnes_agences = next(
+                ((e, d) for e, d in COLONNES_AGENCES if e in lot.columns and d in lot.columns), None)
+        if self.colonnes_agences is not None:
+            emettrice, destinataire = self.colonnes_agences
+            agences_e, codes_e = _codes(lot[emettrice])
+            agences_d, codes_d = _codes(lot[destinataire])
+            for cle, (agences, codes, poids) in {
+                "emis": (agences_e, codes_e, montants_valides),
+                "emises": (agences_e, codes_e, None),
+                "recues": (agences_d, codes_d, None),
+                "gros_emis": (agences_e, codes_e, montants_gros),
+                "gros_recus": (agences_d, codes_d, montants_gros),
+            }.items():
+                self.par_agence[cle] = _cumuler(self.par_agence[cle], _par_groupe(agences, codes, poids))
+
+        annees = lot["Date"].dt.year.to_numpy()
+        annees_valides = ~np.isnan(annees) if annees.dtype.kind == "f" else np.ones(len(annees), dtype=bool)
+        annees_gros = gros & annees_valides
+        if annees_gros.any():
+            premiere = int(np.min(annees[annees_gros]))
+            par_annee = np.bincount((annees[annees_gros] - premiere).astype(np.int64),
+                                    weights=montants[annees_gros])
+            self.gros_par_annee = _cumuler(
+                self.gros_par_annee, pd.Series(par_annee, index=np.arange(premiere, premiere + len(par_annee))))
+        return self
+
+    def kpis(self):
+        return {
+            "n": self.n,
+            "montant_total": self.montant_total,
+            "montant_moyen": self.montant_total / self.montants_valides if self.montants_valides else 0.0,
+            "reussies": self.reussies,
+            "taux_reussite": None if self.reussies is None or self.n == 0 else self.reussies / self.n,
+            "colonnes_agences": self.colonnes_agences,
+            "emis_par_agence": _decroissant(self.par_agence["emis"]),
+            "emises_par_agence": _decroissant(self.par_agence["emises"]),
+            "recues_par_agence": _decroissant(self.par_agence["recues"]),
+            "gros_nombre": self.gros_nombre,
+            "gros_montant": self.gros_montant,
+            "gros_par_annee": _decroissant(self.gros_par_annee).sort_index(),
+            "gros_emis_par_agence": _decroissant(self.par_agence["gros_emis"]),
+            "gros_recus_par_agence": _decroissant(self.par_agence["gros_recus"]),
+        }
+
+
+def calculer_kpis(df):
+    return RunningAggregates().ajouter(df).kpis()
+
+
+def kpis_transactions(path=CSV_PATH):
+    # Recalcul complet uniquement si le fichier source a été réécrit : les lots
+    # ajoutés, par ce worker ou par un autre, sont cumulés aux agrégats
+    if path not in _cache:
+        _cache[path] = AJour(lambda df: RunningAggregates().ajouter(df),
+                             lambda agregats, df, debut: agregats.ajouter(df.iloc[debut:]), path)
+    return _cache[path]().kpis()
@@ -0,0 +1,210 @@
+# INGESTION DES FICHIERS TÉLÉVERSÉS PAR MORCEAUX
+# 1. le contenu base64 de dcc.Upload est décodé par blocs vers un fichier temporaire ;
+# 2. l'en-tête et un échantillon suffisent à remplir les sélecteurs de colonnes ;
+# 3. le corps est lu par lots (lecteur CSV pyarrow ou lignes openpyxl) en colonnes
+#    compactes, avec un suivi de progression.
+import base64
+import csv
+import io
+import os
+import re
+import secrets
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+from donnees import CACHE_DIR
+
+REPERTOIRE_UPLOADS = os.path.join(CACHE_DIR, "uploads")
+TAILLE_BLOC_BASE64 = 4 * 1024 * 1024  # multiple de 4 : chaque bloc se décode seul
+TAILLE_LOT = 1 << 22  # octets par lot pour le lecteur CSV
+LIGNES_LOT_EXCEL = 50_000
+DUREE_CONSERVATION = 86_400
+FICHIER_VALIDE = re.compile(r"^[A-Za-z0-9_-]+(\.[a-z0-9]{1,5})?$")
+
+
+def est_csv(filename):
+    return os.path.splitext(filename)[1].lower() == '.csv'
+
+
+def chemin_upload(fichier):
+    if not fichier or not FICHIER_VALIDE.match(fichier):
+        raise ValueError("Identifiant de fichier invalide")
+    return os.path.join(REPERTOIRE_UPLOADS, fichier)
+
+
+def _purger_uploads():
+    if not os.path.isdir(REPERTOIRE_UPLOADS):
+        return
+    for nom in os.listdir(REPERTOIRE_UPLOADS):
+        chemin = os.path.join(REPERTOIRE_UPLOADS, nom)
+        try:
+            if time.time() - os.path.getmtime(chemin) > DUREE_CONSERVATION:
+                os.remove(chemin)
+        except FileNotFoundError:
+            pass
+
+
+def enregistrer_upload(contents, filename):
+    # Décodage par blocs : ni copie complète des octets décodés, ni chaîne Python
+    _purger_uploads()
+    os.makedirs(REPERTOIRE_UPLOADS, exist_ok=True)
+    extension = os.path.splitext(filename)[1].lower()  # openpyxl exige l'extension
+    fichier = secrets.token_urlsafe(18) + (extension if FICHIER_VALIDE.match("x" + extension) else "")
+
+    debut = contents.index(',') + 1
+    with open(chemin_upload(fichier), 'wb') as f:
+        for i in range(debut, len(contents), TAILLE_BLOC_BASE64):
+            f.write(base64.b64decode(contents[i:i + TAILLE_BLOC_BASE64]))
+    return fichier
+
+
+def _separateur(echantillon):
+    try:
+        return csv.Sniffer().sniff(echantillon, delimiters=',;\t|').delimiter
+    except csv.Error:
+        return ','
+
+
+def apercu(fichier, filename, nrows=1000):
+    # Colonnes et échantillon, sans lire le corps du fichier
+    return apercu_chemin(chemin_upload(fichier), filename, nrows)
+
+
+def apercu_chemin(chemin, filename, nrows=1000):
+    taille = os.path.getsize(chemin)
+
+    if est_csv(filename):
+        with open(chemin, 'r', encoding='utf-8', errors='replace', newline='') as f:
+            echantillon = f.read(64 * 1024)
+        sep = _separateur(echantillon)
+        df = pd.read_csv(chemin, sep=sep, nrows=nrows)
+        return list(df.columns), df, taille
+
+    if filename.lower().endswith(('.xlsx', '.xlsm')):
+        from openpyxl import load_workbook
+
+        classeur = load_workbook(chemin, read_only=True)
+        try:
+            lignes = classeur.active.iter_rows(values_only=True)
+            colonnes = [str(c) for c in next(lignes)]
+            donnees = [ligne for _, ligne in zip(range(nrows), lignes)]
+        finally:
+            classeur.close()
+        return colonnes, pd.DataFrame(donnees, columns=colonnes), taille
+
+    df = pd.read_excel(chemin, nrows=nrows)
+    return list(df.columns), df, taille
+
+
+def compacter(df, ratio_categories=0.5):
+    # Colonnes texte peu variées en catégories, entiers réduits au plus petit type
+    for col in df.columns:
+        serie = df[col]
+        if serie.dtype == object or pd.api.types.is_string_dtype(serie.dtype):
+            if serie.nunique(dropna=True) <= ratio_categories * max(len(serie), 1):
+                df[col] = serie.astype('category')
+        elif pd.api.types.is_integer_dtype(serie.dtype) and not pd.api.types.is_bool_dtype(serie.dtype):
+            df[col] = pd.to_numeric(serie, downcast='integer')
+    return df
+
+
+def _lire_csv(chemin, progression):
+    with open(chemin, 'r', encoding='utf-8', errors='replace', newline='') as f:
+        echantillon = f.read(64 * 1024)
+    sep = _separateur(echantillon)
+    # Nombre de lignes estimé d'après l'échantillon, pour la progression
+    estimation = max(os.path.getsize(chemin) * max(echantillon.count('\n'), 1) / max(len(echantillon), 1), 1)
+
+    def avancer(lignes):
+        progression(min(lignes / estimation, 0.99), lignes)
+
+    try:
+        flux = pacsv.open_csv(
+            chemin,
+            read_options=pacsv.ReadOptions(block_size=TAILLE_LOT, use_threads=False),
+            parse_options=pacsv.ParseOptions(delimiter=sep),
+        )
+        lots, lignes = [], 0
+        for lot in flux:
+            lots.append(lot)
+            lignes += lot.num_rows
+            avancer(lignes)
+        table = pa.Table.from_batches(lots, schema=flux.schema)
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+    except pa.ArrowInvalid:
+        pass  # types incohérents entre lots : repli sur pandas par morceaux
+
+    morceaux, lignes = [], 0
+    for morceau in pd.read_csv(chemin, sep=sep, chunksize=200_000):
+        morceaux.append(compacter(morceau))
+        lignes += len(morceau)
+        avancer(lignes)
+    return pd.concat(morceaux, ignore_index=True) if morceaux else pd.DataFrame()
+
+
+def _lire_excel(chemin, filename, progression):
+    if not filename.lower().endswith(('.xlsx', '.xlsm')):
+        return pd.read_excel(chemin)
+
+    from openpyxl import load_workbook
+
+    classeur = load_workbook(chemin, read_only=True)
+    try:
+        feuille = classeur.active
+        total = max((feuille.max_row or 1) - 1, 1)
+        lignes = feuille.iter_rows(values_only=True)
+        colonnes = [str(c) for c in next(lignes)]
+        morceaux, lot, nb = [], [], 0
+        for ligne in lignes:
+            lot.append(ligne)
+            if len(lot) == LIGNES_LOT_EXCEL:
+                morceaux.append(pd.DataFrame(lot, columns=colonnes))
+                nb += len(lot)
+                lot = []
+                progression(min(nb / total, 1.0), nb)
+        if lot:
+            morceaux.append(pd.DataFrame(lot, columns=colonnes))
+            nb += len(lot)
+    finally:
+        classeur.close()
+    return pd.concat(morceaux, ignore_index=True) if morceaux else pd.DataFrame(columns=colonnes)
+
+
+def lire_octets(octets, filename):
+    # Fichier déjà lu en mémoire (traitement par lot : la lecture disque se fait
+    # dans un thread, le décodage ici, dans un processus du pool)
+    if est_csv(filename):
+        sep = _separateur(octets[:64 * 1024].decode('utf-8', errors='replace'))
+        try:
+            table = pacsv.read_csv(
+                pa.BufferReader(octets),
+                read_options=pacsv.ReadOptions(block_size=TAILLE_LOT, use_threads=False),
+                parse_options=pacsv.ParseOptions(delimiter=sep),
+            )
+            df = table.to_pandas(split_blocks=True, self_destruct=True)
+        except pa.ArrowInvalid:
+            df = pd.read_csv(io.BytesIO(octets), sep=sep)
+    else:
+        df = pd.read_excel(io.BytesIO(octets))
+    return compacter(df)
+
+
+def ingerer(fichier, filename, progression=lambda avancement, lignes: None):
+    chemin = chemin_upload(fichier)
+    try:
+        if est_csv(filename):
+            df = _lire_csv(chemin, progression)
+        else:
+            df = _lire_excel(chemin, filename, progression)
+        progression(1.0, len(df))
+        return compacter(df)
+    finally:
+        os.remove(chemin)
+
+
+def memoire(df):
+    return int(np.sum(df.memory_usage(deep=True)))
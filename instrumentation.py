@@ -0,0 +1,233 @@
+# INSTRUMENTATION DES CALLBACKS (optionnelle : APP_DASH_INSTRUMENTATION=1)
+# - durées par étape dans chaque callback (filtrage, figure, enregistrements...)
+#   renvoyées dans l'en-tête Server-Timing de la réponse ;
+# - compteurs agrégés par callback au format Prometheus sur /metrics ;
+# - profil des requêtes lentes (pyinstrument si installé, sinon cProfile)
+#   enregistré dans .cache/profils quand APP_DASH_PROFIL=1.
+# Les réponses en flux (exports) sont mesurées jusqu'à la fin de leur envoi.
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+from flask import Response, g, has_request_context, request
+
+from donnees import CACHE_DIR
+
+ACTIVE = os.environ.get("APP_DASH_INSTRUMENTATION", "0") == "1"
+PROFIL = os.environ.get("APP_DASH_PROFIL", "0") == "1"
+SEUIL_LENT_MS = float(os.environ.get("APP_DASH_SEUIL_LENT_MS", 1000))
+REPERTOIRE_PROFILS = os.path.join(CACHE_DIR, "profils")
+BORNES_DUREES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_verrou = threading.Lock()
+_requetes = defaultdict(lambda: {"nombre": 0, "duree": 0.0, "octets": 0, "buckets": [0] * len(BORNES_DUREES)})
+_etapes = defaultdict(lambda: [0, 0.0])  # (app, callback, étape) -> [nombre, durée]
+_caches = []
+# cProfile : un seul profileur actif à la fois dans l'interpréteur ; les
+# requêtes concurrentes ne sont pas profilées
+_verrou_cprofile = threading.Lock()
+
+
+# MESURES DANS LES CALLBACKS
+@contextmanager
+def _mesurer(nom):
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        duree = time.perf_counter() - debut
+        if has_request_context() and hasattr(g, "etapes"):
+            g.etapes.append((nom, duree))
+
+
+def etape(nom):
+    # with etape("filtrage"): ... (sans effet si l'instrumentation est inactive)
+    return _mesurer(nom) if ACTIVE else nullcontext()
+
+
+def noter_cache(nom, trouve):
+    if ACTIVE and has_request_context() and hasattr(g, "caches"):
+        g.caches.append((nom, trouve))
+
+
+def enregistrer_cache(cache):
+    # Cache exposant stats() (MemoCache) : ses compteurs sont publiés sur /metrics
+    _caches.append(cache)
+
+
+# REQUÊTES FLASK
+def _callback_courant():
+    # Dash envoie l'identifiant de sortie dans le corps des requêtes de callback
+    if request.path.endswith("_dash-update-component"):
+        corps = request.get_json(silent=True) or {}
+        return str(corps.get("output", "inconnu"))
+    return request.path
+
+
+def _demarrer():
+    g.debut = time.perf_counter()
+    g.etapes, g.caches = [], []
+    g.profileur = None
+    if PROFIL:
+        try:
+            from pyinstrument import Profiler
+
+            g.profileur = Profiler()
+            g.profileur.start()
+        except ImportError:
+            import cProfile
+
+            if _verrou_cprofile.acquire(blocking=False):
+                g.profileur = cProfile.Profile()
+                g.profileur.enable()
+
+
+def _arreter_profileur(exception=None):
+    # Appelé par _terminer puis, en cas d'exception, par teardown_request
+    profileur, g.profileur = getattr(g, "profileur", None), None
+    if profileur is None:
+        return None
+    if hasattr(profileur, "output_html"):
+        profileur.stop()
+    else:
+        profileur.disable()
+        _verrou_cprofile.release()
+    return profileur
+
+
+def _enregistrer_profil(profileur, app, callback, duree):
+    os.makedirs(REPERTOIRE_PROFILS, exist_ok=True)
+    horodatage = f"{time.strftime('%Y%m%d-%H%M%S')}.{int(time.time() * 1000) % 1000:03d}"
+    base = os.path.join(REPERTOIRE_PROFILS, f"{app}-{horodatage}-{os.getpid()}-{int(duree * 1000)}ms")
+    if hasattr(profileur, "output_html"):
+        with open(base + ".html", "w", encoding="utf-8") as f:
+            f.write(profileur.output_html())
+    else:
+        profileur.dump_stats(base + ".prof")
+    with open(base + ".txt", "w", encoding="utf-8") as f:
+        f.write(f"{request.method} {request.path}\ncallback : {callback}\ndurée : {duree * 1000:.1f} ms\n")
+
+
+class _FluxMesure:
+    # Itérable de réponse en flux : octets comptés et durée arrêtée quand le
+    # serveur WSGI ferme la réponse, après l'envoi du dernier morceau
+    def __init__(self, morceaux, fin):
+        self.morceaux = morceaux
+        self.fin = fin
+        self.octets = 0
+
+    def __iter__(self):
+        for morceau in self.morceaux:
+            self.octets += len(morceau.encode() if isinstance(morceau, str) else morceau)
+            yield morceau
+
+    def close(self):
+        fin, self.fin = self.fin, None
+        if hasattr(self.morceaux, "close"):
+            self.morceaux.close()
+        if fin is not None:
+            fin(self.octets)
+
+
+def _cumuler(app, callback, duree, octets, etapes):
+    with _verrou:
+        stats = _requetes[(app, callback)]
+        stats["nombre"] += 1
+        stats["duree"] += duree
+        stats["octets"] += octets
+        for i, borne in enumerate(BORNES_DUREES):
+            if duree <= borne:
+                stats["buckets"][i] += 1
+        for nom, d in etapes:
+            cumul = _etapes[(app, callback, nom)]
+            cumul[0] += 1
+            cumul[1] += d
+
+
+def _terminer(app, response):
+    if not hasattr(g, "debut"):
+        return response
+    debut = g.debut
+    duree = time.perf_counter() - debut
+    callback = _callback_courant()
+    etapes = list(g.etapes)
+
+    profileur = _arreter_profileur()
+    if profileur is not None and duree * 1000 >= SEUIL_LENT_MS:
+        _enregistrer_profil(profileur, app, callback, duree)
+
+    if response.is_streamed:
+        response.response = _FluxMesure(response.response, lambda octets: _cumuler(
+            app, callback, time.perf_counter() - debut, octets, etapes))
+    else:
+        _cumuler(app, callback, duree, response.calculate_content_length() or 0, etapes)
+
+    # Server-Timing : étapes mesurées, reste (sérialisation Dash, transfert JSON) et total
+    # (pour un flux, jusqu'aux en-têtes ; /metrics compte l'envoi complet)
+    mesurees = sum(d for _, d in g.etapes)
+    entrees = [f"{nom};dur={d * 1000:.2f}" for nom, d in g.etapes]
+    entrees += [f'cache;desc="{nom} {"hit" if trouve else "miss"}"' for nom, trouve in g.caches]
+    entrees += [f"autre;dur={max(duree - mesurees, 0) * 1000:.2f}", f"total;dur={duree * 1000:.2f}"]
+    response.headers["Server-Timing"] = ", ".join(entrees)
+    return response
+
+
+def _echapper(valeur):
+    return str(valeur).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquettes(**valeurs):
+    return ",".join(f'{cle}="{_echapper(v)}"' for cle, v in valeurs.items())
+
+
+def metriques():
+    lignes = [
+        "# HELP app_dash_requetes_duree_secondes Durée des requêtes par callback",
+        "# TYPE app_dash_requetes_duree_secondes histogram",
+    ]
+    with _verrou:
+        requetes = {cle: dict(v, buckets=list(v["buckets"])) for cle, v in _requetes.items()}
+        etapes = {cle: list(v) for cle, v in _etapes.items()}
+
+    for (app, callback), stats in requetes.items():
+        etiquettes = _etiquettes(app=app, callback=callback)
+        for borne, nombre in zip(BORNES_DUREES, stats["buckets"]):
+            lignes.append(f'app_dash_requetes_duree_secondes_bucket{{{etiquettes},le="{borne}"}} {nombre}')
+        lignes.append(f'app_dash_requetes_duree_secondes_bucket{{{etiquettes},le="+Inf"}} {stats["nombre"]}')
+        lignes.append(f"app_dash_requetes_duree_secondes_sum{{{etiquettes}}} {stats['duree']:.6f}")
+        lignes.append(f"app_dash_requetes_duree_secondes_count{{{etiquettes}}} {stats['nombre']}")
+
+    lignes += ["# HELP app_dash_reponses_octets_total Octets renvoyés par callback",
+               "# TYPE app_dash_reponses_octets_total counter"]
+    for (app, callback), stats in requetes.items():
+        lignes.append(f"app_dash_reponses_octets_total{{{_etiquettes(app=app, callback=callback)}}} {stats['octets']}")
+
+    lignes += ["# HELP app_dash_etapes_duree_secondes Durée cumulée des étapes des callbacks",
+               "# TYPE app_dash_etapes_duree_secondes summary"]
+    for (app, callback, nom), (nombre, duree) in etapes.items():
+        etiquettes = _etiquettes(app=app, callback=callback, etape=nom)
+        lignes.append(f"app_dash_etapes_duree_secondes_sum{{{etiquettes}}} {duree:.6f}")
+        lignes.append(f"app_dash_etapes_duree_secondes_count{{{etiquettes}}} {nombre}")
+
+    lignes += ["# HELP app_dash_cache_total Consultations des caches de résultats",
+               "# TYPE app_dash_cache_total counter"]
+    for cache in _caches:
+        stats = cache.stats()
+        for resultat in ("succes", "succes_disque", "echecs"):
+            lignes.append(f"app_dash_cache_total{{{_etiquettes(cache=stats['cache'], resultat=resultat)}}} "
+                          f"{stats[resultat]}")
+    return "\n".join(lignes) + "\n"
+
+
+def instrumenter(server, app):
+    # À appeler une fois par application : no-op si l'instrumentation est inactive
+    if not ACTIVE:
+        return
+    server.before_request(_demarrer)
+    server.after_request(lambda response: _terminer(app, response))
+    server.teardown_request(_arreter_profileur)
+    if "metrics" not in server.view_functions:
+        server.add_url_rule("/metrics", "metrics",
+                            lambda: Response(metriques(), mimetype="text/plain; version=0.0.4"))
@@ -1,55 +1,141 @@
-from dash import Dash, html, dcc
-import dash_bootstrap_components as dbc
-
-# Création de l'application
-app = Dash(__name__, external_stylesheets=[dbc.themes.FLATLY])
-
-# Contenu de chaque dashboard
-dashboard_data = {
-    "Vue Générale des Transactions": [
-        ("Montant Total", "Total cumulé des montants transférés"),
-        ("Nombre de transactions", "Nombre total de lignes de transaction"),
-        ("Montant Moyen", "Moyenne des montants"),
-        ("Taux de réussite", "Pourcentage des transactions réussies")
-    ],
-    "Analyse par Agence": [
-        ("Montant Émis", "Total des montants envoyés par les agences émettrices"),
-        ("Nombre total de transactions", "Nombre de toutes les transactions (émises + reçues)"),
-        ("Transactions Réussies", "Nombre de transactions avec le statut 'Réussie'"),
-        ("Transactions reçues", "Nombre de transactions reçues par les agences destinataires")
-    ],
-    "Analyse des Gros Transferts": [
-        ("Total Gros Transferts", "Nombre de transactions supérieures à 10M"),
-        ("Montant Total des Gros Transferts", "Somme de tous les montants > 10M"),
-        ("Montant annuel des Gros Transferts", "Montant total des gros transferts par an"),
-        ("Montant Émis - Gros Transferts", "Total des montants envoyés supérieurs au seuil"),
-        ("Montant Reçu - Gros Transferts", "Montant total des gros transferts reçus")
-    ]
-}
-
-# Fonction pour générer une carte KPI + description
-def generate_dashboard(kpi_list):
-    return dbc.Container([
-        dbc.Row([
-            dbc.Col(
-                dbc.Card([
-                    dbc.CardHeader(kpi),
-                    dbc.CardBody(html.P(description, className="card-text"))
-                ], className="mb-4 shadow-sm", style={"minHeight": "120px"}),
-                width=6
-            ) for kpi, description in kpi_list
-        ])
-    ], fluid=True)
-
-# Layout avec onglets
-app.layout = dbc.Container([
-    html.H2("Indicateurs Clés de Performance", className="my-4 text-center"),
-    dcc.Tabs([
-        dcc.Tab(label=dashboard, children=[generate_dashboard(kpis)])
-        for dashboard, kpis in dashboard_data.items()
-    ])
-], fluid=True)
-
-# Lancement de l'application
-if __name__ == '__main__':
-    app.run(debug=True, port=8052)
+from dash import Dash, html, dcc
+import dash_bootstrap_components as dbc
+
+from donnees import PRECHARGEMENT, Paresseux
+from indicateurs import SEUIL_GROS_TRANSFERT, kpis_transactions
+from instrumentation import etape, instrumenter
+
+# Contenu de chaque dashboard
+dashboard_data = {
+    "Vue Générale des Transactions": [
+        ("Montant Total", "Total cumulé des montants transférés"),
+        ("Nombre de transactions", "Nombre total de lignes de transaction"),
+        ("Montant Moyen", "Moyenne des montants"),
+        ("Taux de réussite", "Pourcentage des transactions réussies")
+    ],
+    "Analyse par Agence": [
+        ("Montant Émis", "Total des montants envoyés par les agences émettrices"),
+        ("Nombre total de transactions", "Chaque transaction comptée une fois ; par agence, émises + reçues"),
+        ("Transactions Réussies", "Nombre de transactions avec le statut 'Réussie'"),
+        ("Transactions reçues", "Nombre de transactions reçues par les agences destinataires")
+    ],
+    "Analyse des Gros Transferts": [
+        ("Total Gros Transferts", f"Nombre de transactions supérieures à {SEUIL_GROS_TRANSFERT // 1_000_000}M"),
+        ("Montant Total des Gros Transferts", "Somme de tous les montants > 10M"),
+        ("Montant annuel des Gros Transferts", "Montant total des gros transferts par an"),
+        ("Montant Émis - Gros Transferts", "Total des montants envoyés supérieurs au seuil"),
+        ("Montant Reçu - Gros Transferts", "Montant total des gros transferts reçus")
+    ]
+}
+
+# Mise en forme des valeurs calculées
+def montant(valeur):
+    return f"{valeur:,.0f}"
+
+
+def tableau(serie, colonne, format_valeur=montant, lignes=5):
+    return dbc.Table([
+        html.Thead(html.Tr([html.Th(colonne), html.Th("Valeur", className="text-end")])),
+        html.Tbody([
+            html.Tr([html.Td(str(cle)), html.Td(format_valeur(valeur), className="text-end")])
+            for cle, valeur in serie.head(lignes).items()
+        ])
+    ], size="sm", className="mt-2 mb-0")
+
+
+def valeurs_kpis(k):
+    # KPI -> (valeur affichée, détail sous la valeur ou None). Les KPI absents
+    # (pas de colonne Statut) ne sont pas affichés ; sans colonnes d'agence ni
+    # de pays, les cartes par agence gardent leur total sans tableau de détail.
+    def par_agence(serie, sens, format_valeur=montant):
+        if k["colonnes_agences"] is None:
+            return None
+        return tableau(serie, k["colonnes_agences"][sens].replace("_", " "), format_valeur)
+
+    nombre = lambda valeur: f"{int(valeur):,}"
+    total_par_agence = k["emises_par_agence"].add(k["recues_par_agence"], fill_value=0).sort_values(ascending=False)
+    valeurs = {
+        "Montant Total": (montant(k["montant_total"]), None),
+        "Nombre de transactions": (f"{k['n']:,}", None),
+        "Montant Moyen": (montant(k["montant_moyen"]), None),
+        "Montant Émis": (montant(k["montant_total"]), par_agence(k["emis_par_agence"], 0)),
+        "Nombre total de transactions": (f"{k['n']:,}", par_agence(total_par_agence, 0, nombre)),
+        "Transactions reçues": (f"{k['n']:,}", par_agence(k["recues_par_agence"], 1, nombre)),
+        "Total Gros Transferts": (f"{k['gros_nombre']:,}", None),
+        "Montant Total des Gros Transferts": (montant(k["gros_montant"]), None),
+        "Montant annuel des Gros Transferts": (montant(k["gros_montant"]),
+                                               tableau(k["gros_par_annee"].sort_index(ascending=False), "Année")),
+        "Montant Émis - Gros Transferts": (montant(k["gros_montant"]), par_agence(k["gros_emis_par_agence"], 0)),
+        "Montant Reçu - Gros Transferts": (montant(k["gros_montant"]), par_agence(k["gros_recus_par_agence"], 1)),
+    }
+    if k["reussies"] is not None:
+        valeurs["Taux de réussite"] = (f"{k['taux_reussite']:.1%}" if k["taux_reussite"] is not None else "n/d", None)
+        valeurs["Transactions Réussies"] = (f"{k['reussies']:,}", None)
+    return valeurs
+
+# Carte KPI : valeur en titre, tableau de détail à côté (pas dans le <h4>), description
+def carte(kpi, description, valeurs):
+    texte, detail = valeurs[kpi]
+    contenu = [html.H4(texte, className="card-title")]
+    if detail is not None:
+        contenu.append(detail)
+    contenu.append(html.P(description, className="card-text text-muted"))
+    return dbc.Card([
+        dbc.CardHeader(kpi),
+        dbc.CardBody(contenu)
+    ], className="mb-4 shadow-sm", style={"minHeight": "120px"})
+
+
+# Fonction pour générer une carte KPI + description
+def generate_dashboard(kpi_list, valeurs):
+    return dbc.Container([
+        dbc.Row([
+            dbc.Col(carte(kpi, description, valeurs), width=6)
+            for kpi, description in kpi_list if kpi in valeurs
+        ])
+    ], fluid=True)
+
+# Layout avec onglets (reconstruit à chaque chargement : les KPI sont en cache
+# et ne sont recalculés que si le fichier de transactions change)
+def serve_layout():
+    with etape("kpi"):
+        valeurs = valeurs_kpis(kpis_transactions())
+    return dbc.Container([
+        html.H2("Indicateurs Clés de Performance", className="my-4 text-center"),
+        dcc.Tabs([
+            dcc.Tab(label=dashboard, children=[generate_dashboard(kpis, valeurs)])
+            for dashboard, kpis in dashboard_data.items()
+        ])
+    ], fluid=True)
+
+def precharger():
+    kpis_transactions()
+
+
+# Création de l'application (les KPI ne sont calculés qu'au premier affichage,
+# ou tout de suite si prechargement)
+def create_app(prechargement=PRECHARGEMENT):
+    # Pas de callback à valider : Dash n'évalue donc pas le layout à la création
+    # (ce qui lirait les transactions pour calculer les indicateurs)
+    app = Dash(__name__, external_stylesheets=[dbc.themes.FLATLY], suppress_callback_exceptions=True)
+    app.layout = serve_layout
+    instrumenter(app.server, "kpi")  # Server-Timing et /metrics si APP_DASH_INSTRUMENTATION=1
+    if prechargement:
+        precharger()
+    return app
+
+
+# Application par défaut, créée au premier accès à kpi.app ou kpi.server
+_application = Paresseux(create_app)
+
+
+def __getattr__(nom):
+    if nom == "app":
+        return _application()
+    if nom == "server":
+        return _application().server  # point d'entrée WSGI pour gunicorn
+    raise AttributeError(f"module {__name__!r} has no attribute {nom!r}")
+
+# Lancement de l'application
+if __name__ == '__main__':
+    create_app().run(debug=True, port=8052)
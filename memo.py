@@ -0,0 +1,116 @@
+# MÉMOÏSATION DES RÉSULTATS DE CALLBACKS
+# Clé : (fonction, version des données, filtres normalisés). LRU bornée en
+# mémoire, doublée si demandé d'un cache disque partagé entre les workers.
+# Changer de version (rechargement ou ajout de transactions) invalide tout.
+# Les données des vues (donnees.AJour) sont remises à la version courante avant
+# chaque calcul : une valeur n'est enregistrée que si la version n'a pas changé
+# entre la clé et la fin du calcul, donc jamais un état ancien sous une clé récente.
+import functools
+import os
+import threading
+from collections import OrderedDict
+
+from donnees import CACHE_DIR, CSV_PATH, source_signature
+from instrumentation import enregistrer_cache, noter_cache
+
+TAILLE_MEMO = int(os.environ.get("APP_DASH_MEMO_TAILLE", 256))
+MEMO_DISQUE = os.environ.get("APP_DASH_MEMO_DISQUE", "0") == "1"
+TAILLE_MAX_DISQUE = 512 * 1024 * 1024
+
+
+def version_donnees(path=CSV_PATH):
+    # Change à chaque réécriture ou ajout au fichier source
+    signature = source_signature(path)
+    return signature["mtime_ns"], signature["size"]
+
+
+def normaliser(valeur):
+    # Listes de libellés en tuples triés (l'ordre de sélection ne compte pas) ;
+    # les plages numériques gardent leur ordre
+    if isinstance(valeur, (list, tuple, set)):
+        valeurs = tuple(normaliser(v) for v in valeur)
+        return tuple(sorted(valeurs)) if all(isinstance(v, str) for v in valeurs) else valeurs
+    if isinstance(valeur, dict):
+        return tuple(sorted((k, normaliser(v)) for k, v in valeur.items()))
+    return valeur
+
+
+class MemoCache:
+    def __init__(self, nom, capacite=TAILLE_MEMO, version=version_donnees, disque=MEMO_DISQUE):
+        self.nom = nom
+        self.capacite = capacite
+        self.version = version
+        self._memoire = OrderedDict()
+        self._verrou = threading.Lock()
+        self.succes = self.succes_disque = self.echecs = 0
+
+        self.disque = None
+        if disque:
+            import diskcache
+
+            self.disque = diskcache.Cache(os.path.join(CACHE_DIR, "memo"), size_limit=TAILLE_MAX_DISQUE,
+                                          eviction_policy="least-recently-used")
+        enregistrer_cache(self)
+
+    def _lire(self, cle):
+        with self._verrou:
+            trouve = cle in self._memoire
+            if trouve:
+                self._memoire.move_to_end(cle)
+                self.succes += 1
+                valeur = self._memoire[cle]
+        if trouve:
+            noter_cache(self.nom, True)
+            return True, valeur
+
+        if self.disque is not None:
+            valeur = self.disque.get(cle, default=self, retry=True)
+            if valeur is not self:
+                with self._verrou:
+                    self.succes_disque += 1
+                self._ecrire_memoire(cle, valeur)
+                noter_cache(self.nom, True)
+                return True, valeur
+
+        with self._verrou:
+            self.echecs += 1
+        noter_cache(self.nom, False)
+        return False, None
+
+    def _ecrire_memoire(self, cle, valeur):
+        with self._verrou:
+            self._memoire[cle] = valeur
+            self._memoire.move_to_end(cle)
+            while len(self._memoire) > self.capacite:
+                self._memoire.popitem(last=False)
+
+    def memoiser(self, fonction):
+        @functools.wraps(fonction)
+        def enveloppe(*args):
+            version = self.version()
+            cle = (self.nom, fonction.__name__, version, normaliser(args))
+            trouve, valeur = self._lire(cle)
+            if trouve:
+                return valeur
+            valeur = fonction(*args)
+            if self.version() != version:
+                # Données modifiées pendant le calcul : la valeur ne correspond pas
+                # forcément à la version de la clé, on ne la partage pas
+                return valeur
+            self._ecrire_memoire(cle, valeur)
+            if self.disque is not None:
+                self.disque.set(cle, valeur, retry=True)
+            return valeur
+        return enveloppe
+
+    def stats(self):
+        with self._verrou:
+            total = self.succes + self.succes_disque + self.echecs
+            return {
+                "cache": self.nom,
+                "entrees": len(self._memoire),
+                "succes": self.succes,
+                "succes_disque": self.succes_disque,
+                "echecs": self.echecs,
+                "taux_succes": (self.succes + self.succes_disque) / total if total else 0.0,
+            }
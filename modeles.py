@@ -0,0 +1,292 @@
+# MODÈLES D'ANOMALIES PERSISTÉS ET RÉUTILISABLES
+# Un modèle entraîné (normalisation + IsolationForest) est enregistré sous une clé
+# dérivée de l'empreinte du jeu de données, des colonnes choisies et de la
+# contamination : relancer la même analyse recharge le modèle au lieu de le
+# réentraîner, et un nouveau fichier peut être scoré avec un modèle existant.
+import hashlib
+import json
+import os
+import re
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from donnees import CACHE_DIR
+
+REPERTOIRE_MODELES = os.path.join(CACHE_DIR, "modeles")
+VERSION_MODELE = 3
+
+# Mode d'entraînement à grande échelle : tous les cœurs (n_jobs), ajustement sur
+# un échantillon de lignes (les arbres ne tirent que max_samples lignes chacun ;
+# l'échantillon sert surtout au seuil de contamination), puis score de toutes
+# les lignes par morceaux en parallèle
+N_JOBS = int(os.environ.get("APP_DASH_N_JOBS", -1))
+LIGNES_ENTRAINEMENT = 200_000
+TAILLE_MORCEAU_SCORE = 100_000
+CLE_VALIDE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def empreinte(df):
+    # Hash vectorisé du contenu (valeurs et noms de colonnes, sans l'index)
+    h = hashlib.sha256(json.dumps([str(c) for c in df.columns]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def cle_modele(empreinte_donnees, montant_col, date_col, cat_cols, contamination,
+               max_samples="auto", lignes_entrainement=LIGNES_ENTRAINEMENT):
+    config = {
+        "max_samples": max_samples,
+        "lignes_entrainement": lignes_entrainement,
+        "version": VERSION_MODELE,
+        "donnees": empreinte_donnees,
+        "montant": montant_col,
+        "date": date_col,
+        "categories": sorted(cat_cols or []),
+        "contamination": float(contamination),
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def _chemin(cle):
+    if not CLE_VALIDE.match(cle or ""):
+        raise ValueError("Clé de modèle invalide")
+    return os.path.join(REPERTOIRE_MODELES, f"{cle}.joblib")
+
+
+# VARIABLES DU MODÈLE
+# La matrice est construite une seule fois en float32 contigu, colonne par colonne,
+# sans DataFrame intermédiaire : IsolationForest travaille en float32 (aucune
+# conversion) et StandardScaler(copy=False) la normalise en place. Les encodeurs
+# appris à l'entraînement sont enregistrés dans l'artefact et réappliqués au score.
+MAX_MODALITES_GROUPE = 1000  # colonnes au-delà (noms...) exclues des groupes de montants
+MAX_GROUPES = 1_000_000
+# Tranches horaires : nuit (0-5 h), matin (6-11 h), après-midi (12-17 h), soir (18-23 h)
+TRANCHE_HEURE = np.repeat(np.arange(4, dtype=np.float32), 6)
+
+
+def preparer(df, montant_col, date_col):
+    # Montant numérique (lignes sans montant exclues) et date convertie ; copie
+    # superficielle : seules les colonnes converties sont nouvelles, et les lignes
+    # ne sont recopiées que s'il y a des montants manquants
+    df = df.copy(deep=False)
+    df[montant_col] = pd.to_numeric(df[montant_col], errors='coerce')
+    valides = df[montant_col].notna().to_numpy()
+    if not valides.all():
+        df = df[valides]
+    if date_col and date_col in df.columns:
+        df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
+    return df
+
+
+class EncodeurCategoriel:
+    # Modalités vues à l'entraînement et leur fréquence ; les modalités inconnues
+    # et les valeurs manquantes partagent une dernière case « inconnu »
+    def __init__(self, serie):
+        if not isinstance(serie.dtype, pd.CategoricalDtype):
+            serie = serie.astype("category")
+        self.categories = serie.cat.categories
+        codes = serie.cat.codes.to_numpy()
+        comptes = np.bincount(codes[codes >= 0], minlength=len(self.categories))
+        self.frequences = np.append(comptes / max(len(codes), 1), 0.0).astype(np.float32)
+
+    @property
+    def inconnu(self):
+        return len(self.categories)
+
+    def codes(self, serie):
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            # Correspondance calculée sur les catégories puis propagée par les codes
+            table = self.categories.get_indexer(serie.cat.categories)
+            table = np.append(np.where(table < 0, self.inconnu, table), self.inconnu)
+            return table[serie.cat.codes.to_numpy()]
+        codes = self.categories.get_indexer(serie)
+        return np.where(codes < 0, self.inconnu, codes)
+
+
+class MontantParGroupe:
+    # Moyenne et écart-type du montant par groupe (ex. couple de pays) ; un groupe
+    # absent ou trop petit à l'entraînement prend les valeurs globales
+    def __init__(self, groupes, montants, nb_groupes):
+        montants = montants.astype(np.float64)
+        n = np.bincount(groupes, minlength=nb_groupes)
+        somme = np.bincount(groupes, weights=montants, minlength=nb_groupes)
+        carres = np.bincount(groupes, weights=montants * montants, minlength=nb_groupes)
+        moyenne, ecart = montants.mean(), montants.std() or 1.0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            moyennes = somme / n
+            ecarts = np.sqrt(np.maximum(carres / n - moyennes * moyennes, 0))
+        self.moyennes = np.where(n > 0, moyennes, moyenne)
+        self.ecarts = np.where((n > 1) & (ecarts > 0), ecarts, ecart)
+
+    def z(self, groupes, montants):
+        return (montants - self.moyennes[groupes]) / self.ecarts[groupes]
+
+
+def _groupes(codes, encodeurs, colonnes):
+    # Clé entière combinant les codes des colonnes (radix : modalités + inconnu)
+    cle = np.zeros(len(codes[colonnes[0]]), dtype=np.int64)
+    for col in colonnes:
+        cle = cle * (encodeurs[col].inconnu + 1) + codes[col]
+    return cle
+
+
+def ajuster_variables(df, montant_col, date_col, cat_cols):
+    # Encodeurs et statistiques appris sur les données d'entraînement
+    encodeurs = {col: EncodeurCategoriel(df[col]) for col in cat_cols or [] if col in df.columns}
+    colonnes_groupe, nb_groupes = [], 1
+    for col, encodeur in encodeurs.items():
+        if encodeur.inconnu <= MAX_MODALITES_GROUPE and nb_groupes * (encodeur.inconnu + 1) <= MAX_GROUPES:
+            colonnes_groupe.append(col)
+            nb_groupes *= encodeur.inconnu + 1
+    etat = {"montant": montant_col, "date": date_col, "encodeurs": encodeurs,
+            "colonnes_groupe": colonnes_groupe, "groupes": None}
+    if colonnes_groupe:
+        codes = {col: encodeurs[col].codes(df[col]) for col in colonnes_groupe}
+        montants = df[montant_col].to_numpy(dtype=np.float64)
+        etat["groupes"] = MontantParGroupe(_groupes(codes, encodeurs, colonnes_groupe), montants, nb_groupes)
+    return etat
+
+
+def noms_variables(etat):
+    noms = [etat["montant"]]
+    if etat["date"]:
+        noms += ['jour_semaine', 'mois', 'heure', 'tranche_heure']
+    for col in etat["encodeurs"]:
+        noms += [col + '_enc', col + '_freq']
+    if etat["groupes"] is not None:
+        noms.append('montant_z_groupe')
+    return noms
+
+
+def variables(df, etat):
+    # Matrice (lignes x variables) float32 C-contiguë, remplie en place
+    noms = noms_variables(etat)
+    manquantes = [c for c in [etat["montant"], etat["date"], *etat["encodeurs"]] if c and c not in df.columns]
+    if manquantes:
+        raise ValueError(f"Colonnes absentes pour ce modèle : {', '.join(manquantes)}")
+
+    X = np.empty((len(df), len(noms)), dtype=np.float32)
+    montants = df[etat["montant"]].to_numpy(dtype=np.float32, na_value=np.nan)
+    X[:, 0] = montants
+    j = 1
+
+    if etat["date"]:
+        dates = df[etat["date"]]
+        if not pd.api.types.is_datetime64_any_dtype(dates.dtype):
+            dates = pd.to_datetime(dates, errors='coerce')
+        if getattr(dates.dt, "tz", None) is not None:
+            dates = dates.dt.tz_localize(None)  # heure locale
+        valeurs = dates.to_numpy().astype("datetime64[m]")
+        absentes = np.isnat(valeurs)
+        minutes = valeurs.view(np.int64)
+        jours = minutes // 1440
+        heures = (minutes // 60) % 24
+        X[:, j] = (jours + 3) % 7  # 1970-01-01 était un jeudi : lundi = 0
+        X[:, j + 1] = valeurs.astype("datetime64[M]").view(np.int64) % 12 + 1
+        X[:, j + 2] = heures + (minutes % 60) / 60
+        X[:, j + 3] = TRANCHE_HEURE[heures]
+        X[absentes, j:j + 4] = np.nan
+        j += 4
+
+    codes = {}
+    for col, encodeur in etat["encodeurs"].items():
+        codes[col] = encodeur.codes(df[col])
+        X[:, j] = codes[col]
+        X[:, j + 1] = encodeur.frequences[codes[col]]
+        j += 2
+
+    if etat["groupes"] is not None:
+        groupes = _groupes(codes, etat["encodeurs"], etat["colonnes_groupe"])
+        X[:, j] = etat["groupes"].z(groupes, df[etat["montant"]].to_numpy(dtype=np.float64, na_value=np.nan))
+    return X
+
+
+# ENTRAÎNEMENT (OU RECHARGEMENT) ET SCORE
+def charger(cle):
+    try:
+        artefact = joblib.load(_chemin(cle))
+    except (FileNotFoundError, EOFError):
+        return None
+    return artefact if artefact.get("version") == VERSION_MODELE else None
+
+
+def entrainer(df, montant_col, date_col, cat_cols, contamination, empreinte_donnees=None,
+              max_samples="auto", lignes_entrainement=LIGNES_ENTRAINEMENT):
+    # Retourne (artefact, réutilisé) ; df doit déjà exclure les montants manquants.
+    # max_samples : lignes tirées par arbre ; lignes_entrainement : taille maximale
+    # de l'échantillon d'ajustement (encodeurs appris sur toutes les lignes)
+    cle = cle_modele(empreinte_donnees or empreinte(df), montant_col, date_col, cat_cols, contamination,
+                     max_samples, lignes_entrainement)
+    artefact = charger(cle)
+    if artefact is not None:
+        return artefact, True
+
+    etat = ajuster_variables(df, montant_col, date_col, cat_cols)
+    X = variables(df, etat)
+    if lignes_entrainement and len(X) > lignes_entrainement:
+        X = X[np.random.default_rng(42).choice(len(X), lignes_entrainement, replace=False)]
+
+    # scikit-learn n'est importé qu'au premier entraînement (démarrage des
+    # applications plus rapide ; joblib le charge aussi en relisant un modèle)
+    from sklearn.ensemble import IsolationForest
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    debut = time.perf_counter()
+    pipeline = make_pipeline(
+        StandardScaler(copy=False),  # X est déjà une copie propre : normalisation en place
+        IsolationForest(contamination=float(contamination), max_samples=max_samples,
+                        n_jobs=N_JOBS, random_state=42)
+    )
+    pipeline.fit(X)
+    duree_ajustement = time.perf_counter() - debut
+
+    artefact = {
+        "version": VERSION_MODELE,
+        "cle": cle,
+        "montant": montant_col,
+        "date": date_col,
+        "categories": list(cat_cols or []),
+        "contamination": float(contamination),
+        "max_samples": max_samples,
+        "lignes_ajustement": len(X),
+        "variables": noms_variables(etat),
+        "etat_variables": etat,
+        "pipeline": pipeline,
+        "duree_ajustement": duree_ajustement,
+    }
+    os.makedirs(REPERTOIRE_MODELES, exist_ok=True)
+    tmp = _chemin(cle) + f".{os.getpid()}.tmp"
+    joblib.dump(artefact, tmp)
+    os.replace(tmp, _chemin(cle))
+    return artefact, False
+
+
+def scorer(artefact, df, n_jobs=N_JOBS, taille_morceau=TAILLE_MORCEAU_SCORE):
+    # Score continu (opposé de decision_function : > 0 = anomalie) et étiquette 0/1,
+    # calculé par morceaux de lignes répartis sur les cœurs (threads : les arbres
+    # libèrent le GIL et le modèle n'est pas recopié)
+    X = variables(df, artefact["etat_variables"])
+
+    pipeline = artefact["pipeline"]
+    morceaux = [X[i:i + taille_morceau] for i in range(0, len(X), taille_morceau)]
+    if len(morceaux) > 1:
+        resultats = joblib.Parallel(n_jobs=n_jobs, prefer="threads")(
+            joblib.delayed(pipeline.decision_function)(m) for m in morceaux)
+    else:
+        resultats = [pipeline.decision_function(m) for m in morceaux]
+    scores = -np.concatenate(resultats) if resultats else np.empty(0)
+    return scores, (scores > 0).astype(np.int8)
+
+
+def scorer_lot(cle, df):
+    # Point d'entrée du score par lot : nouveau fichier, modèle existant
+    artefact = charger(cle)
+    if artefact is None:
+        raise KeyError(f"Modèle introuvable : {cle}")
+    df = preparer(df, artefact["montant"], artefact["date"])
+    df['anomaly_score'], df['anomaly'] = scorer(artefact, df)
+    return df
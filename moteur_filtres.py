@@ -0,0 +1,159 @@
+# IMPORTS
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from csr import rassembler_csr
+from donnees import AJour
+from index_noms import NameIndex
+
+
+# INDEX CATÉGORIEL : code -> ids de lignes (format CSR)
+class IndexCategoriel:
+    def __init__(self, serie):
+        if not isinstance(serie.dtype, pd.CategoricalDtype):
+            serie = serie.astype("category")
+        self.categories = serie.cat.categories
+        # Décalage de +1 pour que les valeurs manquantes (code -1) aient leur case
+        self.codes = serie.cat.codes.to_numpy().astype(np.int32) + 1
+        self.ordre = np.argsort(self.codes, kind="stable")
+        self.offsets = np.concatenate(
+            ([0], np.cumsum(np.bincount(self.codes, minlength=len(self.categories) + 1)))
+        )
+
+    def codes_pour(self, valeurs):
+        codes = self.categories.get_indexer(pd.Index(valeurs))
+        return np.unique(codes[codes >= 0]) + 1
+
+    def taille(self, codes):
+        return int((self.offsets[codes + 1] - self.offsets[codes]).sum())
+
+    def lignes(self, codes):
+        return rassembler_csr(self.ordre, self.offsets, codes)
+
+    def masque(self, codes, ids):
+        retenus = np.zeros(len(self.categories) + 1, dtype=bool)
+        retenus[codes] = True
+        return retenus[self.codes[ids]]
+
+
+# INDEX TRIÉ : recherche de plages par searchsorted
+class IndexTrie:
+    def __init__(self, serie):
+        self.valeurs = serie.to_numpy()
+        self.ordre = np.argsort(self.valeurs, kind="stable")
+        self.tries = self.valeurs[self.ordre]
+
+    def _borne(self, valeur):
+        if np.issubdtype(self.tries.dtype, np.datetime64):
+            return np.datetime64(pd.Timestamp(valeur), np.datetime_data(self.tries.dtype)[0])
+        if np.issubdtype(self.tries.dtype, np.floating):
+            # Borne dans le type de la colonne : searchsorted (float64) et le masque
+            # (float32) doivent garder le même score 0.9 d'une colonne float32
+            return self.tries.dtype.type(valeur)
+        return valeur
+
+    def plage(self, debut, fin):
+        # Bornes incluses, comme les comparaisons >= / <= d'origine
+        i = 0 if debut is None else np.searchsorted(self.tries, self._borne(debut), side="left")
+        j = len(self.tries) if fin is None else np.searchsorted(self.tries, self._borne(fin), side="right")
+        return int(i), int(max(i, j))
+
+    def masque(self, debut, fin, ids):
+        valeurs = self.valeurs[ids]
+        masque = np.ones(len(ids), dtype=bool)
+        if debut is not None:
+            masque &= valeurs >= self._borne(debut)
+        if fin is not None:
+            masque &= valeurs <= self._borne(fin)
+        return masque
+
+
+# MOTEUR DE FILTRAGE
+class FilterEngine:
+    def __init__(self, frame):
+        # Aucune référence au DataFrame : les index portent leurs propres tableaux
+        self.n = len(frame)
+        self.pays_origine = IndexCategoriel(frame["Pays_Origine"])
+        self.pays_destination = IndexCategoriel(frame["Pays_Destination"])
+        self.montant = IndexTrie(frame["Montant"])
+        self.score = IndexTrie(frame["anomaly_score"])
+        self.date = IndexTrie(frame["Date"])
+        self.noms = NameIndex(frame)
+
+    def _predicats(self, pays_origine, pays_destination, montant, score, date, nom, mode_nom):
+        # Chaque prédicat : (nombre de lignes retenues, matérialisation, test sur des ids)
+        predicats = []
+
+        for index, valeurs in ((self.pays_origine, pays_origine),
+                               (self.pays_destination, pays_destination)):
+            if valeurs:
+                codes = index.codes_pour(valeurs)
+                predicats.append((
+                    index.taille(codes),
+                    lambda index=index, codes=codes: index.lignes(codes),
+                    lambda ids, index=index, codes=codes: index.masque(codes, ids),
+                ))
+
+        if nom:
+            termes = self.noms.termes(nom, mode_nom)
+            predicats.append((
+                self.noms.taille(termes),
+                lambda: self.noms.lignes(termes),
+                lambda ids: self.noms.masque(termes, ids),
+            ))
+
+        for index, plage in ((self.montant, montant), (self.score, score), (self.date, date)):
+            if plage is not None:
+                debut, fin = plage
+                i, j = index.plage(debut, fin)
+                if j - i == self.n:
+                    continue  # plage couvrant tout : aucun effet
+                predicats.append((
+                    j - i,
+                    lambda index=index, i=i, j=j: index.ordre[i:j],
+                    lambda ids, index=index, debut=debut, fin=fin: index.masque(debut, fin, ids),
+                ))
+
+        return predicats
+
+    def select(self, pays_origine=None, pays_destination=None, montant=None, score=None, date=None,
+               nom=None, mode_nom="contains"):
+        # On matérialise le prédicat le plus sélectif puis on teste les autres
+        # uniquement sur les lignes candidates : aucune copie de DataFrame.
+        predicats = self._predicats(pays_origine, pays_destination, montant, score, date, nom, mode_nom)
+        if not predicats:
+            return np.arange(self.n)
+
+        predicats.sort(key=lambda p: p[0])
+        ids = predicats[0][1]()
+        for _, _, tester in predicats[1:]:
+            if len(ids) == 0:
+                break
+            ids = ids[tester(ids)]
+
+        return np.sort(ids)
+
+
+# INDEX DES ANOMALIES PARTAGÉS PAR LES VUES (app_dash, filtres, portail)
+# Construits au premier besoin puis tenus à jour avec les lots ajoutés : ids
+# prolongés, moteur reconstruit sur les anomalies (sans relire l'historique)
+def ids_anomalies(df, debut=0):
+    # Pré-filtrage : ids des anomalies (à partir de la ligne debut), sans copie
+    return debut + np.flatnonzero(df['anomaly'].to_numpy()[debut:] == 1)
+
+
+def _indexer(df, ids=None):
+    ids = ids_anomalies(df) if ids is None else ids
+    return SimpleNamespace(df=df, ids=ids, moteur=FilterEngine(df.iloc[ids]))
+
+
+def _etendre(index, df, debut):
+    nouveaux = ids_anomalies(df, debut)
+    if len(nouveaux) == 0:
+        return SimpleNamespace(df=df, ids=index.ids, moteur=index.moteur)
+    return _indexer(df, np.concatenate((index.ids, nouveaux)))
+
+
+index_anomalies = AJour(_indexer, _etendre)
@@ -1,263 +1,584 @@
-import dash
-from dash import dcc, html, Input, Output, State, callback
-import dash_bootstrap_components as dbc
-import pandas as pd
-import numpy as np
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
-import base64
-import io
-from datetime import datetime
-from dash.exceptions import PreventUpdate
-
-app = dash.Dash(__name__, external_stylesheets=[dbc.themes.FLATLY])
-app.title = "Analyse Universelle de Transferts Bancaires"
-
-# Layout avec configuration flexible
-app.layout = dbc.Container([
-    dbc.Row(dbc.Col(html.H1("Analyse et détection d'anomalies", 
-                           className="text-center my-4"))),
-    
-    # Section Configuration
-    dbc.Row([
-        dbc.Col([
-            html.H4("Configuration des colonnes", className="mb-3"),
-            
-            dbc.Label("Colonne Montant:"),
-            dcc.Dropdown(id='col-montant', placeholder="Sélectionnez la colonne"),
-            
-            dbc.Label("Colonne Date (optionnel):"),
-            dcc.Dropdown(id='col-date', placeholder="Sélectionnez la colonne"),
-            
-            dbc.Label("Colonnes Catégorielles (optionnel):"),
-            dcc.Dropdown(id='col-categories', multi=True, placeholder="Sélectionnez les colonnes"),
-            
-            html.Hr(),
-            
-            dbc.Label("Paramètres du modèle:"),
-            dbc.InputGroup([
-                dbc.InputGroupText("Contamination:"),
-                dbc.Input(id='contamination', type='number', value=0.01, step=0.01, min=0.001, max=0.5)
-            ], className="mb-3"),
-        ], md=4),
-        
-        # Section Upload
-        dbc.Col([
-            dcc.Upload(
-                id='upload-data',
-                children=html.Div([
-                    'Glissez-déposez un fichier CSV ou Excel',
-                    html.Br(),
-                    '(colonnes requises: montant et date)'
-                ]),
-                style={
-                    'height': '200px',
-                    'borderStyle': 'dashed',
-                    'textAlign': 'center',
-                    'padding': '40px'
-                }
-            ),
-            html.Div(id='file-info', className="mt-3"),
-            dbc.Button("Lancer l'Analyse", id='run-analysis', color="primary", className="mt-3", disabled=True)
-        ], md=8)
-    ], className="mb-4"),
-    
-    # Résultats
-    dbc.Tabs([
-        dbc.Tab(label="Aperçu des Données", tab_id="tab-data"),
-        dbc.Tab(label="Anomalies Détectées", tab_id="tab-anomalies"),
-        dbc.Tab(label="Visualisation", tab_id="tab-viz")
-    ], id="tabs", active_tab="tab-data"),
-    
-    html.Div(id="tab-content", className="p-3"),
-    
-    # Stockage
-    dcc.Store(id='store-original-data'),
-    dcc.Store(id='store-processed-data')
-], fluid=True)
-
-# Callback pour mettre à jour les sélecteurs de colonnes
-@callback(
-    [Output('col-montant', 'options'),
-     Output('col-date', 'options'),
-     Output('col-categories', 'options'),
-     Output('file-info', 'children'),
-     Output('run-analysis', 'disabled')],
-    Input('upload-data', 'contents'),
-    State('upload-data', 'filename')
-)
-def update_column_selectors(contents, filename):
-    if contents is None:
-        raise PreventUpdate
-    
-    content_type, content_string = contents.split(',')
-    decoded = base64.b64decode(content_string)
-    
-    try:
-        if 'csv' in filename.lower():
-            df = pd.read_csv(io.StringIO(decoded.decode('utf-8')))
-        else:
-            df = pd.read_excel(io.BytesIO(decoded))
-            
-        cols = [{'label': col, 'value': col} for col in df.columns]
-        
-        file_info = html.Div([
-            html.B(f"Fichier chargé: {filename}"),
-            html.Br(),
-            html.Span(f"{len(df)} lignes, {len(df.columns)} colonnes"),
-            html.Br(),
-            dbc.Alert("Veuillez configurer les colonnes avant l'analyse", 
-                      color="warning", className="mt-2")
-        ])
-        
-        return cols, cols, cols, file_info, True
-    
-    except Exception as e:
-        return [], [], [], html.Div(f"Erreur: {str(e)}", className="text-danger"), True
-
-# Callback pour lancer l'analyse
-@callback(
-    [Output('store-processed-data', 'data'),
-     Output('tab-content', 'children', allow_duplicate=True),
-     Output('run-analysis', 'disabled')],
-    Input('run-analysis', 'n_clicks'),
-    [State('store-original-data', 'data'),
-     State('col-montant', 'value'),
-     State('col-date', 'value'),
-     State('col-categories', 'value'),
-     State('contamination', 'value')],
-    prevent_initial_call=True
-)
-def run_analysis(n_clicks, json_data, montant_col, date_col, cat_cols, contamination):
-    if n_clicks is None or json_data is None or montant_col is None:
-        raise PreventUpdate
-    
-    df = pd.read_json(io.StringIO(json_data), orient='split')
-    
-    # Préparation des données
-    try:
-        features = [montant_col]
-        
-        # Feature engineering pour la date si disponible
-        if date_col and date_col in df.columns:
-            df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
-            df['jour_semaine'] = df[date_col].dt.dayofweek
-            df['mois'] = df[date_col].dt.month
-            features += ['jour_semaine', 'mois']
-        
-        # Encodage des catégories si spécifiées
-        if cat_cols:
-            for col in cat_cols:
-                if col in df.columns:
-                    df[col+'_enc'] = pd.factorize(df[col])[0]
-                    features.append(col+'_enc')
-        
-        # Vérification que le montant est numérique
-        df[montant_col] = pd.to_numeric(df[montant_col], errors='coerce')
-        df = df.dropna(subset=[montant_col])
-        
-        # Normalisation
-        scaler = StandardScaler()
-        X = scaler.fit_transform(df[features])
-        
-        # Détection d'anomalies
-        model = IsolationForest(contamination=float(contamination), random_state=42)
-        df['anomaly_score'] = model.fit_predict(X)
-        df['anomaly'] = np.where(df['anomaly_score'] < 0, 1, 0)
-        
-        # Sauvegarde des résultats
-        results = df.to_json(date_format='iso', orient='split')
-        
-        # Affichage initial
-        preview = dbc.Card([
-            dbc.CardHeader("Aperçu des données analysées"),
-            dbc.CardBody(create_data_table(df))
-        ])
-        
-        return results, preview, True
-    
-    except Exception as e:
-        error = dbc.Alert(f"Erreur lors de l'analyse: {str(e)}", color="danger")
-        return None, error, False
-
-# Affichage des onglets
-@callback(
-    Output('tab-content', 'children'),
-    Input('tabs', 'active_tab'),
-    State('store-processed-data', 'data')
-)
-def display_tab(active_tab, processed_data):
-    if processed_data is None:
-        return dbc.Alert("Veuvez d'abord charger et analyser des données", color="info")
-    
-    df = pd.read_json(io.StringIO(processed_data), orient='split')
-    
-    if active_tab == "tab-data":
-        return create_data_table(df)
-    elif active_tab == "tab-anomalies":
-        anomalies = df[df['anomaly'] == 1]
-        return create_anomalies_table(anomalies)
-    elif active_tab == "tab-viz":
-        return create_visualizations(df)
-
-def create_data_table(df):
-    return dash.dash_table.DataTable(
-        data=df.to_dict('records'),
-        columns=[{'name': col, 'id': col} for col in df.columns],
-        page_size=15,
-        style_table={'overflowX': 'auto'}
-    )
-
-def create_anomalies_table(df):
-    return html.Div([
-        html.H4(f"{len(df)} anomalies détectées"),
-        dash.dash_table.DataTable(
-            data=df.to_dict('records'),
-            columns=[{'name': col, 'id': col} for col in df.columns],
-            page_size=15,
-            style_table={'overflowX': 'auto'}
-        )
-    ])
-
-def create_visualizations(df):
-    montant_col = [col for col in df.columns if 'montant' in col.lower()][0]
-    
-    return html.Div([
-        dbc.Row([
-            dbc.Col(dcc.Graph(
-                figure={
-                    'data': [{
-                        'x': df.index,
-                        'y': df[montant_col],
-                        'mode': 'markers',
-                        'marker': {
-                            'color': df['anomaly'],
-                            'colorscale': [[0, 'blue'], [1, 'red']]
-                        }
-                    }],
-                    'layout': {
-                        'title': 'Montants des Transactions (Rouge = Anomalies)',
-                        'xaxis': {'title': 'Index'},
-                        'yaxis': {'title': 'Montant'}
-                    }
-                }
-            ), md=6),
-            dbc.Col(dcc.Graph(
-                figure={
-                    'data': [{
-                        'x': df[montant_col],
-                        'type': 'histogram',
-                        'name': 'Distribution'
-                    }],
-                    'layout': {
-                        'title': 'Distribution des Montants',
-                        'xaxis': {'title': 'Montant'},
-                        'yaxis': {'title': 'Fréquence'}
-                    }
-                }
-            ), md=6)
-        ])
-    ])
-
-if __name__ == '__main__':
-    app.run(debug=True, port=8053)
\ No newline at end of file
+import dash
+from dash import dcc, html, Input, Output, State
+import dash_bootstrap_components as dbc
+import pandas as pd
+import numpy as np
+import os
+import time
+from datetime import datetime
+from dash.exceptions import PreventUpdate
+from flask import abort
+
+from donnees import Paresseux
+from export import reponse_export
+from instrumentation import etape, instrumenter
+from ingestion import apercu, apercu_chemin, enregistrer_upload, ingerer, memoire
+from modeles import LIGNES_ENTRAINEMENT, empreinte, entrainer, preparer, scorer, scorer_lot
+from pagination import page_records
+from reduction import histogramme, reduire_nuage
+from stockage import DatasetStore
+from taches import background_manager, creneau_analyse
+from traitement_lots import RACINE_LOTS, analyser_lot, lister_fichiers
+
+# Jeux de données de session conservés côté serveur (dcc.Store ne contient qu'un jeton)
+store = DatasetStore()
+
+# Callbacks déclarés ici, enregistrés par create_app sur sa seule application
+# (dash.callback les ajouterait à toutes les applications du processus)
+_callbacks = []
+
+
+def callback(*args, **kwargs):
+    def enregistrer(fonction):
+        _callbacks.append((args, kwargs, fonction))
+        return fonction
+    return enregistrer
+
+
+# Export des anomalies d'un résultat d'analyse (CSV ou Parquet en flux)
+def export_anomalies(jeton, format):
+    df = store.get(jeton)
+    if df is None:
+        abort(404)
+    return reponse_export(df, np.flatnonzero(df['anomaly'].to_numpy() == 1), format, "anomalies")
+
+# Layout avec configuration flexible
+layout = dbc.Container([
+    dbc.Row(dbc.Col(html.H1("Analyse et détection d'anomalies", 
+                           className="text-center my-4"))),
+    
+    # Section Configuration
+    dbc.Row([
+        dbc.Col([
+            html.H4("Configuration des colonnes", className="mb-3"),
+            
+            dbc.Label("Colonne Montant:"),
+            dcc.Dropdown(id='col-montant', placeholder="Sélectionnez la colonne"),
+            
+            dbc.Label("Colonne Date (optionnel):"),
+            dcc.Dropdown(id='col-date', placeholder="Sélectionnez la colonne"),
+            
+            dbc.Label("Colonnes Catégorielles (optionnel):"),
+            dcc.Dropdown(id='col-categories', multi=True, placeholder="Sélectionnez les colonnes"),
+            
+            html.Hr(),
+            
+            dbc.Label("Paramètres du modèle:"),
+            dbc.InputGroup([
+                dbc.InputGroupText("Contamination:"),
+                dbc.Input(id='contamination', type='number', value=0.01, step=0.01, min=0.001, max=0.5)
+            ], className="mb-3"),
+            dbc.InputGroup([
+                dbc.InputGroupText("Lignes par arbre:"),
+                dbc.Input(id='max-samples', type='number', value=256, step=1, min=16)
+            ], className="mb-3"),
+            dbc.InputGroup([
+                dbc.InputGroupText("Échantillon d'ajustement:"),
+                dbc.Input(id='lignes-entrainement', type='number', value=LIGNES_ENTRAINEMENT, step=10_000, min=1_000)
+            ], className="mb-3"),
+        ], md=4),
+        
+        # Section Upload
+        dbc.Col([
+            dcc.Upload(
+                id='upload-data',
+                children=html.Div([
+                    'Glissez-déposez un fichier CSV ou Excel',
+                    html.Br(),
+                    '(colonnes requises: montant et date)'
+                ]),
+                style={
+                    'height': '200px',
+                    'borderStyle': 'dashed',
+                    'textAlign': 'center',
+                    'padding': '40px'
+                }
+            ),
+            html.Div(id='file-info', className="mt-3"),
+            dbc.Progress(id='upload-progress', value=0, className="mt-2"),
+            dbc.Button("Lancer l'Analyse", id='run-analysis', color="primary", className="mt-3", disabled=True),
+            dbc.Button("Annuler", id='cancel-analysis', color="secondary", className="mt-3 ms-2", disabled=True),
+            dbc.Button("Scorer avec le dernier modèle", id='score-model', color="info",
+                       className="mt-3 ms-2", disabled=True),
+            dbc.Progress(id='analysis-progress', value=0, striped=True, animated=True, className="mt-3"),
+            
+            # Traitement par lot : plusieurs fichiers du serveur, un seul modèle
+            html.Hr(),
+            dbc.Label(f"Traitement par lot (répertoire ou motif sous {RACINE_LOTS}):"),
+            dbc.InputGroup([
+                dbc.Input(id='batch-motif', placeholder="ex. 2024 ou 2024/*.csv"),
+                dbc.Button("Lister", id='list-batch', color="secondary"),
+                dbc.Button("Analyser le lot", id='run-batch', color="primary", disabled=True)
+            ]),
+            html.Div(id='batch-info', className="mt-2"),
+            dbc.Progress(id='batch-progress', value=0, striped=True, animated=True, className="mt-2")
+        ], md=8)
+    ], className="mb-4"),
+    
+    # Résultats
+    dbc.Tabs([
+        dbc.Tab(label="Aperçu des Données", tab_id="tab-data"),
+        dbc.Tab(label="Anomalies Détectées", tab_id="tab-anomalies"),
+        dbc.Tab(label="Visualisation", tab_id="tab-viz")
+    ], id="tabs", active_tab="tab-data"),
+    
+    html.Div(id="tab-content", className="p-3"),
+    
+    # Stockage (jetons vers le DatasetStore)
+    dcc.Store(id='store-upload'),
+    dcc.Store(id='store-original-data'),
+    dcc.Store(id='store-processed-data'),
+    dcc.Store(id='store-modele')
+], fluid=True)
+
+# Callback pour mettre à jour les sélecteurs de colonnes (en-tête + échantillon uniquement)
+@callback(
+    [Output('col-montant', 'options'),
+     Output('col-date', 'options'),
+     Output('col-categories', 'options'),
+     Output('file-info', 'children'),
+     Output('run-analysis', 'disabled'),
+     Output('store-upload', 'data')],
+    Input('upload-data', 'contents'),
+    State('upload-data', 'filename')
+)
+def update_column_selectors(contents, filename):
+    if contents is None:
+        raise PreventUpdate
+    
+    try:
+        fichier = enregistrer_upload(contents, filename)
+        colonnes, echantillon, taille = apercu(fichier, filename)
+            
+        cols = [{'label': col, 'value': col} for col in colonnes]
+        
+        file_info = html.Div([
+            html.B(f"Fichier chargé: {filename}"),
+            html.Br(),
+            html.Span(f"{taille / 1e6:.1f} Mo, {len(colonnes)} colonnes — lecture en cours..."),
+            html.Br(),
+            dbc.Alert("Veuillez configurer les colonnes avant l'analyse", 
+                      color="warning", className="mt-2")
+        ])
+        
+        return cols, cols, cols, file_info, True, {'fichier': fichier, 'nom': filename}
+    
+    except Exception as e:
+        return [], [], [], html.Div(f"Erreur: {str(e)}", className="text-danger"), True, None
+
+# Lecture du corps du fichier par lots, en tâche de fond
+@callback(
+    [Output('store-original-data', 'data'),
+     Output('file-info', 'children', allow_duplicate=True),
+     Output('run-analysis', 'disabled', allow_duplicate=True)],
+    Input('store-upload', 'data'),
+    background=True,
+    manager=background_manager,
+    progress=[Output('upload-progress', 'value'),
+              Output('upload-progress', 'label')],
+    progress_default=[0, ""],
+    prevent_initial_call=True
+)
+def ingest_upload(set_progress, upload):
+    if not upload:
+        raise PreventUpdate
+    
+    def progression(avancement, lignes):
+        set_progress((int(avancement * 100), f"{lignes:,} lignes"))
+    
+    try:
+        df = ingerer(upload['fichier'], upload['nom'], progression)
+        
+        file_info = html.Div([
+            html.B(f"Fichier chargé: {upload['nom']}"),
+            html.Br(),
+            html.Span(f"{len(df)} lignes, {len(df.columns)} colonnes ({memoire(df) / 1e6:.1f} Mo en mémoire)"),
+            html.Br(),
+            dbc.Alert("Veuillez configurer les colonnes avant l'analyse", 
+                      color="warning", className="mt-2")
+        ])
+        
+        return store.put(df), file_info, False
+    
+    except Exception as e:
+        return None, html.Div(f"Erreur: {str(e)}", className="text-danger"), True
+
+# Callback pour lancer l'analyse (tâche de fond : le worker reste disponible)
+@callback(
+    [Output('store-processed-data', 'data'),
+     Output('tab-content', 'children', allow_duplicate=True),
+     Output('store-modele', 'data'),
+     Output('score-model', 'disabled')],
+    Input('run-analysis', 'n_clicks'),
+    [State('store-original-data', 'data'),
+     State('col-montant', 'value'),
+     State('col-date', 'value'),
+     State('col-categories', 'value'),
+     State('contamination', 'value'),
+     State('max-samples', 'value'),
+     State('lignes-entrainement', 'value')],
+    background=True,
+    manager=background_manager,
+    running=[(Output('run-analysis', 'disabled'), True, False),
+             (Output('cancel-analysis', 'disabled'), False, True)],
+    cancel=[Input('cancel-analysis', 'n_clicks')],
+    progress=[Output('analysis-progress', 'value'),
+              Output('analysis-progress', 'label')],
+    progress_default=[0, ""],
+    prevent_initial_call=True
+)
+def run_analysis(set_progress, n_clicks, original_token, montant_col, date_col, cat_cols, contamination,
+                 max_samples, lignes_entrainement):
+    if n_clicks is None or original_token is None or montant_col is None:
+        raise PreventUpdate
+    
+    with creneau_analyse(set_progress):
+        return analyser(set_progress, original_token, montant_col, date_col, cat_cols, contamination,
+                        max_samples, lignes_entrainement)
+
+def analyser(set_progress, original_token, montant_col, date_col, cat_cols, contamination,
+             max_samples=256, lignes_entrainement=LIGNES_ENTRAINEMENT):
+    set_progress((5, "Chargement des données"))
+    df = store.get(original_token)
+    if df is None:
+        return None, dbc.Alert("Session expirée : veuillez recharger le fichier", color="warning"), None, True
+    
+    try:
+        set_progress((15, "Préparation des variables"))
+        signature = empreinte(df)
+        df = preparer(df, montant_col, date_col)  # copie : le jeu original reste intact
+        
+        # Modèle déjà entraîné pour ces données et cette configuration, sinon entraînement
+        set_progress((35, "Entraînement de l'IsolationForest"))
+        artefact, reutilise = entrainer(df, montant_col, date_col, cat_cols, contamination, signature,
+                                        int(max_samples or 256), int(lignes_entrainement or LIGNES_ENTRAINEMENT))
+        
+        # Scores continus (> 0 = anomalie), par morceaux en parallèle sur toutes les lignes
+        set_progress((70, "Calcul des scores"))
+        debut = time.perf_counter()
+        df['anomaly_score'], df['anomaly'] = scorer(artefact, df)
+        duree_score = time.perf_counter() - debut
+        
+        # Sauvegarde des résultats côté serveur
+        set_progress((90, "Enregistrement des résultats"))
+        results = store.put(df)
+        
+        # Affichage initial
+        preview = dbc.Card([
+            dbc.CardHeader("Aperçu des données analysées"),
+            dbc.CardBody([
+                html.Small(("Modèle existant réutilisé" if reutilise else "Nouveau modèle enregistré")
+                           + f" ({artefact['cle'][:8]}) — ajustement sur {artefact['lignes_ajustement']:,} lignes"
+                           + f" en {artefact['duree_ajustement']:.2f} s, score de {len(df):,} lignes"
+                           + f" en {duree_score:.2f} s", className="text-muted"),
+                create_data_table(df)
+            ])
+        ])
+        
+        set_progress((100, "Terminé"))
+        return results, preview, artefact['cle'], False
+    
+    except Exception as e:
+        error = dbc.Alert(f"Erreur lors de l'analyse: {str(e)}", color="danger")
+        return None, error, None, True
+
+# Score d'un nouveau fichier avec le dernier modèle (sans réentraînement)
+@callback(
+    [Output('store-processed-data', 'data', allow_duplicate=True),
+     Output('tab-content', 'children', allow_duplicate=True)],
+    Input('score-model', 'n_clicks'),
+    [State('store-original-data', 'data'),
+     State('store-modele', 'data')],
+    prevent_initial_call=True
+)
+def score_with_model(n_clicks, original_token, cle):
+    df = store.get(original_token)
+    if df is None or cle is None:
+        raise PreventUpdate
+    
+    try:
+        df = scorer_lot(cle, df)
+        preview = dbc.Card([
+            dbc.CardHeader(f"Données scorées avec le modèle {cle[:8]}"),
+            dbc.CardBody(create_data_table(df))
+        ])
+        return store.put(df), preview
+    
+    except (KeyError, ValueError) as e:
+        return dash.no_update, dbc.Alert(f"Score impossible : {str(e)}", color="danger")
+
+# Traitement par lot : liste des fichiers et colonnes du premier fichier
+@callback(
+    [Output('col-montant', 'options', allow_duplicate=True),
+     Output('col-date', 'options', allow_duplicate=True),
+     Output('col-categories', 'options', allow_duplicate=True),
+     Output('batch-info', 'children'),
+     Output('run-batch', 'disabled')],
+    Input('list-batch', 'n_clicks'),
+    State('batch-motif', 'value'),
+    prevent_initial_call=True
+)
+def list_batch(n_clicks, motif):
+    try:
+        fichiers = lister_fichiers(motif)
+        if not fichiers:
+            return [], [], [], dbc.Alert("Aucun fichier CSV ou Excel trouvé", color="warning"), True
+        colonnes, _, _ = apercu_chemin(fichiers[0], os.path.basename(fichiers[0]))
+    except (ValueError, OSError) as e:
+        return [], [], [], html.Div(f"Erreur: {str(e)}", className="text-danger"), True
+    
+    cols = [{'label': col, 'value': col} for col in colonnes]
+    taille = sum(os.path.getsize(f) for f in fichiers)
+    info = html.Div([
+        html.B(f"{len(fichiers)} fichiers ({taille / 1e6:.1f} Mo)"),
+        html.Br(),
+        html.Small(", ".join(os.path.basename(f) for f in fichiers[:20])
+                   + (" ..." if len(fichiers) > 20 else ""), className="text-muted")
+    ])
+    return cols, cols, cols, info, False
+
+# Analyse du lot en tâche de fond (mêmes colonnes et paramètres que l'analyse d'un fichier)
+@callback(
+    [Output('store-processed-data', 'data', allow_duplicate=True),
+     Output('tab-content', 'children', allow_duplicate=True),
+     Output('store-modele', 'data', allow_duplicate=True),
+     Output('score-model', 'disabled', allow_duplicate=True)],
+    Input('run-batch', 'n_clicks'),
+    [State('batch-motif', 'value'),
+     State('col-montant', 'value'),
+     State('col-date', 'value'),
+     State('col-categories', 'value'),
+     State('contamination', 'value'),
+     State('max-samples', 'value'),
+     State('lignes-entrainement', 'value')],
+    background=True,
+    manager=background_manager,
+    running=[(Output('run-batch', 'disabled'), True, False)],
+    progress=[Output('batch-progress', 'value'),
+              Output('batch-progress', 'label')],
+    progress_default=[0, ""],
+    prevent_initial_call=True
+)
+def run_batch(set_progress, n_clicks, motif, montant_col, date_col, cat_cols, contamination,
+              max_samples, lignes_entrainement):
+    if montant_col is None:
+        raise PreventUpdate
+    
+    etapes = {"Lecture des fichiers": (0, 60), "Entraînement de l'IsolationForest": (60, 80),
+              "Calcul des scores": (80, 95)}
+    
+    def progression(etape, avancement):
+        debut, fin = etapes[etape]
+        set_progress((int(debut + (fin - debut) * avancement), etape))
+    
+    with creneau_analyse(set_progress):
+        try:
+            df, rapport, artefact, reutilise, durees = analyser_lot(
+                lister_fichiers(motif), montant_col, date_col, cat_cols, contamination,
+                max_samples=int(max_samples or 256),
+                lignes_entrainement=int(lignes_entrainement or LIGNES_ENTRAINEMENT),
+                progression=progression)
+            results = store.put(df)
+        except (ValueError, KeyError, OSError) as e:
+            return None, dbc.Alert(f"Erreur lors de l'analyse du lot: {str(e)}", color="danger"), None, True
+    
+    rapport = rapport.assign(octets=(rapport['octets'] / 1e6).round(2),
+                             lecture_s=rapport['lecture_s'].round(3),
+                             decodage_s=rapport['decodage_s'].round(3),
+                             lignes_par_s=rapport['lignes_par_s'].round(0)).rename(columns={'octets': 'Mo'})
+    preview = dbc.Card([
+        dbc.CardHeader(f"Lot de {len(rapport)} fichiers : {len(df):,} lignes, "
+                       f"{int(df['anomaly'].sum()):,} anomalies"),
+        dbc.CardBody([
+            html.Small(f"Lecture {durees['lecture_s']:.2f} s, modèle {durees['modele_s']:.2f} s "
+                       f"({'réutilisé' if reutilise else 'entraîné'} {artefact['cle'][:8]}), "
+                       f"score {durees['score_s']:.2f} s — {durees['lignes_par_s']:,.0f} lignes/s",
+                       className="text-muted"),
+            dbc.Table.from_dataframe(rapport.fillna(""), striped=True, bordered=True, size="sm",
+                                     className="mt-2")
+        ])
+    ])
+    set_progress((100, "Terminé"))
+    return results, preview, artefact['cle'], False
+
+# Affichage des onglets
+@callback(
+    Output('tab-content', 'children'),
+    Input('tabs', 'active_tab'),
+    State('store-processed-data', 'data')
+)
+def display_tab(active_tab, processed_data):
+    if processed_data is None:
+        return dbc.Alert("Veuvez d'abord charger et analyser des données", color="info")
+    
+    with etape("chargement"):
+        df = store.get(processed_data)
+    if df is None:
+        return dbc.Alert("Session expirée : veuillez relancer l'analyse", color="warning")
+    
+    with etape("rendu"):
+        if active_tab == "tab-data":
+            return create_data_table(df)
+        elif active_tab == "tab-anomalies":
+            return create_anomalies_table(df, processed_data)
+        elif active_tab == "tab-viz":
+            return create_visualizations(df)
+
+# Tables paginées côté serveur : seule la page affichée quitte le DatasetStore
+# (tri et filtres par pagination.page_records, comme filtres.py)
+def _colonnes(df):
+    types = {"i": "numeric", "u": "numeric", "f": "numeric", "M": "datetime"}
+    return [{'name': col, 'id': col, 'type': types.get(df[col].dtype.kind, "text")} for col in df.columns]
+
+
+def _table(id, df, lignes):
+    return dash.dash_table.DataTable(
+        id=id,
+        columns=_colonnes(df),
+        page_current=0,
+        page_size=15,
+        page_count=max(1, -(-lignes // 15)),
+        page_action='custom',
+        sort_action='custom',
+        sort_mode='multi',
+        sort_by=[],
+        filter_action='custom',
+        filter_query='',
+        style_table={'overflowX': 'auto'}
+    )
+
+
+def create_data_table(df):
+    return _table('table-donnees', df, len(df))
+
+def create_anomalies_table(df, jeton):
+    nombre = int((df['anomaly'] == 1).sum())
+    return html.Div([
+        html.H4(f"{nombre} anomalies détectées"),
+        html.Div([
+            html.A("Exporter en CSV", href=dash.get_relative_path(f"/export/nd/{jeton}.csv"),
+                   download="anomalies.csv"),
+            html.Span(" | "),
+            html.A("Exporter en Parquet", href=dash.get_relative_path(f"/export/nd/{jeton}.parquet"),
+                   download="anomalies.parquet"),
+        ], className="mb-2"),
+        _table('table-anomalies', df, nombre)
+    ])
+
+
+def _page(jeton, ids, page_current, page_size, sort_by, filter_query):
+    df = store.get(jeton)
+    if df is None:
+        raise PreventUpdate
+    with etape("enregistrements"):
+        return page_records(df, ids(df), page_current, page_size, sort_by, filter_query)
+
+
+def _pagination(table):
+    return ([Output(table, 'data'),
+             Output(table, 'page_count')],
+            [Input(table, 'page_current'),
+             Input(table, 'page_size'),
+             Input(table, 'sort_by'),
+             Input(table, 'filter_query')],
+            State('store-processed-data', 'data'))
+
+
+@callback(*_pagination('table-donnees'))
+def page_donnees(page_current, page_size, sort_by, filter_query, jeton):
+    return _page(jeton, lambda df: np.arange(len(df)), page_current, page_size, sort_by, filter_query)
+
+
+@callback(*_pagination('table-anomalies'))
+def page_anomalies(page_current, page_size, sort_by, filter_query, jeton):
+    return _page(jeton, lambda df: np.flatnonzero(df['anomaly'].to_numpy() == 1),
+                 page_current, page_size, sort_by, filter_query)
+
+def create_visualizations(df):
+    montant_col = [col for col in df.columns if 'montant' in col.lower()][0]
+    
+    # Points réduits (LTTB sur les normaux, anomalies conservées) et histogramme pré-agrégé
+    x = df.index.to_numpy() if pd.api.types.is_numeric_dtype(df.index) else np.arange(len(df))
+    y = pd.to_numeric(df[montant_col], errors='coerce').to_numpy(dtype=np.float64)
+    normaux, anormaux = reduire_nuage(x, y, df['anomaly'].to_numpy(),
+                                      df['anomaly_score'].to_numpy() if 'anomaly_score' in df.columns else None)
+    centres, largeurs, comptes = histogramme(y)
+    
+    return html.Div([
+        dbc.Row([
+            dbc.Col(dcc.Graph(
+                figure={
+                    'data': [{
+                        'x': x[normaux],
+                        'y': y[normaux],
+                        'type': 'scattergl',
+                        'mode': 'markers',
+                        'name': 'Normales',
+                        'marker': {'color': 'blue', 'size': 4}
+                    }, {
+                        'x': x[anormaux],
+                        'y': y[anormaux],
+                        'type': 'scattergl',
+                        'mode': 'markers',
+                        'name': 'Anomalies',
+                        'marker': {'color': 'red', 'size': 5}
+                    }],
+                    'layout': {
+                        'title': 'Montants des Transactions (Rouge = Anomalies)',
+                        'xaxis': {'title': 'Index'},
+                        'yaxis': {'title': 'Montant'}
+                    }
+                }
+            ), md=6),
+            dbc.Col(dcc.Graph(
+                figure={
+                    'data': [{
+                        'x': centres,
+                        'y': comptes,
+                        'width': largeurs,
+                        'type': 'bar',
+                        'name': 'Distribution'
+                    }],
+                    'layout': {
+                        'title': 'Distribution des Montants',
+                        'xaxis': {'title': 'Montant'},
+                        'yaxis': {'title': 'Fréquence'},
+                        'bargap': 0
+                    }
+                }
+            ), md=6)
+        ])
+    ])
+
+# Route d'export et callbacks, sur cette application ou sur le portail
+def enregistrer(app):
+    app.server.add_url_rule("/export/nd/<jeton>.<format>", "nd_export", export_anomalies)
+    for args, kwargs, fonction in _callbacks:
+        app.callback(*args, **kwargs)(fonction)
+
+
+# Création de l'application
+def create_app():
+    # Tables créées par display_tab : leurs callbacks ne sont pas validés au chargement
+    app = dash.Dash(__name__, external_stylesheets=[dbc.themes.FLATLY], suppress_callback_exceptions=True)
+    app.title = "Analyse Universelle de Transferts Bancaires"
+    app.layout = layout
+    instrumenter(app.server, "nd")  # Server-Timing et /metrics si APP_DASH_INSTRUMENTATION=1
+    enregistrer(app)
+    return app
+
+
+# Application par défaut, créée au premier accès à nd.app ou nd.server
+_application = Paresseux(create_app)
+
+
+def __getattr__(nom):
+    if nom == "app":
+        return _application()
+    if nom == "server":
+        return _application().server  # point d'entrée WSGI pour gunicorn
+    raise AttributeError(f"module {__name__!r} has no attribute {nom!r}")
+
+
+if __name__ == '__main__':
+    create_app().run(debug=True, port=8053)
\ No newline at end of file
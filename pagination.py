@@ -0,0 +1,164 @@
+# PAGINATION, TRI ET FILTRAGE CÔTÉ SERVEUR POUR LES DataTable
+# (page_action='custom', sort_action='custom', filter_action='custom')
+import math
+
+import numpy as np
+import pandas as pd
+
+# Opérateurs de la syntaxe filter_query de dash_table
+OPERATEURS = [['ge ', '>='],
+              ['le ', '<='],
+              ['lt ', '<'],
+              ['gt ', '>'],
+              ['ne ', '!='],
+              ['eq ', '='],
+              ['contains '],
+              ['datestartswith ']]
+
+
+def split_filter_part(filter_part):
+    for operator_type in OPERATEURS:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+
+                value_part = value_part.strip()
+                v0 = value_part[0] if value_part else ''
+                if v0 == value_part[-1:] and v0 in ("'", '"', '`'):
+                    value = value_part[1: -1].replace('\\' + v0, v0)
+                else:
+                    try:
+                        value = float(value_part)
+                    except ValueError:
+                        value = value_part
+
+                # Les opérateurs textuels sont normalisés sur leur première forme
+                return name, operator_type[0].strip(), value
+
+    return [None] * 3
+
+
+def _comparer(valeurs, operateur, valeur):
+    if operateur == 'ge':
+        return valeurs >= valeur
+    if operateur == 'le':
+        return valeurs <= valeur
+    if operateur == 'lt':
+        return valeurs < valeur
+    if operateur == 'gt':
+        return valeurs > valeur
+    if operateur == 'ne':
+        return valeurs != valeur
+    return valeurs == valeur
+
+
+def _texte(valeur):
+    # "2022" est lu comme 2022.0 par split_filter_part
+    return f"{valeur:g}" if isinstance(valeur, float) else str(valeur)
+
+
+def _plage_date(prefixe):
+    # "2023" -> année, "2023-03" -> mois, "2023-03-07" -> jour
+    debut = pd.Timestamp(prefixe)
+    if len(prefixe) <= 4:
+        return debut, debut + pd.DateOffset(years=1)
+    if len(prefixe) <= 7:
+        return debut, debut + pd.DateOffset(months=1)
+    return debut, debut + pd.Timedelta(days=1)
+
+
+def _masque(serie, ids, operateur, valeur):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Le prédicat est évalué sur les catégories (peu nombreuses) puis
+        # propagé aux lignes via les codes.
+        categories = serie.cat.categories.astype(str)
+        if operateur in ('contains', 'datestartswith'):
+            retenues = categories.str.contains(_texte(valeur), case=False, regex=False)
+        else:
+            retenues = _comparer(categories, operateur, _texte(valeur))
+        table = np.append(np.asarray(retenues, dtype=bool), False)  # code -1 -> exclu
+        return table[serie.cat.codes.to_numpy()[ids]]
+
+    valeurs = serie.to_numpy()[ids]
+    if np.issubdtype(valeurs.dtype, np.datetime64):
+        try:
+            if operateur in ('contains', 'datestartswith'):
+                debut, fin = _plage_date(_texte(valeur))
+                return (valeurs >= debut.to_datetime64()) & (valeurs < fin.to_datetime64())
+            return _comparer(valeurs, operateur, pd.Timestamp(_texte(valeur)).to_datetime64())
+        except ValueError:
+            return np.zeros(len(ids), dtype=bool)
+
+    if operateur in ('contains', 'datestartswith'):
+        # Insensible à la casse, comme sur les colonnes catégorielles
+        presents = ~pd.isna(valeurs)
+        return presents & pd.Series(valeurs).astype(str).str.contains(_texte(valeur), case=False,
+                                                                       regex=False).to_numpy()
+    if np.issubdtype(valeurs.dtype, np.number) and isinstance(valeur, str):
+        return np.zeros(len(ids), dtype=bool)
+    if np.issubdtype(valeurs.dtype, np.floating):
+        valeur = valeurs.dtype.type(valeur)  # 0.9727 comparé en float32 sur une colonne float32
+    return _comparer(valeurs, operateur, valeur)
+
+
+def filtrer_ids(frame, ids, filter_query):
+    if not filter_query:
+        return ids
+    for filter_part in filter_query.split(' && '):
+        col_name, operateur, valeur = split_filter_part(filter_part)
+        if col_name not in frame.columns:
+            continue
+        ids = ids[_masque(frame[col_name], ids, operateur, valeur)]
+    return ids
+
+
+def _cle_tri(serie, ids, descendant):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Rang de la catégorie dans l'ordre trié (l'ordre des catégories dépend
+        # des lots concaténés) ; valeurs manquantes (code -1) en tête
+        rangs = np.argsort(np.argsort(serie.cat.categories.to_numpy(), kind="stable"), kind="stable")
+        codes = serie.cat.codes.to_numpy()[ids]
+        cle = np.where(codes >= 0, rangs[codes], -1).astype(np.int64)
+    else:
+        cle = serie.to_numpy()[ids]
+        if np.issubdtype(cle.dtype, np.datetime64):
+            cle = cle.view(np.int64)
+        elif cle.dtype == bool:
+            cle = cle.astype(np.int8)
+        elif not np.issubdtype(cle.dtype, np.number):
+            # Texte (fichiers importés dans nd.py) : rang dans l'ordre trié, manquants en tête
+            manquants = pd.isna(cle)
+            rangs = np.full(len(cle), -1, dtype=np.int64)
+            rangs[~manquants] = np.unique(cle[~manquants].astype(str), return_inverse=True)[1]
+            cle = rangs
+    return -cle if descendant else cle
+
+
+def trier_ids(frame, ids, sort_by):
+    if not sort_by:
+        return ids
+    # np.lexsort trie sur la dernière clé en priorité
+    cles = [_cle_tri(frame[col['column_id']], ids, col['direction'] == 'desc')
+            for col in reversed(sort_by)]
+    return ids[np.lexsort(cles)]
+
+
+def page_records(frame, ids, page_current, page_size, sort_by=None, filter_query='', colonnes=None):
+    # Seule la page demandée est matérialisée et sérialisée, réduite aux
+    # colonnes affichées (colonnes=None : toutes, tables de nd.py)
+    ids = filtrer_ids(frame, ids, filter_query)
+    ids = trier_ids(frame, ids, sort_by)
+
+    page_count = max(1, math.ceil(len(ids) / page_size))
+    page_current = min(page_current or 0, page_count - 1)
+    debut = page_current * page_size
+
+    page = frame.iloc[ids[debut: debut + page_size]]
+    if colonnes is not None:
+        page = page[colonnes]
+    # Colonnes float32 : valeurs affichées telles que lues (0.9727, pas 0.97269999...)
+    # (assign : pas d'écriture dans la tranche iloc, SettingWithCopyWarning avant pandas 3)
+    page = page.assign(**{col: page[col].astype(str).astype(np.float64)
+                          for col in page.columns[page.dtypes == np.float32]})
+    return page.to_dict('records'), page_count
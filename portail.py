@@ -0,0 +1,87 @@
+# PORTAIL : LES QUATRE TABLEAUX DE BORD DANS UNE SEULE APPLICATION DASH
+# Une page par vue (dash.page_registry) sur un seul serveur Flask : transactions,
+# résumé du cache, index des anomalies (moteur_filtres) et KPI sont chargés une
+# fois par processus et partagés par les vues, au lieu d'une copie par serveur.
+#
+#   gunicorn -c gunicorn.conf.py portail:server
+#   APP_DASH_WORKERS=2 APP_DASH_THREADS=8 gunicorn -c gunicorn.conf.py portail:server
+import dash
+from dash import html
+import dash_bootstrap_components as dbc
+from flask import jsonify
+
+import app_dash
+import filtres
+import kpi
+import nd
+from donnees import PRECHARGEMENT, Paresseux
+from instrumentation import instrumenter
+
+# (vue, chemin, entrée du menu, titre de l'onglet, layout)
+VUES = [
+    (app_dash, "/", "Anomalies", "Détection d'anomalies - Transactions Bancaires", app_dash.serve_layout),
+    (filtres, "/filtres", "Filtres avancés", "Filtre avancée de détection d'anomalies", filtres.serve_layout),
+    (kpi, "/kpi", "Indicateurs", "Indicateurs Clés de Performance", kpi.serve_layout),
+    (nd, "/analyse", "Analyse de fichiers", "Analyse Universelle de Transferts Bancaires", nd.layout),
+]
+
+
+def _page(layout):
+    # Dash passe les paramètres de l'URL aux layouts des pages : les vues n'en ont pas
+    if callable(layout):
+        return lambda **parametres: layout()
+    return layout
+
+
+def cache_stats():
+    return jsonify([app_dash.memo.stats(), filtres.memo.stats()])
+
+
+def precharger():
+    # Données, index et KPI partagés, chargés une fois pour toutes les vues
+    for vue in (app_dash, filtres, kpi):
+        vue.precharger()
+
+
+def create_app(prechargement=PRECHARGEMENT):
+    # Les vues ne se chargent qu'au premier affichage : le layout de chaque page
+    # n'est pas évalué à la création (suppress_callback_exceptions)
+    app = dash.Dash(__name__, use_pages=True, pages_folder="", suppress_callback_exceptions=True,
+                    external_stylesheets=[dbc.themes.FLATLY])
+    app.title = "Transactions bancaires"
+    instrumenter(app.server, "portail")  # Server-Timing et /metrics si APP_DASH_INSTRUMENTATION=1
+    app.server.add_url_rule("/cache-stats", "cache_stats", cache_stats)
+
+    for ordre, (vue, chemin, nom, titre, layout) in enumerate(VUES):
+        dash.register_page(vue.__name__, path=chemin, name=nom, title=titre, order=ordre, layout=_page(layout))
+        if hasattr(vue, "enregistrer"):  # kpi n'a ni route ni callback
+            vue.enregistrer(app)
+
+    app.layout = html.Div([
+        dbc.NavbarSimple(
+            [dbc.NavLink(page["name"], href=page["relative_path"], active="exact")
+             for page in dash.page_registry.values()],
+            brand="Transactions bancaires", color="primary", dark=True, className="mb-3"
+        ),
+        dash.page_container
+    ])
+
+    if prechargement:
+        precharger()
+    return app
+
+
+# Application par défaut, créée au premier accès à portail.app ou portail.server
+_application = Paresseux(create_app)
+
+
+def __getattr__(nom):
+    if nom == "app":
+        return _application()
+    if nom == "server":
+        return _application().server  # point d'entrée WSGI pour gunicorn
+    raise AttributeError(f"module {__name__!r} has no attribute {nom!r}")
+
+
+if __name__ == '__main__':
+    create_app().run(debug=True)
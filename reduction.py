@@ -0,0 +1,61 @@
+# RÉDUCTION DES SÉRIES ENVOYÉES AU NAVIGATEUR
+# Nuage de points : LTTB (Largest-Triangle-Three-Buckets) sur les points normaux,
+# anomalies conservées ; histogrammes : comptes pré-calculés par classe.
+# La taille des figures ne dépend plus du nombre de lignes.
+import numpy as np
+
+BUDGET_POINTS = 2000
+BUDGET_ANOMALIES = 20_000
+
+
+def lttb(x, y, budget=BUDGET_POINTS):
+    # Indices des points retenus (x croissant) : dans chaque tranche, le point qui
+    # forme le plus grand triangle avec le point retenu précédent et la moyenne
+    # de la tranche suivante
+    n = len(x)
+    if budget >= n or budget < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    bornes = np.linspace(1, n - 1, budget - 1).astype(np.int64)
+    retenus = np.empty(budget, dtype=np.int64)
+    retenus[0], retenus[-1] = 0, n - 1
+
+    a = 0
+    for i in range(budget - 2):
+        debut, fin = bornes[i], bornes[i + 1]
+        suivant_fin = bornes[i + 2] if i + 2 < len(bornes) else n
+        moy_x = x[fin:suivant_fin].mean()
+        moy_y = y[fin:suivant_fin].mean()
+        aire = np.abs((x[a] - moy_x) * (y[debut:fin] - y[a]) - (x[a] - x[debut:fin]) * (moy_y - y[a]))
+        a = debut + int(np.argmax(aire))
+        retenus[i + 1] = a
+    return retenus
+
+
+def reduire_nuage(x, y, anomalies, scores=None, budget=BUDGET_POINTS, budget_anomalies=BUDGET_ANOMALIES):
+    # (indices normaux réduits, indices d'anomalies) ; au-delà du budget, seules
+    # les anomalies de plus fort score sont gardées
+    valides = np.isfinite(np.asarray(y, dtype=np.float64))
+    normaux = np.flatnonzero(valides & (anomalies == 0))
+    anormaux = np.flatnonzero(valides & (anomalies != 0))
+
+    ordre = np.argsort(x[normaux], kind="stable")
+    normaux = normaux[ordre]
+    normaux = normaux[lttb(x[normaux], y[normaux], budget)]
+
+    if len(anormaux) > budget_anomalies:
+        cle = scores[anormaux] if scores is not None else np.abs(y[anormaux])
+        anormaux = np.sort(anormaux[np.argpartition(cle, -budget_anomalies)[-budget_anomalies:]])
+    return normaux, anormaux
+
+
+def histogramme(valeurs, bins=50):
+    # (centres, largeurs, comptes) des classes, sans envoyer les valeurs brutes
+    valeurs = np.asarray(valeurs, dtype=np.float64)
+    valeurs = valeurs[np.isfinite(valeurs)]
+    if len(valeurs) == 0:
+        return np.empty(0), np.empty(0), np.empty(0, dtype=np.int64)
+    comptes, bords = np.histogram(valeurs, bins=bins)
+    return (bords[:-1] + bords[1:]) / 2, np.diff(bords), comptes
@@ -0,0 +1,118 @@
+# STOCKAGE DES JEUX DE DONNÉES DE SESSION CÔTÉ SERVEUR
+# Seul un jeton opaque transite par dcc.Store ; les DataFrames restent sur le
+# serveur (LRU en mémoire + copie Parquet sur disque, expirées après un TTL).
+import os
+import pickle
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from donnees import CACHE_DIR
+
+JETON_VALIDE = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+
+class DatasetStore:
+    def __init__(self, capacite=8, ttl=3600, repertoire=os.path.join(CACHE_DIR, "sessions")):
+        self.capacite = capacite
+        self.ttl = ttl
+        self.repertoire = repertoire
+        self._memoire = OrderedDict()  # jeton -> (DataFrame, dernier accès)
+        self._verrou = threading.Lock()
+
+    def _chemin(self, jeton, extension):
+        return os.path.join(self.repertoire, f"{jeton}.{extension}")
+
+    def _ecrire_disque(self, jeton, df):
+        # Écriture systématique : les autres workers gunicorn retrouvent le jeu de
+        # données même s'il n'est pas dans leur LRU.
+        os.makedirs(self.repertoire, exist_ok=True)
+        tmp = self._chemin(jeton, f"{os.getpid()}.tmp")
+        try:
+            df.to_parquet(tmp, engine="pyarrow")
+            os.replace(tmp, self._chemin(jeton, "parquet"))
+        except (ValueError, TypeError, ImportError):
+            # Colonnes hétérogènes non représentables en Parquet
+            with open(tmp, "wb") as f:
+                pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._chemin(jeton, "pkl"))
+
+    def _lire_disque(self, jeton):
+        for extension in ("parquet", "pkl"):
+            chemin = self._chemin(jeton, extension)
+            try:
+                if time.time() - os.path.getmtime(chemin) > self.ttl:
+                    os.remove(chemin)
+                    return None
+                os.utime(chemin)
+                if extension == "parquet":
+                    return pd.read_parquet(chemin, engine="pyarrow")
+                with open(chemin, "rb") as f:
+                    return pickle.load(f)
+            except FileNotFoundError:
+                continue
+        return None
+
+    def _toucher(self, jeton):
+        for extension in ("parquet", "pkl"):
+            try:
+                os.utime(self._chemin(jeton, extension))
+            except FileNotFoundError:
+                pass
+
+    def _inserer(self, jeton, df):
+        self._memoire[jeton] = (df, time.monotonic())
+        self._memoire.move_to_end(jeton)
+        while len(self._memoire) > self.capacite:
+            self._memoire.popitem(last=False)
+
+    def put(self, df):
+        self.purge()
+        jeton = secrets.token_urlsafe(24)
+        self._ecrire_disque(jeton, df)
+        with self._verrou:
+            self._inserer(jeton, df)
+        return jeton
+
+    def get(self, jeton):
+        if not jeton or not JETON_VALIDE.match(jeton):
+            return None
+
+        with self._verrou:
+            entree = self._memoire.get(jeton)
+            if entree is not None and time.monotonic() - entree[1] <= self.ttl:
+                self._inserer(jeton, entree[0])
+            else:
+                self._memoire.pop(jeton, None)
+                entree = None
+
+        if entree is not None:
+            self._toucher(jeton)
+            return entree[0]
+
+        df = self._lire_disque(jeton)
+        if df is not None:
+            with self._verrou:
+                self._inserer(jeton, df)
+        return df
+
+    def purge(self):
+        # Supprime les entrées expirées (mémoire et disque)
+        maintenant = time.monotonic()
+        with self._verrou:
+            for jeton in [j for j, (_, acces) in self._memoire.items() if maintenant - acces > self.ttl]:
+                del self._memoire[jeton]
+
+        if not os.path.isdir(self.repertoire):
+            return
+        for nom in os.listdir(self.repertoire):
+            chemin = os.path.join(self.repertoire, nom)
+            try:
+                if time.time() - os.path.getmtime(chemin) > self.ttl:
+                    os.remove(chemin)
+            except FileNotFoundError:
+                pass
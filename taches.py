@@ -0,0 +1,50 @@
+# EXÉCUTION DES ANALYSES EN TÂCHE DE FOND
+# Les callbacks `background=True` tournent dans des processus séparés gérés par
+# un DiskcacheManager ; le nombre d'analyses simultanées est borné par des
+# créneaux partagés entre tous les workers via le même cache disque.
+import os
+import signal
+import sys
+import time
+from contextlib import contextmanager
+
+import diskcache
+from dash import DiskcacheManager
+
+from donnees import CACHE_DIR
+
+MAX_ANALYSES = int(os.environ.get("APP_DASH_MAX_ANALYSES", max(1, (os.cpu_count() or 2) // 2)))
+DUREE_MAX_ANALYSE = 3600  # un créneau abandonné (processus tué) se libère après ce délai
+
+cache_taches = diskcache.Cache(os.path.join(CACHE_DIR, "taches"))
+background_manager = DiskcacheManager(cache_taches)
+
+
+def _terminer_proprement(signum, frame):
+    # L'annulation termine le processus par SIGTERM : on lève SystemExit pour
+    # que les blocs finally (libération du créneau) s'exécutent.
+    sys.exit(0)
+
+
+@contextmanager
+def creneau_analyse(set_progress=None, attente=0.5):
+    try:
+        signal.signal(signal.SIGTERM, _terminer_proprement)
+    except ValueError:
+        pass  # hors du thread principal (exécution synchrone)
+
+    cle = None
+    while cle is None:
+        for i in range(MAX_ANALYSES):
+            if cache_taches.add(f"creneau-analyse-{i}", os.getpid(), expire=DUREE_MAX_ANALYSE):
+                cle = f"creneau-analyse-{i}"
+                break
+        else:
+            if set_progress is not None:
+                set_progress((0, "En attente d'un créneau d'analyse..."))
+            time.sleep(attente)
+
+    try:
+        yield
+    finally:
+        cache_taches.delete(cle)
@@ -0,0 +1,81 @@
+# Les modules de l'application sont à la racine du dépôt (pas de paquet installé)
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Fichier source des vues (chemin par défaut de donnees), fixé avant tout import
+# de l'application : jamais les données réelles de l'environnement
+_DOSSIER = tempfile.mkdtemp(prefix="app_dash_tests_")
+atexit.register(shutil.rmtree, _DOSSIER, ignore_errors=True)
+os.environ["APP_DASH_CSV"] = os.path.join(_DOSSIER, "transactions_analysees_anomalies.csv")
+os.environ["APP_DASH_CACHE"] = os.path.join(_DOSSIER, "cache")
+os.environ["APP_DASH_MEMO_DISQUE"] = "0"
+os.environ["APP_DASH_PRECHARGEMENT"] = "0"
+
+from benchmarks.synthetique import generer_transactions  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def transactions():
+    # Petit jeu au schéma réel, avec des montants, dates et pays manquants
+    df = generer_transactions(5_000, nb_clients=300, taux_anomalies=0.3, seed=7)
+    rng = np.random.default_rng(7)
+    for col in ("Montant", "Date", "Pays_Origine"):
+        df.loc[rng.choice(len(df), 50, replace=False), col] = None
+    return df
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    # Cache Parquet isolé ; donnees garde les DataFrames chargés par chemin
+    import donnees
+
+    monkeypatch.setattr(donnees, "CACHE_DIR", str(tmp_path / "cache"))
+    for nom in ("_charges", "_lots_en_attente", "_abonnes", "_resumes"):
+        monkeypatch.setattr(donnees, nom, {})
+    return tmp_path
+
+
+def ecrire_csv(df, chemin):
+    df.to_csv(chemin, index=False, date_format="%Y-%m-%d %H:%M:%S")
+    return str(chemin)
+
+
+@pytest.fixture
+def csv_transactions(cache, transactions):
+    return ecrire_csv(transactions.dropna(subset=["Date"]).head(2_000), cache / "transactions.csv")
+
+
+
+@pytest.fixture
+def source(cache, transactions):
+    # Fichier par défaut des tableaux de bord (app_dash, filtres, kpi)
+    import donnees
+
+    return ecrire_csv(transactions.dropna(subset=["Date"]).head(3_000), donnees.CSV_PATH)
+
+
+@pytest.fixture
+def autre_worker():
+    # Exécute fonction() avec l'état de donnees d'un autre processus : ni
+    # DataFrame chargé, ni lot en attente, ni abonné
+    import donnees
+
+    def executer(fonction):
+        noms = ("_charges", "_lots_en_attente", "_abonnes", "_resumes")
+        etat = {nom: getattr(donnees, nom) for nom in noms}
+        for nom in noms:
+            setattr(donnees, nom, {})
+        try:
+            return fonction()
+        finally:
+            for nom, valeur in etat.items():
+                setattr(donnees, nom, valeur)
+    return executer
@@ -0,0 +1,49 @@
+import numpy as np
+
+import app_dash
+import donnees
+
+
+def _total_serveur(score_max, pays_origine=None, pays_destination=None):
+    return int(np.sum(app_dash.update_dashboard(pays_origine, pays_destination, score_max).data[0].y))
+
+
+def _total_table(score_max, pays_origine=None, pays_destination=None):
+    # Lignes paginées par update_table
+    return len(app_dash.selection_anomalies(pays_origine, pays_destination, score_max))
+
+
+def test_lot_d_un_autre_worker(source, transactions, autre_worker):
+    score_max = app_dash.bornes_score()[1]
+    avant = _total_table(score_max)
+    assert _total_serveur(score_max) == avant
+
+    lot = transactions.dropna().iloc[:6].copy()
+    lot["anomaly"] = 1
+    lot["anomaly_score"] = np.float32(0.75)
+    autre_worker(lambda: donnees.append_transactions(lot, source))
+
+    assert _total_table(score_max) == _total_serveur(score_max) == avant + 6
+    records, page_count = app_dash.update_table(None, None, score_max, 0, 10)
+    assert page_count == -(-(avant + 6) // 10)
+    assert all(list(r) == app_dash.COLONNES_EXPORT for r in records)
+
+
+def _total_client(fin, k):
+    return sum(c for t, c in zip(fin["tranche"], fin["comptes"]) if t <= k)
+
+
+def test_histogramme_client_a_chaque_position(source):
+    # Le navigateur somme les comptes des tranches <= k (HISTOGRAMME_JS) : même
+    # total que le serveur et la table à chaque position du curseur
+    score_min, score_max = app_dash.bornes_score()
+    positions = app_dash.positions_slider(score_min, score_max)
+    for pays_origine in (None, "Gabon"):
+        fin = app_dash.histogramme_fin(pays_origine, None)
+        # update_dashboard : comptes du cube (la figure n'est pas reconstruite à chaque position)
+        cube = app_dash.contexte().cube
+        serveur = [cube.counts(pays_origine=[pays_origine] if pays_origine else None,
+                               score=(None, seuil)).sum() for seuil in positions]
+        ecarts = [float(seuil) for k, seuil in enumerate(positions)
+                  if not _total_client(fin, k) == serveur[k] == _total_table(seuil, pays_origine)]
+        assert ecarts == []
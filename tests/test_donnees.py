@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import donnees
+from conftest import ecrire_csv
+from pagination import trier_ids
+
+
+def _lot(transactions, noms, debut="2025-02-01"):
+    lot = transactions.dropna().iloc[:len(noms)].copy()
+    lot["Nom_Emetteur"] = noms
+    lot["Date"] = pd.date_range(debut, periods=len(noms), freq="D")  # toutes à minuit
+    return lot
+
+
+def test_cache_relu_identique(csv_transactions):
+    df = donnees.load_transactions(csv_transactions)
+    assert donnees.cache_valide(csv_transactions)
+    donnees._charges.clear()
+    relu = donnees.load_transactions(csv_transactions)
+    pd.testing.assert_frame_equal(relu, df)
+    assert isinstance(relu["Nom_Emetteur"].dtype, pd.CategoricalDtype)
+    assert relu["anomaly_score"].dtype == np.float32
+
+
+def test_ajout_puis_relecture(csv_transactions, transactions):
+    df = donnees.load_transactions(csv_transactions)
+    vus = []
+    donnees.abonner(vus.append, csv_transactions)
+
+    donnees.append_transactions(_lot(transactions, ["AAA Nouveau", "Zoé Ondo 1"]), csv_transactions)
+    donnees.append_transactions(_lot(transactions, ["Bernard Ondo 2"], debut="2025-03-01"), csv_transactions)
+    assert [len(lot) for lot in vus] == [2, 1]
+
+    # Même processus : lots concaténés à la lecture suivante ; autre processus : cache + lots
+    en_memoire = donnees.load_transactions(csv_transactions)
+    donnees._charges.clear()
+    relu = donnees.load_transactions(csv_transactions)
+    assert len(relu) == len(en_memoire) == len(df) + 3
+    assert relu["Date"].dtype.kind == "M"  # lots sans heure : dates toujours lues comme dates
+    assert len(os.listdir(donnees._lots_path(csv_transactions))) == 2
+
+    for frame in (en_memoire, relu):
+        assert list(frame["Nom_Emetteur"].cat.categories) == sorted(frame["Nom_Emetteur"].cat.categories)
+        ordre = trier_ids(frame, np.arange(len(frame)), [{"column_id": "Nom_Emetteur", "direction": "asc"}])
+        assert frame["Nom_Emetteur"].iloc[ordre[0]] == "AAA Nouveau"
+
+
+def test_resume_mis_a_jour(csv_transactions, transactions):
+    avant = donnees.resume(csv_transactions)
+    lot = _lot(transactions, ["AAA Nouveau"] * 3)
+    lot["Pays_Origine"] = "Atlantide"
+    lot["Montant"] = 1e12
+    lot["anomaly"] = 1
+    donnees.append_transactions(lot, csv_transactions)
+
+    apres = donnees.resume(csv_transactions)
+    assert apres["lignes"] == avant["lignes"] + 3
+    assert apres["anomalies"] == avant["anomalies"] + 3
+    assert "Atlantide" in apres["Pays_Origine"]
+    assert apres["Montant"] == [avant["Montant"][0], 1e12]
+    assert apres["Date"][1] == "2025-02-03T00:00:00"
+
+    # Le résumé des métadonnées est celui d'une reconstruction complète
+    donnees._resumes.clear()
+    donnees.construire_cache(csv_transactions)
+    assert donnees.resume(csv_transactions) == apres
+
+
+def test_lots_d_un_autre_worker(csv_transactions, transactions, autre_worker):
+    df = donnees.load_transactions(csv_transactions)
+    appels = []
+    suivi = donnees.AJour(lambda df: appels.append(("construire", len(df))) or len(df),
+                          lambda n, df, debut: appels.append(("etendre", debut, len(df))) or len(df),
+                          csv_transactions)
+    assert suivi() == len(df)
+
+    lot = _lot(transactions, ["AAA Nouveau", "Zoé Ondo 1"])
+    autre_worker(lambda: donnees.append_transactions(lot, csv_transactions))
+    assert suivi() == suivi() == len(df) + 2
+    assert appels == [("construire", len(df)), ("etendre", len(df), len(df) + 2)]
+
+    # Seul le lot est relu (dans .lots/), à la suite des lignes déjà chargées
+    etendu = donnees.load_transactions(csv_transactions)
+    assert etendu["Nom_Emetteur"].iloc[-2:].tolist() == ["AAA Nouveau", "Zoé Ondo 1"]
+    pd.testing.assert_frame_equal(etendu.iloc[:len(df)], df, check_categorical=False)
+
+
+def test_source_reecrite(csv_transactions, transactions):
+    suivi = donnees.AJour(len, lambda n, df, debut: pytest.fail("source réécrite : pas d'extension"),
+                          csv_transactions)
+    assert suivi() == 2_000
+    ecrire_csv(transactions.dropna(subset=["Date"]).head(2_500), csv_transactions)
+    assert suivi() == 2_500
@@ -0,0 +1,32 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from export import flux_csv, flux_parquet
+
+COLONNES = ["Date", "Nom_Emetteur", "Montant", "Pays_Origine", "anomaly_score"]
+
+
+@pytest.fixture
+def selection(transactions):
+    return np.flatnonzero(transactions["anomaly"] == 1)
+
+
+def test_flux_csv(transactions, selection):
+    texte = "".join(flux_csv(transactions, selection, COLONNES, taille=97))
+    assert texte == transactions.iloc[selection][COLONNES].to_csv(index=False)
+
+
+def test_flux_parquet(transactions, selection):
+    morceaux = list(flux_parquet(transactions, selection, COLONNES, taille=97))
+    assert len(morceaux) > 2  # un groupe de lignes par morceau, envoyé au fil de l'eau
+    relu = pd.read_parquet(io.BytesIO(b"".join(morceaux)))
+    pd.testing.assert_frame_equal(relu, transactions.iloc[selection][COLONNES].reset_index(drop=True))
+
+
+def test_flux_parquet_vide(transactions):
+    relu = pd.read_parquet(io.BytesIO(b"".join(flux_parquet(transactions, np.arange(0), COLONNES))))
+    assert list(relu.columns) == COLONNES
+    assert len(relu) == 0
@@ -0,0 +1,74 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask
+
+import donnees
+import filtres
+
+TOUT = dict(pays_origine=None, pays_destination=None, montant_range=None, score_range=None,
+            nom_recherche=None, nom_mode="contains", date_start=None, date_end=None)
+
+
+def _comptes(**filtres_vue):
+    return np.asarray(filtres.update_dashboard(*{**TOUT, **filtres_vue}.values()).data[0].y)
+
+
+def _table(**filtres_vue):
+    filtres_vue = {**TOUT, **filtres_vue}
+    return filtres.update_table(*filtres_vue.values(), 0, 10_000, [], "")
+
+
+def _export(**parametres):
+    with Flask(__name__).test_request_context("/", query_string=parametres):
+        reponse = filtres.export_anomalies("parquet")
+        return pd.read_parquet(io.BytesIO(reponse.get_data()))
+
+
+def test_lot_d_un_autre_worker(source, transactions, autre_worker):
+    records, _ = _table()
+    avant = len(records)
+    assert list(records[0]) == filtres.COLONNES_TABLE
+    comptes_avant = _comptes()
+    kpis_avant = filtres_kpis()
+
+    lot = transactions.dropna().iloc[:4].copy()
+    lot["Nom_Emetteur"] = "AAA Nouveau"
+    lot["anomaly"] = 1
+    autre_worker(lambda: donnees.append_transactions(lot, source))
+
+    # Table, recherche par nom, histogramme et export voient le lot
+    records, _ = _table()
+    assert len(records) == avant + 4
+    assert [r for r in records if r["Nom_Emetteur"] == "AAA Nouveau"] != []
+    assert len(_table(nom_recherche="aaa nouv")[0]) == 4
+    assert _comptes().sum() == comptes_avant.sum() + 4
+    assert _comptes(nom_recherche="aaa nouv").sum() == 4
+    assert (_export()["Nom_Emetteur"] == "AAA Nouveau").sum() == 4
+    assert filtres_kpis()["n"] == kpis_avant["n"] + 4
+
+
+@pytest.mark.parametrize("meme_worker", [True, False])
+def test_histogramme_avec_ou_sans_nom(source, transactions, autre_worker, meme_worker):
+    _comptes()  # cube construit avant l'ajout : le lot passe par cube.ajouter
+    lot = transactions.dropna().iloc[:50].copy()
+    lot["anomaly"] = 1
+    if meme_worker:
+        donnees.append_transactions(lot, source)
+    else:
+        autre_worker(lambda: donnees.append_transactions(lot, source))
+
+    # " " est contenu dans tous les noms : mêmes lignes avec ou sans recherche
+    for filtres_vue in ({}, {"score_range": [0.6, 0.9]}, {"pays_origine": ["Gabon", "Mali"]},
+                        {"montant_range": [10_000, 1_000_000], "date_start": "2022-01-01",
+                         "date_end": "2023-12-31"}):
+        np.testing.assert_array_equal(_comptes(**filtres_vue), _comptes(nom_recherche=" ", **filtres_vue))
+        assert _comptes(**filtres_vue).sum() == len(_table(**filtres_vue)[0])
+
+
+def filtres_kpis():
+    from indicateurs import kpis_transactions
+
+    return kpis_transactions()
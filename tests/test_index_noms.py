@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from index_noms import NameIndex, trigrammes
+
+
+@pytest.fixture(scope="module")
+def index(transactions):
+    return NameIndex(transactions)
+
+
+def _jaccard(a, b):
+    a, b = trigrammes(a), trigrammes(b)
+    return len(a & b) / len(a | b) if a | b else 0.0
+
+
+@pytest.mark.parametrize("requete", ["marie ngema", "Jean Mbouma 12", "aicha ondo", "xyz"])
+def test_fuzzy_comme_jaccard(index, requete):
+    # Termes candidats (trigrammes communs) comparés au calcul exhaustif du vocabulaire
+    attendu = [t for t, nom in enumerate(index.vocabulaire) if _jaccard(requete.lower(), nom) >= index.seuil_fuzzy]
+    np.testing.assert_array_equal(index.termes(requete, "fuzzy"), attendu)
+
+
+def test_fuzzy_tolere_les_fautes(index):
+    nom = index.vocabulaire[len(index.vocabulaire) // 2]
+    faute = nom[:-2] + nom[-1] + nom[-2]  # deux lettres inversées
+    assert np.searchsorted(index.vocabulaire, nom) in index.termes(faute, "fuzzy")
+
+
+@pytest.mark.parametrize("mode", ["contains", "prefix", "fuzzy"])
+def test_requete_courte(index, mode):
+    # Moins de trois caractères : pas de trigramme, recherche par sous-chaîne (ou préfixe)
+    termes = index.termes("Ng", mode)
+    test = str.startswith if mode == "prefix" else str.__contains__
+    np.testing.assert_array_equal(termes, [t for t, nom in enumerate(index.vocabulaire) if test(nom, "ng")])
+
+
+def test_lignes_et_masque(transactions, index):
+    termes = index.termes("ondo", "contains")
+    noms = [transactions[col].astype(str).str.lower() for col in ("Nom_Emetteur", "Nom_Destinataire")]
+    attendu = np.flatnonzero(noms[0].str.contains("ondo") | noms[1].str.contains("ondo"))
+    np.testing.assert_array_equal(index.lignes(termes), attendu)
+    assert index.taille(termes) >= len(attendu)  # une ligne compte pour ses deux noms
+
+    ids = np.arange(0, len(transactions), 3)
+    np.testing.assert_array_equal(np.flatnonzero(index.masque(termes, ids)), np.flatnonzero(np.isin(ids, attendu)))
+
+
+def test_noms_manquants():
+    df = pd.DataFrame({"Nom_Emetteur": ["Awa Diop", None, "Awa Dioop"], "Nom_Destinataire": [None, None, "Ali"]})
+    index = NameIndex(df)
+    assert list(index.lignes(index.termes("awa diop", "fuzzy"))) == [0, 2]
+    assert not index.masque(index.termes("a", "contains"), np.arange(3))[1]
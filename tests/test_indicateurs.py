@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import kpi
+from indicateurs import SEUIL_GROS_TRANSFERT, RunningAggregates, calculer_kpis
+
+
+@pytest.fixture
+def avec_statut(transactions):
+    df = transactions.copy()
+    df["Statut"] = pd.Categorical(np.where(np.arange(len(df)) % 4 == 0, "Échouée", "Réussie"))
+    return df
+
+
+def test_kpis_comme_pandas(avec_statut):
+    df = avec_statut
+    k = calculer_kpis(df)
+    assert k["n"] == len(df)
+    assert k["montant_total"] == pytest.approx(df["Montant"].sum())
+    assert k["montant_moyen"] == pytest.approx(df["Montant"].mean())
+    assert k["reussies"] == (df["Statut"] == "Réussie").sum()
+    assert k["colonnes_agences"] == ("Pays_Origine", "Pays_Destination")
+
+    attendu = df.groupby("Pays_Origine", observed=True)["Montant"].sum()
+    assert k["emis_par_agence"].to_dict() == pytest.approx(attendu[attendu != 0].to_dict())
+    recues = df["Pays_Destination"].value_counts()
+    assert k["recues_par_agence"].to_dict() == recues[recues != 0].to_dict()
+
+    gros = df[df["Montant"] > SEUIL_GROS_TRANSFERT]
+    assert k["gros_nombre"] == len(gros)
+    par_annee = gros.dropna(subset=["Date"]).groupby(gros["Date"].dt.year)["Montant"].sum()
+    assert k["gros_par_annee"].to_dict() == pytest.approx(par_annee[par_annee != 0].to_dict())
+
+
+def test_lots_cumules_comme_un_seul_calcul(avec_statut):
+    # Les catégories diffèrent d'un lot à l'autre
+    agregats = RunningAggregates()
+    for debut in range(0, len(avec_statut), 1_300):
+        lot = avec_statut.iloc[debut:debut + 1_300].copy()
+        for col in ("Pays_Origine", "Pays_Destination"):
+            lot[col] = lot[col].cat.remove_unused_categories()
+        agregats.ajouter(lot)
+    cumule, complet = agregats.kpis(), calculer_kpis(avec_statut)
+    for cle, valeur in complet.items():
+        if isinstance(valeur, pd.Series):
+            assert cumule[cle].to_dict() == pytest.approx(valeur.to_dict()), cle
+        else:
+            assert cumule[cle] == pytest.approx(valeur), cle
+
+
+def _cartes(valeurs):
+    return [k for kpis in kpi.dashboard_data.values() for k, _ in kpis if k in valeurs]
+
+
+def test_nombre_total_de_transactions(avec_statut):
+    valeurs = kpi.valeurs_kpis(calculer_kpis(avec_statut))
+    assert valeurs["Nombre total de transactions"][0] == f"{len(avec_statut):,}"
+    assert valeurs["Taux de réussite"][0] == "75.0%"
+    assert len(_cartes(valeurs)) == sum(len(kpis) for kpis in kpi.dashboard_data.values())
+
+
+def test_sans_statut(transactions):
+    # Pas de colonne Statut : les cartes de réussite ne sont pas affichées
+    valeurs = kpi.valeurs_kpis(calculer_kpis(transactions))
+    assert "Taux de réussite" not in valeurs and "Transactions Réussies" not in valeurs
+    kpi.generate_dashboard(kpi.dashboard_data["Vue Générale des Transactions"], valeurs)
+
+
+def test_sans_agences_ni_pays(transactions):
+    k = calculer_kpis(transactions.drop(columns=["Pays_Origine", "Pays_Destination"]))
+    assert k["colonnes_agences"] is None and k["emis_par_agence"].empty
+    assert k["n"] == len(transactions)
+    valeurs = kpi.valeurs_kpis(k)
+    assert valeurs["Montant Émis"] == (kpi.montant(k["montant_total"]), None)
+    for kpis in kpi.dashboard_data.values():
+        kpi.generate_dashboard(kpis, valeurs)
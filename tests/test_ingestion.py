@@ -0,0 +1,93 @@
+import base64
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ingestion
+
+from conftest import ecrire_csv
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion, "REPERTOIRE_UPLOADS", str(tmp_path / "uploads"))
+    return tmp_path
+
+
+def _contenu(octets, type_mime="text/csv"):
+    # Valeur de dcc.Upload.contents
+    return f"data:{type_mime};base64," + base64.b64encode(octets).decode()
+
+
+def _televerser(chemin, filename):
+    with open(chemin, "rb") as f:
+        return ingestion.enregistrer_upload(_contenu(f.read()), filename)
+
+
+def test_decodage_par_blocs(uploads, monkeypatch):
+    monkeypatch.setattr(ingestion, "TAILLE_BLOC_BASE64", 16)
+    octets = os.urandom(1_001)
+    fichier = ingestion.enregistrer_upload(_contenu(octets), "Relevé Mars.CSV")
+    assert fichier.endswith(".csv")
+    with open(ingestion.chemin_upload(fichier), "rb") as f:
+        assert f.read() == octets
+
+
+@pytest.mark.parametrize("fichier", ["", "../secret", "a/b.csv", "x.csv/.."])
+def test_identifiant_invalide(fichier):
+    with pytest.raises(ValueError):
+        ingestion.chemin_upload(fichier)
+
+
+@pytest.mark.parametrize("sep", [",", ";", "\t"])
+def test_apercu_puis_ingestion_csv(uploads, transactions, monkeypatch, sep):
+    monkeypatch.setattr(ingestion, "TAILLE_LOT", 64 * 1024)  # plusieurs lots pyarrow
+    chemin = uploads / "source.csv"
+    transactions.to_csv(chemin, index=False, sep=sep, date_format="%Y-%m-%d %H:%M:%S")
+    fichier = _televerser(chemin, "source.csv")
+
+    colonnes, echantillon, taille = ingestion.apercu(fichier, "source.csv", nrows=20)
+    assert colonnes == list(transactions.columns)
+    assert len(echantillon) == 20 and taille == os.path.getsize(chemin)
+
+    avancement = []
+    df = ingestion.ingerer(fichier, "source.csv", lambda a, lignes: avancement.append((a, lignes)))
+    assert len(df) == len(transactions)
+    np.testing.assert_allclose(df["Montant"], transactions["Montant"])
+    assert len(avancement) > 2 and avancement[-1] == (1.0, len(transactions))
+    assert all(a <= b for (a, _), (b, _) in zip(avancement, avancement[1:]))
+    assert isinstance(df["Pays_Origine"].dtype, pd.CategoricalDtype)
+    assert not os.path.exists(ingestion.chemin_upload(fichier))  # fichier temporaire supprimé
+
+
+def test_ingestion_excel(uploads, transactions, monkeypatch):
+    monkeypatch.setattr(ingestion, "LIGNES_LOT_EXCEL", 300)
+    source = transactions.head(1_000).astype({"Date": str})
+    source.to_excel(uploads / "source.xlsx", index=False)
+    fichier = _televerser(uploads / "source.xlsx", "source.xlsx")
+
+    colonnes, echantillon, _ = ingestion.apercu(fichier, "source.xlsx", nrows=5)
+    assert colonnes == list(source.columns) and len(echantillon) == 5
+
+    avancement = []
+    df = ingestion.ingerer(fichier, "source.xlsx", lambda a, lignes: avancement.append(lignes))
+    assert avancement == [300, 600, 900, 1_000]
+    np.testing.assert_allclose(df["Montant"], source["Montant"])
+
+
+def test_lire_octets_comme_fichier(uploads, transactions):
+    chemin = ecrire_csv(transactions.head(500), uploads / "lot.csv")
+    with open(chemin, "rb") as f:
+        df = ingestion.lire_octets(f.read(), "lot.csv")
+    assert len(df) == 500 and isinstance(df["Pays_Origine"].dtype, pd.CategoricalDtype)
+
+
+def test_compacter():
+    df = pd.DataFrame({"pays": ["Gabon", "Mali"] * 50, "id": [f"T{i}" for i in range(100)],
+                       "n": np.arange(100, dtype=np.int64), "ok": [True, False] * 50})
+    df = ingestion.compacter(df)
+    assert isinstance(df["pays"].dtype, pd.CategoricalDtype)
+    assert not isinstance(df["id"].dtype, pd.CategoricalDtype)  # valeurs toutes distinctes
+    assert df["n"].dtype == np.int8 and df["ok"].dtype == bool
@@ -0,0 +1,109 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+from flask import Flask, Response, g
+
+import instrumentation
+from export import reponse_export
+
+
+@pytest.fixture
+def serveur(monkeypatch):
+    monkeypatch.setattr(instrumentation, "ACTIVE", True)
+    monkeypatch.setattr(instrumentation, "_requetes", instrumentation.defaultdict(instrumentation._requetes.default_factory))
+    monkeypatch.setattr(instrumentation, "_etapes", instrumentation.defaultdict(lambda: [0, 0.0]))
+    server = Flask(__name__)
+
+    @server.route("/calcul")
+    def calcul():
+        with instrumentation.etape("filtrage"):
+            time.sleep(0.01)
+        return "x" * 100
+
+    @server.route("/flux")
+    def flux():
+        def morceaux():
+            for _ in range(3):
+                time.sleep(0.02)
+                yield "é" * 10
+        return Response(morceaux(), mimetype="text/plain")
+
+    instrumentation.instrumenter(server, "test")
+    return server
+
+
+def _stats(chemin):
+    return instrumentation._requetes[("test", chemin)]
+
+
+def test_server_timing_et_metriques(serveur):
+    reponse = serveur.test_client().get("/calcul")
+    entrees = reponse.headers["Server-Timing"].split(", ")
+    assert entrees[0].startswith("filtrage;dur=") and entrees[-1].startswith("total;dur=")
+    assert float(entrees[0].split("=")[1]) >= 10
+    assert _stats("/calcul")["octets"] == 100
+
+    metriques = serveur.test_client().get("/metrics").get_data(as_text=True)
+    assert 'app_dash_requetes_duree_secondes_count{app="test",callback="/calcul"} 1' in metriques
+    assert 'app_dash_etapes_duree_secondes_count{app="test",callback="/calcul",etape="filtrage"} 1' in metriques
+
+
+def test_flux_mesure_jusqu_a_la_fin_de_l_envoi(serveur):
+    reponse = serveur.test_client().get("/flux", buffered=False)
+    assert _stats("/flux")["nombre"] == 0  # en-têtes envoyés, corps pas encore lu
+    assert reponse.get_data(as_text=True) == "é" * 30
+    reponse.close()
+    stats = _stats("/flux")
+    assert stats["nombre"] == 1
+    assert stats["octets"] == len(("é" * 30).encode())
+    assert stats["duree"] >= 0.06
+
+
+def test_export_en_flux(serveur, transactions):
+    @serveur.route("/export")
+    def export():
+        return reponse_export(transactions, np.arange(len(transactions)), "csv", "anomalies", ["Date", "Montant"])
+
+    reponse = serveur.test_client().get("/export", buffered=False)
+    assert _stats("/export")["nombre"] == 0  # pas mis en mémoire par after_request
+    corps = reponse.get_data()
+    reponse.close()
+    assert _stats("/export")["octets"] == len(corps) > 0
+
+
+def test_cprofile_une_requete_a_la_fois(monkeypatch):
+    # Deux requêtes concurrentes : seule la première est profilée
+    monkeypatch.setattr(instrumentation, "PROFIL", True)
+    server = Flask(__name__)
+    concurrente = []
+
+    def requete():
+        with server.test_request_context("/b"):
+            instrumentation._demarrer()
+            concurrente.append(g.profileur)
+            instrumentation._arreter_profileur()
+
+    with server.test_request_context("/a"):
+        instrumentation._demarrer()
+        premier = g.profileur
+        fil = threading.Thread(target=requete)
+        fil.start()
+        fil.join()
+        assert instrumentation._arreter_profileur() is premier is not None
+    assert concurrente == [None]
+    assert not instrumentation._verrou_cprofile.locked()
+
+
+def test_profileur_libere_si_exception(monkeypatch, serveur):
+    monkeypatch.setattr(instrumentation, "PROFIL", True)
+
+    @serveur.route("/erreur")
+    def erreur():
+        raise RuntimeError("échec")
+
+    serveur.config["PROPAGATE_EXCEPTIONS"] = True
+    with pytest.raises(RuntimeError):
+        serveur.test_client().get("/erreur")
+    assert not instrumentation._verrou_cprofile.locked()
@@ -0,0 +1,83 @@
+import itertools
+
+import pytest
+
+from memo import MemoCache, normaliser
+
+_noms = itertools.count()
+
+
+def _memo(version=lambda: 1, **options):
+    # Nom unique : le cache disque est partagé par tous les MemoCache du même nom
+    return MemoCache(f"test-{next(_noms)}", version=version, **options)
+
+
+def test_normaliser():
+    assert normaliser((["Mali", "Gabon"], [0.2, 0.1], None)) == normaliser((["Gabon", "Mali"], [0.2, 0.1], None))
+    assert normaliser(([0.2, 0.1],)) != normaliser(([0.1, 0.2],))  # plages : l'ordre compte
+    assert normaliser(({"b": [1], "a": "x"},)) == ((("a", "x"), ("b", (1,))),)
+
+
+def test_lru_et_statistiques():
+    memo = _memo(capacite=2)
+    appels = []
+
+    @memo.memoiser
+    def carre(x):
+        appels.append(x)
+        return x * x
+
+    assert [carre(2), carre(2), carre(3), carre(4), carre(2)] == [4, 4, 9, 16, 4]
+    assert appels == [2, 3, 4, 2]  # 2 évincé par 4 (capacité 2)
+    assert memo.stats()["succes"] == 1
+    assert memo.stats()["echecs"] == 4
+    assert memo.stats()["entrees"] == 2
+
+
+def test_version_change_la_cle():
+    version = [1]
+    memo = _memo(version=lambda: version[0])
+    appels = []
+
+    @memo.memoiser
+    def f(x):
+        appels.append(x)
+        return (version[0], x)
+
+    assert f(1) == f(1) == (1, 1)
+    version[0] = 2
+    assert f(1) == (2, 1)
+    assert appels == [1, 1]
+
+
+@pytest.mark.parametrize("disque", [False, True])
+def test_version_modifiee_pendant_le_calcul(disque):
+    # Ajout de transactions pendant le calcul : la valeur n'est enregistrée
+    # ni en mémoire ni sur le disque partagé, sous aucune des deux versions
+    version = [1]
+    memo = _memo(version=lambda: version[0], disque=disque)
+
+    @memo.memoiser
+    def figure(x):
+        version[0] += 1
+        return x
+
+    figure("a")
+    assert memo.stats()["entrees"] == 0
+    if disque:
+        assert len(memo.disque) == 0
+
+
+def test_disque_partage_entre_workers():
+    nom = f"test-{next(_noms)}"
+    workers = [MemoCache(nom, version=lambda: 1, disque=True) for _ in range(2)]
+    appels = []
+
+    def figure(x):
+        appels.append(x)
+        return {"x": x}
+
+    premier, second = (w.memoiser(figure) for w in workers)
+    assert premier("a") == second("a") == {"x": "a"}
+    assert appels == ["a"]
+    assert workers[1].stats()["succes_disque"] == 1
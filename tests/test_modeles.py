@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import modeles
+
+CATEGORIES = ["Pays_Origine", "Pays_Destination"]
+
+
+@pytest.fixture
+def repertoire(tmp_path, monkeypatch):
+    monkeypatch.setattr(modeles, "REPERTOIRE_MODELES", str(tmp_path / "modeles"))
+    monkeypatch.setattr(modeles, "N_JOBS", 1)
+    return tmp_path
+
+
+@pytest.fixture(scope="module")
+def donnees(transactions):
+    return modeles.preparer(transactions, "Montant", "Date")
+
+
+def test_preparer(transactions):
+    df = transactions.astype({"Montant": str})
+    prepare = modeles.preparer(df, "Montant", "Date")
+    assert len(prepare) == transactions["Montant"].notna().sum()
+    assert prepare["Montant"].dtype == np.float64
+    assert df["Montant"].dtype != np.float64  # pas de modification du DataFrame d'origine
+
+
+def test_empreinte_et_cle(transactions):
+    assert modeles.empreinte(transactions) == modeles.empreinte(transactions.reset_index(drop=True).copy())
+    assert modeles.empreinte(transactions) != modeles.empreinte(transactions.iloc[::-1])
+    cle = modeles.cle_modele("e", "Montant", "Date", ["b", "a"], 0.01)
+    assert cle == modeles.cle_modele("e", "Montant", "Date", ["a", "b"], 0.01)
+    assert cle != modeles.cle_modele("e", "Montant", "Date", ["a", "b"], 0.02)
+    with pytest.raises(ValueError):
+        modeles._chemin("../" + cle)
+
+
+def test_variables_de_date():
+    df = pd.DataFrame({"Montant": [1.0, 2.0, 3.0],
+                       "Date": pd.to_datetime(["2024-01-01 03:30", "2024-06-15 18:45", None])})
+    etat = modeles.ajuster_variables(df, "Montant", "Date", [])
+    X = modeles.variables(df, etat)
+    assert X.dtype == np.float32 and X.flags.c_contiguous
+    assert modeles.noms_variables(etat) == ["Montant", "jour_semaine", "mois", "heure", "tranche_heure"]
+    np.testing.assert_allclose(X[0], [1, 0, 1, 3.5, 0])  # lundi, janvier, nuit
+    np.testing.assert_allclose(X[1], [2, 5, 6, 18.75, 3])  # samedi, juin, soir
+    assert np.isnan(X[2, 1:]).all()
+
+
+def test_encodeur_modalites_inconnues():
+    encodeur = modeles.EncodeurCategoriel(pd.Series(["Gabon", "Mali", "Gabon", None]))
+    np.testing.assert_array_equal(encodeur.codes(pd.Series(["Mali", "Tchad", None])), [1, 2, 2])
+    np.testing.assert_array_equal(encodeur.codes(pd.Series(["Tchad", "Gabon"], dtype="category")), [2, 0])
+    np.testing.assert_allclose(encodeur.frequences, [0.5, 0.25, 0.0])
+
+
+def test_montant_par_groupe(donnees):
+    etat = modeles.ajuster_variables(donnees, "Montant", None, CATEGORIES)
+    X = modeles.variables(donnees, etat)
+    z = X[:, modeles.noms_variables(etat).index("montant_z_groupe")]
+    groupes = donnees.groupby(CATEGORIES, observed=True)["Montant"]
+    ecarts = groupes.transform(lambda m: m.std(ddof=0))
+    attendu = ((donnees["Montant"] - groupes.transform("mean")) / ecarts).to_numpy()
+    # Pays manquant ou groupe sans dispersion : case « inconnu » ou statistiques globales
+    calculables = np.isfinite(attendu)
+    assert 0 < (~calculables).sum() < len(attendu) // 10
+    np.testing.assert_allclose(z[calculables], attendu[calculables], rtol=1e-4, atol=1e-4)
+    assert np.isfinite(z).all()
+
+
+def test_entrainer_puis_recharger(repertoire, donnees):
+    artefact, reutilise = modeles.entrainer(donnees, "Montant", "Date", CATEGORIES, 0.05)
+    assert not reutilise
+    scores, anomalies = modeles.scorer(artefact, donnees)
+    assert anomalies.mean() == pytest.approx(0.05, abs=0.01)
+    np.testing.assert_array_equal(anomalies, (scores > 0).astype(np.int8))
+
+    recharge, reutilise = modeles.entrainer(donnees, "Montant", "Date", CATEGORIES, 0.05)
+    assert reutilise
+    np.testing.assert_allclose(modeles.scorer(recharge, donnees)[0], scores)
+
+
+def test_score_par_morceaux(repertoire, donnees):
+    artefact, _ = modeles.entrainer(donnees, "Montant", "Date", CATEGORIES, 0.05, lignes_entrainement=1_000)
+    assert artefact["lignes_ajustement"] == 1_000
+    entier, _ = modeles.scorer(artefact, donnees)
+    morceaux, _ = modeles.scorer(artefact, donnees, n_jobs=2, taille_morceau=700)
+    np.testing.assert_allclose(morceaux, entier)
+
+
+def test_scorer_lot(repertoire, donnees, transactions):
+    artefact, _ = modeles.entrainer(donnees, "Montant", "Date", CATEGORIES, 0.05)
+    lot = transactions.tail(300).astype({"Date": str})
+    lot.loc[lot.index[:5], "Pays_Origine"] = None
+    score = modeles.scorer_lot(artefact["cle"], lot)
+    assert len(score) == lot["Montant"].notna().sum()
+    assert set(score["anomaly"].unique()) <= {0, 1}
+
+    with pytest.raises(KeyError):
+        modeles.scorer_lot("0" * 32, lot)
+    with pytest.raises(ValueError, match="Pays_Destination"):
+        modeles.scorer_lot(artefact["cle"], lot.drop(columns=["Pays_Destination"]))
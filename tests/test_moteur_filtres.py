@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cubes import HistogramCube
+from donnees import concatener
+from moteur_filtres import FilterEngine
+
+# Combinaisons de filtres des vues (pays, montants, scores, dates, bornes ouvertes)
+FILTRES = [
+    {},
+    {"pays_origine": ["Gabon"]},
+    {"pays_origine": ["Gabon", "Mali", "Inconnu"], "pays_destination": ["France"]},
+    {"pays_destination": ["Inconnu"]},
+    {"montant": (50_000, 500_000)},
+    {"montant": (None, 20_000), "pays_origine": ["Maroc"]},
+    {"score": (0.6, 0.85)},
+    {"score": (None, 0.75)},
+    {"score": (0.9, None), "montant": (100_000, None)},
+    {"date": ("2022-03-01", "2022-09-30 23:59:59")},
+    {"date": (None, "2021-06-15")},
+    {"date": ("2023-01-01", "2024-06-30"), "score": (0.55, 0.95), "montant": (10_000, 1_000_000),
+     "pays_origine": ["Chine", "Canada"], "pays_destination": ["Congo", "Tchad", "Sénégal"]},
+]
+
+
+@pytest.fixture(scope="module")
+def anomalies(transactions):
+    return transactions[transactions["anomaly"] == 1].reset_index(drop=True)
+
+
+def _attendu(df, pays_origine=None, pays_destination=None, montant=None, score=None, date=None):
+    masque = pd.Series(True, index=df.index)
+    for col, valeurs in (("Pays_Origine", pays_origine), ("Pays_Destination", pays_destination)):
+        if valeurs:
+            masque &= df[col].isin(valeurs)
+    for col, plage in (("Montant", montant), ("anomaly_score", score), ("Date", date)):
+        if plage is not None:
+            valeurs = df[col]
+            if col == "Date":
+                plage = [None if b is None else pd.Timestamp(b) for b in plage]
+            elif col == "anomaly_score":
+                plage = [None if b is None else np.float32(b) for b in plage]
+            if plage[0] is not None:
+                masque &= valeurs >= plage[0]
+            if plage[1] is not None:
+                masque &= valeurs <= plage[1]
+    return np.flatnonzero(masque.fillna(False).to_numpy(dtype=bool))
+
+
+@pytest.mark.parametrize("filtres", FILTRES)
+def test_select_comme_pandas(anomalies, filtres):
+    moteur = FilterEngine(anomalies)
+    np.testing.assert_array_equal(moteur.select(**filtres), _attendu(anomalies, **filtres))
+
+
+@pytest.mark.parametrize("mode_nom", ["contains", "prefix"])
+def test_select_par_nom(anomalies, mode_nom):
+    moteur = FilterEngine(anomalies)
+    requete = "AÏCHA" if mode_nom == "prefix" else "ondo 1"
+    test = str.startswith if mode_nom == "prefix" else str.__contains__
+    noms = [anomalies[col].astype(str).str.lower() for col in ("Nom_Emetteur", "Nom_Destinataire")]
+    attendu = np.flatnonzero([test(e, requete.lower()) or test(d, requete.lower()) for e, d in zip(*noms)])
+
+    obtenu = moteur.select(nom=requete, mode_nom=mode_nom, pays_origine=["Gabon", "Mali", "France"])
+    np.testing.assert_array_equal(obtenu, np.intersect1d(attendu, _attendu(anomalies, pays_origine=["Gabon", "Mali", "France"])))
+
+
+# LES DEUX CHEMINS DE L'HISTOGRAMME : lignes sélectionnées par le moteur, comptes du cube
+@pytest.mark.parametrize("bins", [50, 7])
+@pytest.mark.parametrize("filtres", FILTRES)
+def test_counts_comme_select(anomalies, filtres, bins):
+    moteur = FilterEngine(anomalies)
+    cube = HistogramCube(anomalies, bins=bins, tranches_montant=8)
+
+    lignes = moteur.select(**filtres)
+    scores = anomalies["anomaly_score"].to_numpy(dtype=np.float64)[lignes]
+    attendu = np.bincount(cube.classe_de(scores[~np.isnan(scores)]), minlength=bins)
+
+    np.testing.assert_array_equal(cube.counts(**filtres), attendu)
+    assert cube.counts(**filtres).sum() == len(lignes)
+
+
+@pytest.mark.parametrize("filtres", FILTRES)
+def test_counts_apres_ajout(anomalies, filtres):
+    # Lignes ajoutées après construction du cube (append_transactions)
+    debut, lot = anomalies.iloc[:1_000], anomalies.iloc[1_000:]
+    cube = HistogramCube(debut, bins=20)
+    cube.ajouter(lot)
+
+    moteur = FilterEngine(concatener([debut, lot.reset_index(drop=True)]))
+    attendu = np.bincount(cube.classe_de(
+        anomalies["anomaly_score"].to_numpy(dtype=np.float64)[moteur.select(**filtres)]), minlength=20)
+    np.testing.assert_array_equal(cube.counts(**filtres), attendu)
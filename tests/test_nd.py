@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+from plotly.io.json import to_json_plotly
+
+import nd
+
+
+@pytest.fixture(scope="module", autouse=True)
+def app():
+    # Liens d'export relatifs (dash.get_relative_path) : une application nd existe
+    return nd.create_app()
+
+
+@pytest.fixture
+def jeton(transactions):
+    # Résultat d'analyse tel que rangé par analyser : colonnes de texte, booléens, manquants
+    df = transactions.head(4_000).copy()
+    df["Nom_Emetteur"] = df["Nom_Emetteur"].astype(object)
+    df.loc[df.index[::7], "Nom_Emetteur"] = None
+    df["Controle"] = df["Montant"] > 100_000
+    return nd.store.put(df)
+
+
+def _tables(composant):
+    if isinstance(composant, nd.dash.dash_table.DataTable):
+        return [composant]
+    enfants = getattr(composant, "children", None)
+    enfants = enfants if isinstance(enfants, list) else [enfants]
+    return [t for enfant in enfants if enfant is not None for t in _tables(enfant)]
+
+
+@pytest.mark.parametrize("onglet", ["tab-data", "tab-anomalies"])
+def test_onglet_sans_les_lignes(jeton, onglet):
+    # Seul le squelette de la table part vers le navigateur, pas le jeu de données
+    contenu = nd.display_tab(onglet, jeton)
+    (table,) = _tables(contenu)
+    assert table.page_action == table.sort_action == table.filter_action == "custom"
+    assert getattr(table, "data", None) is None
+    assert len(to_json_plotly(contenu)) < 5_000
+
+
+def test_pages(jeton):
+    df = nd.store.get(jeton)
+    records, page_count = nd.page_donnees(2, 15, [], "", jeton)
+    assert page_count == -(-len(df) // 15)
+    assert [r["Montant"] for r in records] == pytest.approx(df["Montant"].iloc[30:45].tolist(), nan_ok=True)
+
+    anomalies = df[df["anomaly"] == 1]
+    records, page_count = nd.page_anomalies(0, 15, [], "", jeton)
+    assert page_count == -(-len(anomalies) // 15)
+    assert [r["Date"] for r in records] == anomalies["Date"].iloc[:15].tolist()
+
+
+def test_tri_et_filtre_sur_colonnes_de_texte(jeton):
+    df = nd.store.get(jeton)
+    tri = [{"column_id": "Nom_Emetteur", "direction": "desc"}, {"column_id": "Controle", "direction": "asc"}]
+    records, _ = nd.page_donnees(0, len(df), tri, "{Nom_Emetteur} contains ondo", jeton)
+    noms = [r["Nom_Emetteur"] for r in records]
+    assert noms and all("Ondo" in nom for nom in noms)
+    assert noms == sorted(noms, reverse=True)
+    assert len(noms) == df["Nom_Emetteur"].str.contains("Ondo", na=False).sum()
+
+    records, _ = nd.page_donnees(0, len(df), [{"column_id": "Nom_Emetteur", "direction": "asc"}], "", jeton)
+    assert all(r["Nom_Emetteur"] is None for r in records[:df["Nom_Emetteur"].isna().sum()])
+
+
+def test_session_expiree():
+    with pytest.raises(nd.PreventUpdate):
+        nd.page_donnees(0, 15, [], "", "jeton-inconnu-0123456789")
+    assert isinstance(nd.display_tab("tab-data", "jeton-inconnu-0123456789"), nd.dbc.Alert)
+
+
+def test_trier_colonnes_booleennes():
+    df = pd.DataFrame({"Controle": [True, False, True]})
+    records, _ = nd.page_records(df, np.arange(3), 0, 3, [{"column_id": "Controle", "direction": "desc"}])
+    assert [r["Controle"] for r in records] == [True, True, False]
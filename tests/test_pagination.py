@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from donnees import concatener
+from pagination import filtrer_ids, page_records, split_filter_part, trier_ids
+
+
+def tous(frame):
+    return np.arange(len(frame))
+
+
+# SYNTAXE filter_query
+@pytest.mark.parametrize("partie, attendu", [
+    ("{Montant} ge 100", ("Montant", "ge", 100.0)),
+    ("{Montant} >= 100", ("Montant", "ge", 100.0)),
+    ("{Pays_Origine} eq 'Gabon'", ("Pays_Origine", "eq", "Gabon")),
+    ('{Pays_Origine} = "Côte d\\"Ivoire"', ("Pays_Origine", "eq", 'Côte d"Ivoire')),
+    ("{Nom_Emetteur} contains jean", ("Nom_Emetteur", "contains", "jean")),
+    ("{Date} datestartswith 2022-03", ("Date", "datestartswith", "2022-03")),
+    ("{anomaly_score} lt 0.9727", ("anomaly_score", "lt", 0.9727)),
+])
+def test_split_filter_part(partie, attendu):
+    assert split_filter_part(partie) == attendu
+
+
+def test_split_filter_part_sans_operateur():
+    assert split_filter_part("{Montant}") == [None, None, None]
+
+
+# OPÉRATEURS DE filtrer_ids, comparés au filtrage pandas équivalent
+def _attendu(df, masque):
+    return np.flatnonzero(masque.fillna(False).to_numpy(dtype=bool))
+
+
+@pytest.mark.parametrize("requete, masque", [
+    ("{Montant} ge 200000", lambda df: df["Montant"] >= 200_000),
+    ("{Montant} le 200000", lambda df: df["Montant"] <= 200_000),
+    ("{Montant} lt 50000", lambda df: df["Montant"] < 50_000),
+    ("{Montant} gt 50000", lambda df: df["Montant"] > 50_000),
+    ("{anomaly} eq 1", lambda df: df["anomaly"] == 1),
+    ("{anomaly} ne 1", lambda df: df["anomaly"] != 1),
+    ("{Pays_Origine} eq Gabon", lambda df: df["Pays_Origine"] == "Gabon"),
+    ("{Pays_Origine} ne Gabon", lambda df: df["Pays_Origine"].notna() & (df["Pays_Origine"] != "Gabon")),
+    ("{Pays_Origine} lt D", lambda df: df["Pays_Origine"].astype(str) < "D"),
+    ("{Pays_Destination} contains ÉTATS", lambda df: df["Pays_Destination"] == "États-Unis"),
+    ("{Nom_Emetteur} contains aïcha", lambda df: df["Nom_Emetteur"].str.startswith("Aïcha")),
+    ("{Date} datestartswith 2022", lambda df: df["Date"].dt.year == 2022),
+    ("{Date} datestartswith 2022-03",
+     lambda df: (df["Date"].dt.year == 2022) & (df["Date"].dt.month == 3)),
+    ("{Date} datestartswith 2022-03-07", lambda df: df["Date"].dt.strftime("%Y-%m-%d") == "2022-03-07"),
+    ("{Date} ge 2024-01-01", lambda df: df["Date"] >= "2024-01-01"),
+    ("{Montant} ge 100000 && {Pays_Origine} eq Mali && {anomaly} eq 1",
+     lambda df: (df["Montant"] >= 100_000) & (df["Pays_Origine"] == "Mali") & (df["anomaly"] == 1)),
+])
+def test_filtrer_ids_operateurs(transactions, requete, masque):
+    obtenu = filtrer_ids(transactions, tous(transactions), requete)
+    np.testing.assert_array_equal(obtenu, _attendu(transactions, masque(transactions)))
+
+
+def test_filtrer_ids_score_float32(transactions):
+    # La valeur tapée (0.9727) désigne le float32 affiché, pas le float64 le plus proche
+    valeur = transactions["anomaly_score"].iloc[np.flatnonzero(transactions["anomaly"] == 1)[0]]
+    obtenu = filtrer_ids(transactions, tous(transactions), f"{{anomaly_score}} eq {float(valeur):g}")
+    assert len(obtenu) > 0
+    assert (transactions["anomaly_score"].iloc[obtenu] == valeur).all()
+
+
+def test_filtrer_ids_cas_limites(transactions):
+    ids = tous(transactions)[::3]
+    # Colonne inconnue ignorée, texte sur une colonne numérique, date invalide
+    np.testing.assert_array_equal(filtrer_ids(transactions, ids, "{Inconnue} eq 1"), ids)
+    assert len(filtrer_ids(transactions, ids, "{Montant} eq abc")) == 0
+    assert len(filtrer_ids(transactions, ids, "{Date} datestartswith abc")) == 0
+    # Sous-ensemble d'ids : le résultat en reste un sous-ensemble, dans le même ordre
+    obtenu = filtrer_ids(transactions, ids, "{anomaly} eq 1")
+    np.testing.assert_array_equal(obtenu, ids[transactions["anomaly"].to_numpy()[ids] == 1])
+
+
+# TRI
+@pytest.mark.parametrize("direction", ["asc", "desc"])
+def test_tri_categories_de_plusieurs_lots(transactions, direction):
+    # Chaque lot apporte ses propres catégories ; après concaténation l'ordre
+    # des catégories ne doit pas décider de l'ordre du tri
+    lot1 = transactions.iloc[:2_000].copy()
+    lot2 = transactions.iloc[2_000:2_010].copy()
+    lot2["Nom_Emetteur"] = pd.Categorical(["AAA Nouveau", "Zoé Ondo 1"] * 5)
+    lot3 = transactions.iloc[2_010:2_020].copy()
+    lot3["Nom_Emetteur"] = pd.Categorical(["Bernard Ondo 2", None] * 5)
+    df = concatener([lot1, lot2, lot3])
+
+    ids = tous(df)
+    noms = df["Nom_Emetteur"].iloc[trier_ids(df, ids, [{"column_id": "Nom_Emetteur", "direction": direction}])]
+    presents = noms.dropna().astype(str).tolist()
+    assert presents == sorted(presents, reverse=direction == "desc")
+    assert presents[0 if direction == "asc" else -1] == "AAA Nouveau"
+    # Valeurs manquantes en tête en ordre croissant, en queue en décroissant
+    manquants = noms.isna().to_numpy()
+    assert manquants[:5].all() if direction == "asc" else manquants[-5:].all()
+
+
+def test_tri_categories_non_triees():
+    df = pd.DataFrame({"Pays_Origine": pd.Categorical(["Mali", "Gabon", None, "Congo"],
+                                                      categories=["Mali", "Gabon", "Congo"])})
+    ordre = trier_ids(df, tous(df), [{"column_id": "Pays_Origine", "direction": "asc"}])
+    assert df["Pays_Origine"].iloc[ordre].tolist()[1:] == ["Congo", "Gabon", "Mali"]
+    assert ordre[0] == 2
+
+
+def test_tri_plusieurs_colonnes(transactions):
+    ids = tous(transactions)[transactions["Montant"].notna().to_numpy()
+                             & transactions["Pays_Origine"].notna().to_numpy()]
+    ordre = trier_ids(transactions, ids, [{"column_id": "Pays_Origine", "direction": "asc"},
+                                          {"column_id": "Montant", "direction": "desc"}])
+    attendu = (transactions.iloc[ids]
+               .assign(p=lambda d: d["Pays_Origine"].astype(str))
+               .sort_values(["p", "Montant"], ascending=[True, False], kind="stable"))
+    np.testing.assert_array_equal(transactions["Montant"].to_numpy()[ordre], attendu["Montant"].to_numpy())
+    np.testing.assert_array_equal(transactions["Pays_Origine"].astype(str).to_numpy()[ordre],
+                                  attendu["p"].to_numpy())
+
+
+def test_tri_dates(transactions):
+    ordre = trier_ids(transactions, tous(transactions), [{"column_id": "Date", "direction": "desc"}])
+    dates = transactions["Date"].iloc[ordre].dropna()
+    assert dates.is_monotonic_decreasing
+
+
+# PAGE MATÉRIALISÉE
+def test_page_records(transactions):
+    ids = tous(transactions)
+    records, page_count = page_records(transactions, ids, 3, 25, filter_query="{anomaly} eq 1")
+    selection = np.flatnonzero(transactions["anomaly"] == 1)
+    assert page_count == -(-len(selection) // 25)
+    assert len(records) == 25
+    assert [r["Montant"] for r in records] == pytest.approx(
+        transactions["Montant"].iloc[selection[75:100]].tolist(), nan_ok=True)
+    # Scores float32 rendus tels qu'affichés (0.9727, pas 0.97269999...)
+    assert all(r["anomaly_score"] == float(str(r["anomaly_score"])) and len(str(r["anomaly_score"])) <= 6
+               for r in records)
+
+
+def test_page_records_page_hors_limites(transactions):
+    records, page_count = page_records(transactions, tous(transactions)[:30], 99, 10)
+    assert page_count == 3
+    assert len(records) == 10
+    records, page_count = page_records(transactions, tous(transactions)[:0], 0, 10)
+    assert (records, page_count) == ([], 1)
+
+
+def test_page_records_colonnes_affichees(transactions):
+    # Filtre et tri sur des colonnes non affichées ; seules les colonnes de la table sont envoyées
+    colonnes = ["Date", "Montant"]
+    records, _ = page_records(transactions, tous(transactions), 0, 10, [{"column_id": "anomaly_score",
+                                                                        "direction": "desc"}],
+                              "{anomaly} eq 1", colonnes)
+    assert all(list(r) == colonnes for r in records)
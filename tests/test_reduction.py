@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from reduction import histogramme, lttb, reduire_nuage
+
+
+def _lttb_reference(x, y, budget):
+    # Algorithme de Steinarsson, une tranche après l'autre
+    n = len(x)
+    taille = (n - 2) / (budget - 2)
+    retenus, a = [0], 0
+    for i in range(budget - 2):
+        debut, fin = int(i * taille) + 1, int((i + 1) * taille) + 1
+        suivant_debut, suivant_fin = fin, min(int((i + 2) * taille) + 1, n)
+        moy_x, moy_y = np.mean(x[suivant_debut:suivant_fin]), np.mean(y[suivant_debut:suivant_fin])
+        aires = [abs((x[a] - moy_x) * (y[j] - y[a]) - (x[a] - x[j]) * (moy_y - y[a])) for j in range(debut, fin)]
+        a = debut + int(np.argmax(aires))
+        retenus.append(a)
+    return retenus + [n - 1]
+
+
+def test_lttb_garde_extremites_et_pics():
+    rng = np.random.default_rng(3)
+    x = np.arange(10_000, dtype=np.float64)
+    y = rng.normal(size=len(x))
+    y[[1_234, 7_777]] = [50, -50]
+    retenus = lttb(x, y, 200)
+    assert len(retenus) == 200 and retenus[0] == 0 and retenus[-1] == len(x) - 1
+    assert np.all(np.diff(retenus) > 0)
+    assert {1_234, 7_777} <= set(retenus)
+
+
+def test_lttb_comme_reference():
+    rng = np.random.default_rng(5)
+    x = np.sort(rng.uniform(0, 100, 999))
+    y = rng.normal(size=len(x))
+    assert list(lttb(x, y, 50)) == _lttb_reference(x, y, 50)
+
+
+@pytest.mark.parametrize("budget", [2, 1_000, 5_000])
+def test_lttb_sans_reduction(budget):
+    x = np.arange(1_000, dtype=np.float64)
+    np.testing.assert_array_equal(lttb(x, np.sin(x), budget), np.arange(1_000))
+
+
+def test_reduire_nuage():
+    rng = np.random.default_rng(1)
+    n = 50_000
+    x = rng.permutation(n).astype(np.float64)
+    y = rng.normal(size=n)
+    y[::97] = np.nan
+    anomalies = (rng.uniform(size=n) < 0.05).astype(np.int8)
+    scores = rng.uniform(size=n)
+
+    normaux, anormaux = reduire_nuage(x, y, anomalies, scores, budget=500, budget_anomalies=100)
+    assert len(normaux) == 500 and np.all(np.diff(x[normaux]) > 0)
+    assert np.all(anomalies[normaux] == 0) and np.all(anomalies[anormaux] == 1)
+    assert np.isfinite(y[normaux]).all() and np.isfinite(y[anormaux]).all()
+    # Au-delà du budget : les anomalies de plus fort score
+    candidates = np.flatnonzero((anomalies == 1) & np.isfinite(y))
+    seuil = np.sort(scores[candidates])[-100]
+    np.testing.assert_array_equal(anormaux, candidates[scores[candidates] >= seuil])
+
+
+def test_histogramme_comme_numpy():
+    valeurs = np.array([1.0, 2.0, np.nan, 2.5, np.inf, 10.0])
+    centres, largeurs, comptes = histogramme(valeurs, bins=3)
+    attendu, bords = np.histogram([1.0, 2.0, 2.5, 10.0], bins=3)
+    np.testing.assert_array_equal(comptes, attendu)
+    np.testing.assert_allclose(centres - largeurs / 2, bords[:-1])
+    assert [len(a) for a in histogramme([np.nan])] == [0, 0, 0]
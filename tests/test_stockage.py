@@ -0,0 +1,55 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from stockage import DatasetStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DatasetStore(capacite=2, ttl=60, repertoire=str(tmp_path / "sessions"))
+
+
+def test_put_get(store, transactions):
+    df = transactions.head(100)
+    jeton = store.put(df)
+    assert len(jeton) >= 16 and store.get(jeton) is df
+    assert os.path.exists(store._chemin(jeton, "parquet"))
+
+
+@pytest.mark.parametrize("jeton", [None, "", "court", "../../etc/passwd" + "x" * 16, "a" * 65])
+def test_jeton_invalide(store, jeton):
+    assert store.get(jeton) is None
+
+
+def test_autre_worker_relit_le_disque(store, transactions):
+    # Un autre processus (LRU vide) retrouve le jeu de données sur le disque
+    df = transactions.head(100)
+    jeton = store.put(df)
+    autre = DatasetStore(capacite=2, ttl=60, repertoire=store.repertoire)
+    pd.testing.assert_frame_equal(autre.get(jeton), df)
+
+
+def test_lru_evince_mais_disque_conserve(store, transactions):
+    jetons = [store.put(transactions.iloc[i:i + 10]) for i in range(3)]
+    assert list(store._memoire) == jetons[1:]
+    pd.testing.assert_frame_equal(store.get(jetons[0]), transactions.iloc[0:10])
+    assert list(store._memoire) == [jetons[2], jetons[0]]
+
+
+def test_colonnes_heterogenes_en_pickle(store):
+    df = pd.DataFrame({"valeur": [1, "deux", 3.0]})
+    jeton = store.put(df)
+    assert os.path.exists(store._chemin(jeton, "pkl"))
+    autre = DatasetStore(repertoire=store.repertoire)
+    assert autre.get(jeton)["valeur"].tolist() == [1, "deux", 3.0]
+
+
+def test_expiration(store, transactions):
+    jeton = store.put(transactions.head(10))
+    store.ttl = 0
+    time.sleep(0.01)
+    assert store.get(jeton) is None
+    assert not os.path.exists(store._chemin(jeton, "parquet"))
@@ -0,0 +1,76 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import modeles
+import traitement_lots
+
+from conftest import ecrire_csv
+
+
+@pytest.fixture
+def lots(tmp_path, transactions, monkeypatch):
+    # Trois exports mensuels lisibles, un sans colonne Montant, un fichier ignoré
+    monkeypatch.setattr(modeles, "REPERTOIRE_MODELES", str(tmp_path / "modeles"))
+    monkeypatch.setattr(modeles, "N_JOBS", 1)
+    racine = tmp_path / "lots"
+    (racine / "2024").mkdir(parents=True)
+    for i, mois in enumerate(("01", "02", "03")):
+        ecrire_csv(transactions.iloc[i * 1_000:(i + 1) * 1_000], racine / "2024" / f"{mois}.csv")
+    ecrire_csv(transactions.head(10).drop(columns=["Montant"]), racine / "2024" / "04.csv")
+    (racine / "2024" / "notes.txt").write_text("pas un export")
+    return racine
+
+
+def test_lister_fichiers(lots, tmp_path):
+    attendu = [str(lots / "2024" / f"{mois}.csv") for mois in ("01", "02", "03", "04")]
+    assert traitement_lots.lister_fichiers("2024", racine=lots) == attendu
+    assert traitement_lots.lister_fichiers("2024/0[12].csv", racine=lots) == attendu[:2]
+    assert traitement_lots.lister_fichiers("**/*.csv", racine=lots) == attendu
+
+    os.symlink(tmp_path, lots / "2024" / "dehors")
+    ecrire_csv(pd.DataFrame({"Montant": [1.0]}), tmp_path / "secret.csv")
+    assert traitement_lots.lister_fichiers("2024/dehors/*.csv", racine=lots) == []
+    with pytest.raises(ValueError):
+        traitement_lots.lister_fichiers("../*.csv", racine=lots)
+
+
+def test_charger_fichiers(lots, transactions):
+    fichiers = traitement_lots.lister_fichiers("2024", racine=lots)
+    avancement = []
+    df, rapport = traitement_lots.charger_fichiers(fichiers, "Montant", "Date", lambda f, t: avancement.append(f),
+                                                   threads=2, processus=2)
+    assert avancement == [1, 2, 3, 4]
+    assert list(rapport["fichier"]) == ["01.csv", "02.csv", "03.csv", "04.csv"]
+    assert rapport["erreur"].iloc[:3].isna().all() and "Montant" in rapport["erreur"].iloc[3]
+
+    # Fichier et ligne d'origine de chaque transaction
+    source = transactions.iloc[:3_000].reset_index(drop=True)
+    valides = source["Montant"].notna().to_numpy()
+    assert list(rapport["lignes"].iloc[:3]) == [valides[i * 1_000:(i + 1) * 1_000].sum() for i in range(3)]
+    assert list(df["fichier"].cat.categories) == ["01.csv", "02.csv", "03.csv"]
+    lignes = df["fichier"].cat.codes.to_numpy().astype(np.int64) * 1_000 + df["ligne_fichier"].to_numpy()
+    np.testing.assert_array_equal(lignes, np.flatnonzero(valides))  # lignes sans montant écartées
+    np.testing.assert_allclose(df["Montant"], source["Montant"].to_numpy()[lignes])
+
+
+def test_analyser_lot_puis_modele_existant(lots):
+    fichiers = traitement_lots.lister_fichiers("2024/0[123].csv", racine=lots)
+    df, rapport, artefact, reutilise, durees = traitement_lots.analyser_lot(
+        fichiers, "Montant", "Date", ["Pays_Origine"], 0.05)
+    assert not reutilise and len(df) == rapport["lignes"].sum()
+    assert rapport["anomalies"].sum() == df["anomaly"].sum() > 0
+    assert durees["total_s"] > 0
+
+    # Nouveau lot scoré avec le modèle du premier
+    df2, rapport2, _, reutilise, _ = traitement_lots.analyser_lot(
+        fichiers[:1], "Montant", "Date", ["Pays_Origine"], 0.05, cle_modele=artefact["cle"])
+    assert reutilise
+    np.testing.assert_allclose(df2["anomaly_score"], df.loc[df["fichier"] == "01.csv", "anomaly_score"])
+
+
+def test_lot_sans_fichier_exploitable(lots):
+    with pytest.raises(ValueError):
+        traitement_lots.analyser_lot([str(lots / "2024" / "04.csv")], "Montant", "Date", [], 0.05)
@@ -0,0 +1,178 @@
+# ANALYSE PAR LOT DE PLUSIEURS FICHIERS (exports bancaires mensuels)
+# Les fichiers d'un répertoire ou d'un motif glob sont lus en parallèle (threads :
+# entrées/sorties), décodés dans un pool de processus (CSV/Excel : calcul), puis
+# consolidés avec leur fichier et leur ligne d'origine ; un seul modèle (mêmes
+# colonnes, même IsolationForest que nd.py) score toutes les lignes. Durées et
+# débit sont relevés fichier par fichier.
+#
+#   python -m traitement_lots "2024/*.csv" --montant Montant --date Date --categories Pays_Origine
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from ingestion import compacter, lire_octets
+from modeles import LIGNES_ENTRAINEMENT, charger, empreinte, entrainer, preparer, scorer
+
+# Les motifs sont résolus sous ce répertoire (les chemins qui en sortent sont refusés)
+RACINE_LOTS = os.path.abspath(os.environ.get("APP_DASH_LOTS", "lots"))
+EXTENSIONS = (".csv", ".xlsx", ".xlsm", ".xls")
+THREADS_LECTURE = int(os.environ.get("APP_DASH_THREADS_LECTURE", 8))
+PROCESSUS_DECODAGE = int(os.environ.get("APP_DASH_PROCESSUS_DECODAGE", os.cpu_count() or 1))
+RAPPORT = ["fichier", "octets", "lignes", "lecture_s", "decodage_s", "erreur"]
+
+
+def lister_fichiers(motif, racine=RACINE_LOTS):
+    # Répertoire (tous les fichiers pris en charge) ou motif glob, relatif à la racine
+    racine = os.path.abspath(racine)
+    chemin = os.path.abspath(os.path.join(racine, motif or ""))
+    if os.path.commonpath([chemin, racine]) != racine:
+        raise ValueError("Chemin hors du répertoire des lots")
+    if os.path.isdir(chemin):
+        candidats = [os.path.join(chemin, nom) for nom in os.listdir(chemin)]
+    else:
+        candidats = glob.glob(chemin, recursive=True)
+    return sorted(f for f in candidats
+                  if os.path.isfile(f) and f.lower().endswith(EXTENSIONS)
+                  and os.path.commonpath([os.path.realpath(f), racine]) == racine)
+
+
+# ÉTAPES PAR FICHIER
+def _lire(chemin):
+    debut = time.perf_counter()
+    with open(chemin, "rb") as f:
+        octets = f.read()
+    return octets, time.perf_counter() - debut
+
+
+def _decoder(octets, nom, montant_col, date_col):
+    # Exécuté dans un processus du pool : décodage et préparation des variables
+    debut = time.perf_counter()
+    df = preparer(lire_octets(octets, nom), montant_col, date_col)
+    return df, time.perf_counter() - debut
+
+
+def charger_fichiers(fichiers, montant_col, date_col, progression=lambda fait, total: None,
+                     threads=THREADS_LECTURE, processus=PROCESSUS_DECODAGE):
+    # (DataFrame consolidé, rapport par fichier). Un fichier illisible ou sans la
+    # colonne montant est signalé dans le rapport sans interrompre le lot.
+    rapports = {f: dict(zip(RAPPORT, (os.path.basename(f), 0, 0, 0.0, 0.0, None))) for f in fichiers}
+    frames = {}
+    fait = 0
+
+    with ThreadPoolExecutor(max_workers=threads) as lecteurs, \
+            ProcessPoolExecutor(max_workers=processus) as decodeurs:
+        lectures = {lecteurs.submit(_lire, f): f for f in fichiers}
+        decodages = {}
+        # Chaque fichier lu part au décodage sans attendre la lecture des autres
+        for futur in as_completed(lectures):
+            chemin = lectures[futur]
+            try:
+                octets, duree = futur.result()
+            except OSError as e:
+                rapports[chemin]["erreur"] = str(e)
+                continue
+            rapports[chemin].update(octets=len(octets), lecture_s=duree)
+            decodages[decodeurs.submit(_decoder, octets, os.path.basename(chemin), montant_col, date_col)] = chemin
+
+        for futur in as_completed(decodages):
+            chemin = decodages[futur]
+            try:
+                df, duree = futur.result()
+                frames[chemin] = df
+                rapports[chemin].update(lignes=len(df), decodage_s=duree)
+            except Exception as e:
+                rapports[chemin]["erreur"] = f"{type(e).__name__}: {e}"
+            fait += 1
+            progression(fait, len(fichiers))
+
+    rapport = pd.DataFrame([rapports[f] for f in fichiers], columns=RAPPORT)
+    duree = rapport["lecture_s"] + rapport["decodage_s"]
+    rapport["lignes_par_s"] = (rapport["lignes"] / duree.where(duree > 0)).fillna(0.0)
+    return consolider([(os.path.basename(f), frames[f]) for f in fichiers if f in frames]), rapport
+
+
+def consolider(frames):
+    # Concaténation indexée par (fichier, ligne du fichier), conservés en colonnes
+    # pour l'affichage et l'export. La ligne est celle du fichier source : l'index
+    # de lecture, conservé par preparer quand il écarte les montants manquants.
+    noms = [nom for nom, _ in frames]
+    parties = []
+    for nom, df in frames:
+        lignes = df.index.to_numpy(dtype=np.int64)
+        df = df.reset_index(drop=True)
+        df.insert(0, "ligne_fichier", lignes)
+        df.insert(0, "fichier", nom)
+        parties.append(df)
+    if not parties:
+        return pd.DataFrame(columns=["fichier", "ligne_fichier"])
+    df = pd.concat(parties, ignore_index=True)
+    df["fichier"] = pd.Categorical(df["fichier"], categories=noms)
+    return compacter(df)
+
+
+# LOT COMPLET : lecture, modèle unique, score
+def analyser_lot(fichiers, montant_col, date_col, cat_cols, contamination, cle_modele=None,
+                 max_samples="auto", lignes_entrainement=LIGNES_ENTRAINEMENT,
+                 progression=lambda etape, avancement: None):
+    # cle_modele : modèle existant à appliquer ; sinon entraîné (ou rechargé)
+    # sur l'ensemble consolidé. Retourne (df, rapport, artefact, réutilisé, durées).
+    durees = {}
+    debut = time.perf_counter()
+    df, rapport = charger_fichiers(fichiers, montant_col, date_col,
+                                   lambda fait, total: progression("Lecture des fichiers", fait / max(total, 1)))
+    durees["lecture_s"] = time.perf_counter() - debut
+    if df.empty:
+        raise ValueError("Aucun fichier exploitable dans le lot")
+
+    progression("Entraînement de l'IsolationForest", 0)
+    debut = time.perf_counter()
+    if cle_modele:
+        artefact, reutilise = charger(cle_modele), True
+        if artefact is None:
+            raise KeyError(f"Modèle introuvable : {cle_modele}")
+    else:
+        artefact, reutilise = entrainer(df, montant_col, date_col, cat_cols, contamination, empreinte(df),
+                                        max_samples, lignes_entrainement)
+    durees["modele_s"] = time.perf_counter() - debut
+
+    progression("Calcul des scores", 0)
+    debut = time.perf_counter()
+    df["anomaly_score"], df["anomaly"] = scorer(artefact, df)
+    durees["score_s"] = time.perf_counter() - debut
+
+    anomalies = np.bincount(df["fichier"].cat.codes.to_numpy(), weights=df["anomaly"].to_numpy(),
+                            minlength=len(df["fichier"].cat.categories))
+    par_fichier = dict(zip(df["fichier"].cat.categories, anomalies.astype(np.int64)))
+    rapport["anomalies"] = rapport["fichier"].map(par_fichier).fillna(0).astype(np.int64)
+    durees["total_s"] = sum(durees.values())
+    durees["lignes_par_s"] = len(df) / durees["total_s"] if durees["total_s"] else 0.0
+    return df, rapport, artefact, reutilise, durees
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("motif", help=f"répertoire ou motif glob, relatif à {RACINE_LOTS}")
+    parser.add_argument("--montant", required=True)
+    parser.add_argument("--date")
+    parser.add_argument("--categories", nargs="*", default=[])
+    parser.add_argument("--contamination", type=float, default=0.01)
+    parser.add_argument("--modele", help="clé d'un modèle existant")
+    parser.add_argument("--sortie", help="résultat consolidé (Parquet)")
+    args = parser.parse_args()
+
+    fichiers = lister_fichiers(args.motif)
+    df, rapport, artefact, reutilise, durees = analyser_lot(
+        fichiers, args.montant, args.date, args.categories, args.contamination, args.modele)
+    print(rapport.to_string(index=False))
+    print(f"{len(fichiers)} fichiers, {len(df):,} lignes, {int(df['anomaly'].sum()):,} anomalies — "
+          f"lecture {durees['lecture_s']:.2f} s, modèle {durees['modele_s']:.2f} s "
+          f"({'réutilisé' if reutilise else 'entraîné'} {artefact['cle'][:8]}), score {durees['score_s']:.2f} s, "
+          f"{durees['lignes_par_s']:,.0f} lignes/s")
+    if args.sortie:
+        df.to_parquet(args.sortie, engine="pyarrow", index=False)